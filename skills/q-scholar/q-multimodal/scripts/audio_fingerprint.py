@@ -0,0 +1,337 @@
+"""
+Audio content fingerprints and the persistent duplicate-track index.
+
+Reposted videos often carry the same soundtrack or voice-over, re-encoded
+by each platform, so their bytes (and file keys) differ while their audio
+features are the same. `fingerprint_audio` decodes FP_WINDOW_SECONDS
+windows spread over the track's probed duration (FP_WINDOWS: its start,
+quarters and end) at a low rate (FP_RATE, mono) and reduces each to one
+32-bit sub-fingerprint per 11.6 ms hop: the signs of band-energy
+differences across 33 log-spaced bands between 300 Hz and 2 kHz,
+differenced again over time (Haitsma & Kalker), plus the windows' RMS
+level and the duration. Re-encoding and resampling flip few bits; a
+different track flips about half. `track_ber` compares two fingerprints
+window by window (`fingerprint_ber`: the bit error rate at the best
+alignment within a few hops) and keeps the worst window, so two files that
+share an intro but differ later do not match.
+
+`FingerprintIndex` keeps every file's fingerprint in one SQLite file (by
+default in the output directory's _cache; pipelines given the same
+--fingerprint-index share it), keyed by path + size + mtime. `find_audio_duplicates` maps each
+pending file whose track matches an earlier one — in this run, or indexed
+by an earlier run whose result the pipeline still has cached — to that
+source, so the pipeline can reuse its result instead of extracting again.
+"""
+
+import math
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from feature_cache import FeatureCache
+from media_probe import probe_media
+
+FP_RATE = 5512
+# Windows fingerprinted per file, at these fractions of the room the track
+# leaves after one window (0.0 = its start, 1.0 = its end); FP_SECONDS of
+# audio in all. Tracks shorter than a window are taken whole.
+FP_WINDOWS = (0.0, 0.25, 0.5, 0.75, 1.0)
+FP_WINDOW_SECONDS = 18.0
+FP_SECONDS = FP_WINDOW_SECONDS * len(FP_WINDOWS)
+FP_FRAME = 2048          # ~0.37 s analysis frame
+FP_HOP = 64              # ~11.6 ms between sub-fingerprints
+FP_BANDS = np.geomspace(300.0, 2000.0, 34)
+FP_BLOCK = 1024          # frames transformed per FFT batch (bounds memory)
+# Band energies are floored (~-73 dB re a full-scale tone in one band), so
+# near-empty bands of tones and silence give stable bits instead of noise.
+FP_FLOOR = 1e-2
+
+FINGERPRINT_WORKERS = 8
+
+# Duplicate test: durations within DURATION_TOL_S (codec padding and
+# priming differ by tens of ms) and RMS levels within LEVEL_TOL_DB (louder
+# or quieter copies get different features), then the worst window's bit
+# error rate at the best of +/-MAX_SHIFT hops of alignment. Re-encodes at
+# usual bitrates land around 0.02-0.05; a voice-over mixed in at -34 dB
+# already reaches ~0.11.
+DEFAULT_MAX_BER = 0.1
+DURATION_TOL_S = 0.5
+LEVEL_TOL_DB = 1.0
+MAX_SHIFT = 8
+
+# Bump when fingerprint_audio's output changes; older entries are ignored.
+FP_VERSION = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fingerprints (
+    file_key TEXT PRIMARY KEY,
+    path     TEXT NOT NULL,
+    version  INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    rms_db   REAL NOT NULL,
+    bits     BLOB NOT NULL,
+    added    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS fingerprints_duration ON fingerprints (version, duration);
+"""
+
+
+def _band_matrix():
+    """(bins, 33) 0/1 matrix summing rfft power bins into the FP_BANDS bands."""
+    freqs = np.fft.rfftfreq(FP_FRAME, 1.0 / FP_RATE)
+    band = np.searchsorted(FP_BANDS, freqs, side="right") - 1
+    m = np.zeros((freqs.size, FP_BANDS.size - 1), dtype=np.float32)
+    inside = (band >= 0) & (band < FP_BANDS.size - 1)
+    m[np.nonzero(inside)[0], band[inside]] = 1.0
+    return m
+
+
+_BANDS = _band_matrix()
+_WINDOW = np.hanning(FP_FRAME).astype(np.float32)
+_BIT_WEIGHTS = (1 << np.arange(31, -1, -1, dtype=np.uint64)).astype(np.uint64)
+
+
+def fingerprint_samples(samples):
+    """uint32 sub-fingerprints of int16 mono samples at FP_RATE (one per hop
+    after the first frame; empty for clips shorter than two frames)."""
+    x = samples.astype(np.float32) / 32768.0
+    if x.size < FP_FRAME + FP_HOP:
+        return np.zeros(0, dtype=np.uint32)
+    frames = np.lib.stride_tricks.sliding_window_view(x, FP_FRAME)[::FP_HOP]
+    energy = np.empty((len(frames), _BANDS.shape[1]), dtype=np.float32)
+    for start in range(0, len(frames), FP_BLOCK):
+        spec = np.fft.rfft(frames[start:start + FP_BLOCK] * _WINDOW, axis=1)
+        energy[start:start + FP_BLOCK] = (spec.real ** 2 + spec.imag ** 2) @ _BANDS
+    np.maximum(energy, FP_FLOOR, out=energy)
+    d = energy[:, :-1] - energy[:, 1:]
+    bits = (d[1:] - d[:-1]) > 0
+    return (bits.astype(np.uint64) @ _BIT_WEIGHTS).astype(np.uint32)
+
+
+def _track_duration(info):
+    """Audio duration (s) from a probe_media() result, else the container's."""
+    return (info["audio"] or {}).get("duration") or info["duration"]
+
+
+def window_starts(duration):
+    """Start (s) of each FP_WINDOWS window in a track of `duration` seconds."""
+    room = max(duration - FP_WINDOW_SECONDS, 0.0)
+    return [frac * room for frac in FP_WINDOWS]
+
+
+def _decode_window(path, start):
+    """int16 FP_RATE mono PCM of FP_WINDOW_SECONDS from `start` (s), or None."""
+    cmd = [
+        "ffmpeg", "-nostdin", "-v", "error", *(["-ss", f"{start:.3f}"] if start else []),
+        "-i", str(path), "-t", f"{FP_WINDOW_SECONDS:g}",
+        "-vn", "-f", "s16le", "-acodec", "pcm_s16le", "-ar", str(FP_RATE), "-ac", "1",
+        "-",
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True)
+    except OSError:
+        return None
+    if result.returncode != 0 or not result.stdout:
+        return None
+    return np.frombuffer(result.stdout, dtype=np.int16)
+
+
+def fingerprint_audio(path, info=None):
+    """{duration, rms_db, bits} for one file's first audio stream, or None
+    when the file is missing, has no audio stream, cannot be probed, or does
+    not decode. bits is (len(FP_WINDOWS), hops) uint32: one row per window
+    of window_starts(duration), each decoded by its own seeking ffmpeg
+    process straight to FP_RATE mono PCM, so time and memory stay bounded
+    however long the file; rows are cut to the shortest window. rms_db is
+    the level over all windows. info: probe_media() of the file, if known;
+    a file it shows without an audio stream spawns nothing. Without it the
+    file is probed for the duration that places the windows."""
+    if info is None:
+        try:
+            info = probe_media(path)
+        except Exception:
+            return None
+    if info["audio"] is None:
+        return None
+    duration = _track_duration(info)
+    if not duration:
+        return None
+    decoded = {}
+    for start in window_starts(duration):
+        if start not in decoded:
+            decoded[start] = _decode_window(path, start)
+            if decoded[start] is None:
+                return None
+    windows = [fingerprint_samples(decoded[start]) for start in window_starts(duration)]
+    hops = min(w.size for w in windows)
+    if hops == 0:
+        return None
+    s = np.concatenate(list(decoded.values())).astype(np.int64)
+    rms = math.sqrt(int(np.dot(s, s)) / s.size) / 32768.0
+    return {"duration": float(duration),
+            "rms_db": 20.0 * math.log10(rms) if rms > 0 else -120.0,
+            "bits": np.stack([w[:hops] for w in windows])}
+
+
+def _popcount(x):
+    return int(np.unpackbits(x.view(np.uint8)).sum())
+
+
+def fingerprint_ber(a, b, max_shift=MAX_SHIFT, center=0):
+    """Bit error rate of two uint32 fingerprints at their best alignment
+    within center +/- max_shift hops (a[shift:] against b), over the
+    overlapping sub-fingerprints."""
+    best = 1.0
+    for shift in range(center - max_shift, center + max_shift + 1):
+        x, y = (a[shift:], b) if shift >= 0 else (a, b[-shift:])
+        n = min(x.size, y.size)
+        if n == 0:
+            continue
+        best = min(best, _popcount(np.bitwise_xor(x[:n], y[:n])) / (32.0 * n))
+    return best
+
+
+def track_ber(a, b, max_shift=MAX_SHIFT):
+    """Worst per-window fingerprint_ber of two fingerprint_audio() results.
+    Window starts follow each file's own duration, so each window's search
+    is centered on the offset their durations imply."""
+    worst = 0.0
+    for wa, wb, sa, sb in zip(a["bits"], b["bits"], window_starts(a["duration"]),
+                              window_starts(b["duration"])):
+        center = round((sb - sa) * FP_RATE / FP_HOP)
+        worst = max(worst, fingerprint_ber(wa, wb, max_shift, center))
+    return worst
+
+
+class FingerprintIndex(FeatureCache):
+    """Persistent fingerprint store, in its own table of a FeatureCache file
+    (stat keys). get()/put() fingerprints by file key; matches() lists the
+    indexed files whose track matches a fingerprint, oldest entry first."""
+
+    def __init__(self, path):
+        super().__init__(path, key_mode="stat")
+        self.conn.executescript(_SCHEMA)
+
+    def get_fingerprint(self, file_key):
+        row = self.conn.execute(
+            "SELECT duration, rms_db, bits FROM fingerprints WHERE file_key = ? AND version = ?",
+            (file_key, FP_VERSION),
+        ).fetchone()
+        if row is None:
+            self.misses["fingerprint"] += 1
+            return None
+        self.hits["fingerprint"] += 1
+        return {"duration": row[0], "rms_db": row[1],
+                "bits": np.frombuffer(row[2], dtype=np.uint32).reshape(len(FP_WINDOWS), -1)}
+
+    def put_fingerprint(self, file_key, path, fp):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO fingerprints (file_key, path, version, duration, rms_db, bits, added) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (file_key, os.path.abspath(path), FP_VERSION, fp["duration"], fp["rms_db"], fp["bits"].tobytes(),
+             time.time()),
+        )
+
+    def matches(self, fp, max_ber=DEFAULT_MAX_BER):
+        """[(file_key, path, ber)] of indexed files within DURATION_TOL_S of
+        fp's duration, LEVEL_TOL_DB of its level and max_ber of its bits
+        (track_ber), in the order they were added."""
+        out = []
+        for file_key, path, duration, bits in self.conn.execute(
+            "SELECT file_key, path, duration, bits FROM fingerprints WHERE version = ? AND duration BETWEEN ? AND ? "
+            "AND rms_db BETWEEN ? AND ? ORDER BY added, rowid",
+            (FP_VERSION, fp["duration"] - DURATION_TOL_S, fp["duration"] + DURATION_TOL_S,
+             fp["rms_db"] - LEVEL_TOL_DB, fp["rms_db"] + LEVEL_TOL_DB),
+        ):
+            ber = track_ber(fp, {"duration": duration,
+                                 "bits": np.frombuffer(bits, dtype=np.uint32).reshape(len(FP_WINDOWS), -1)})
+            if ber <= max_ber:
+                out.append((file_key, path, ber))
+        return out
+
+
+def add_fingerprint_args(parser):
+    """Register the shared --dedupe / --dedupe-ber / --fingerprint-index flags."""
+    parser.add_argument("--dedupe", action="store_true",
+                        help="Fingerprint each file's audio and reuse the result of an earlier file with the "
+                             "same track (reposted or re-encoded copies) instead of extracting it again")
+    parser.add_argument("--dedupe-ber", type=float, default=DEFAULT_MAX_BER,
+                        help=f"Max fingerprint bit error rate for --dedupe matches (default: {DEFAULT_MAX_BER})")
+    parser.add_argument("--fingerprint-index", default=None,
+                        help="Audio fingerprint index SQLite file (default: <output-dir>/_cache/"
+                             "audio_fingerprints.sqlite; point the audio and music pipelines at one path to "
+                             "share it; in memory with --no-cache)")
+
+
+def open_fingerprint_index(args):
+    """FingerprintIndex from the add_fingerprint_args flags, or None without
+    --dedupe. With --no-cache the index lives in memory for this run only."""
+    if not args.dedupe:
+        return None
+    if args.no_cache:
+        return FingerprintIndex(":memory:")
+    path = args.fingerprint_index or os.path.join(args.output_dir, "_cache", "audio_fingerprints.sqlite")
+    return FingerprintIndex(path)
+
+
+def fingerprint_files(paths, index, infos=None, max_workers=FINGERPRINT_WORKERS):
+    """[(file_key, fingerprint or None)] per path. Indexed fingerprints are
+    reused; the rest are computed max_workers at a time and indexed in path
+    order. infos: probe_media() per path (None where unknown), passed to
+    fingerprint_audio. Only the calling thread touches the index."""
+    infos = infos or [None] * len(paths)
+    keys = [index.file_key(p) for p in paths]
+    fps = [index.get_fingerprint(k) if k is not None else None for k in keys]
+    todo = [i for i, (k, fp) in enumerate(zip(keys, fps)) if k is not None and fp is None]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for i, fp in zip(todo, pool.map(lambda i: fingerprint_audio(paths[i], infos[i]), todo)):
+            fps[i] = fp
+            if fp is not None:
+                index.put_fingerprint(keys[i], paths[i], fp)
+    index.flush()
+    return list(zip(keys, fps))
+
+
+def find_audio_duplicates(index, entries, max_ber=DEFAULT_MAX_BER, lookup=None, infos=None,
+                          max_workers=FINGERPRINT_WORKERS):
+    """Map each pending file whose track matches an earlier one to its source.
+
+    entries: (key, abs_path, done) in run order. done entries already have
+    their results: they can be sources but are never duplicates. lookup(path)
+    returns the pipeline's stored result for an indexed file outside this
+    run (e.g. from its feature cache), or None. The source is the oldest
+    matching file whose result is available: an earlier entry of this run
+    that is not a duplicate itself, or a stored result. infos: probe_media()
+    per entry from the pipeline's probe pre-pass (None where unknown).
+    Returns {key: (source_path, ber, source_key or None, stored result or None)}."""
+    fps = fingerprint_files([path for _, path, _ in entries], index, infos, max_workers)
+    by_file, dups = {}, {}
+    for (key, path, done), (file_key, fp) in zip(entries, fps):
+        if fp is None:
+            continue
+        if not done:
+            for cand_key, cand_path, ber in index.matches(fp, max_ber):
+                source = by_file.get(cand_key)
+                if source is not None:
+                    if source not in dups:
+                        dups[key] = (cand_path, ber, source, None)
+                        break
+                    continue
+                if cand_key == file_key or lookup is None:
+                    continue
+                stored = lookup(cand_path)
+                if stored is not None:
+                    dups[key] = (cand_path, ber, None, stored)
+                    break
+        by_file.setdefault(file_key, key)
+    return dups
+
+
+def dedupe_summary(index, n_files, n_dups):
+    """One-line report of a dedupe pre-pass."""
+    where = "in memory" if index.path == ":memory:" else index.path
+    return (f"Dedupe: fingerprinted {n_files} files ({index.hits['fingerprint']} from index); "
+            f"{n_dups} reuse the result of a matching track -> {where}")
@@ -2,17 +2,34 @@
 Shared utilities for multimodal analysis scripts.
 
 Provides common functions used across pillow and opensmile pipelines:
-read_input, save_excel, derive_subject, merge_checkpoints.
+read_input, save_excel, derive_subject, merge_checkpoints, run_work_queue
+(with optional longest-first scheduling and its report), and the
+xlsx/parquet checkpoint writers (CheckpointWriter, SubjectStream).
 """
 
+import math
 import os
 import re
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 from openpyxl.styles import Alignment, Font
 from openpyxl.utils import get_column_letter
 
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+CHECKPOINT_FORMATS = ("xlsx", "parquet")
+
+# Rows buffered per parquet row group
+ROW_GROUP_ROWS = 2048
+
 
 def read_input(path, str_cols=None):
     """Read tabular input file, auto-detecting format by extension.
@@ -93,17 +110,364 @@ def derive_subject(row, file_col, group_col):
     return re.sub(r'[<>:"/\\|?*]', '_', val).strip('. ') or "default"
 
 
+def _timed_call(fn, task):
+    """(wall seconds, fn(task)) — timed inside the worker, so queueing and
+    result transfer are not counted."""
+    t0 = time.perf_counter()
+    out = fn(task)
+    return time.perf_counter() - t0, out
+
+
+def run_work_queue(pool, work, fn, on_subject_done, fail_result,
+                   max_in_flight, progress=None, on_task_done=None,
+                   costs=None, timings=None, on_deferred_done=None):
+    """Stream tasks from every subject through one long-lived pool.
+
+    Args:
+        pool: A concurrent.futures executor shared by all subjects.
+        work: {subject: [task, ...]} in submission order. A task is a list of
+            items; pool.submit(fn, task) must return one result per item.
+        fn: Task function (top-level or functools.partial for process pools).
+        on_subject_done: Called as on_subject_done(subject, results) as soon
+            as a subject's last item finishes; results are in item order.
+            Its return values are collected and returned.
+        fail_result: fail_result(exc) -> result for each item of a task whose
+            future raised.
+        max_in_flight: Upper bound on submitted-but-unfinished tasks, so the
+            queue never materializes every future at once.
+        progress: Optional tqdm-like bar updated per finished item.
+        on_task_done: Optional on_task_done(subject, start, part), called as
+            each task finishes with its results and the subject-relative
+            index of its first item. Returns the per-item values to keep for
+            on_subject_done (e.g. slimmed results once rows are on disk).
+            A value may instead be a Future the hook submitted to pool
+            (follow-up work, e.g. merging a video's segments); the item
+            then stays pending until it resolves.
+        costs: Optional {subject: [estimated cost per task]} parallel to
+            work. Tasks are then submitted longest-processing-time first
+            across all subjects (ties keep input order) instead of in input
+            order, so the biggest files never start last.
+        timings: Optional list; receives (subject, start, seconds) for each
+            task that returns, with seconds measured inside the worker.
+        on_deferred_done: on_deferred_done(subject, index, result), called
+            when a Future returned by on_task_done resolves (fail_result(exc)
+            if it raised); returns the value to keep for that item.
+            Required when on_task_done returns futures.
+    Returns:
+        List of on_subject_done return values, in completion order.
+    """
+    queue, queue_costs = [], []
+    results, remaining = {}, {}
+    for name, tasks in work.items():
+        start = 0
+        for i, task in enumerate(tasks):
+            queue.append((name, start, task))
+            queue_costs.append(costs[name][i] if costs is not None else 0.0)
+            start += len(task)
+        results[name] = [None] * start
+        remaining[name] = start
+    if costs is not None:
+        queue = [queue[i] for i in sorted(range(len(queue)), key=lambda i: -queue_costs[i])]
+
+    # Subjects with no items complete immediately
+    done_values = [on_subject_done(name, results.pop(name))
+                   for name in list(results) if remaining[name] == 0]
+
+    pending = iter(queue)
+    in_flight = {}
+    deferred = {}  # follow-up future -> (subject, item index)
+
+    def fill():
+        while len(in_flight) + len(deferred) < max_in_flight:
+            nxt = next(pending, None)
+            if nxt is None:
+                return
+            if timings is None:
+                in_flight[pool.submit(fn, nxt[2])] = nxt
+            else:
+                in_flight[pool.submit(_timed_call, fn, nxt[2])] = nxt
+
+    fill()
+    while in_flight or deferred:
+        finished, _ = wait([*in_flight, *deferred], return_when=FIRST_COMPLETED)
+        for future in finished:
+            if future in deferred:
+                name, i = deferred.pop(future)
+                try:
+                    value = future.result()
+                except Exception as e:
+                    value = fail_result(e)
+                results[name][i] = on_deferred_done(name, i, value)
+                n_done = 1
+            else:
+                name, start, task = in_flight.pop(future)
+                try:
+                    part = future.result()
+                    if timings is not None:
+                        seconds, part = part
+                        timings.append((name, start, seconds))
+                except Exception as e:
+                    part = [fail_result(e) for _ in task]
+                if on_task_done is not None:
+                    part = on_task_done(name, start, part)
+                    for i, value in enumerate(part, start):
+                        if isinstance(value, Future):
+                            deferred[value] = (name, i)
+                results[name][start:start + len(task)] = part
+                n_done = len(task) - sum(1 for v in part if isinstance(v, Future))
+            remaining[name] -= n_done
+            if progress is not None:
+                progress.update(n_done)
+            if remaining[name] == 0:
+                done_values.append(on_subject_done(name, results.pop(name)))
+        fill()
+    return done_values
+
+
+# ---------------------------------------------------------------------------
+# Longest-processing-time-first scheduling
+# ---------------------------------------------------------------------------
+
+SCHEDULES = ("input", "lpt")
+
+
+def add_schedule_args(parser):
+    """Register the shared --schedule flag."""
+    parser.add_argument("--schedule", choices=SCHEDULES, default="input",
+                        help="Submission order: input (default) or lpt (probe each file with ffprobe "
+                             "and submit the most expensive first; reports predicted vs actual times "
+                             "to _schedule.xlsx)")
+
+
+def schedule_report(entries, unit, path=None):
+    """Predicted vs actual task times for calibrating the cost model.
+
+    entries: [(subject, label, cost, seconds)] for the tasks that ran. The
+    cost model is relative, so seconds per cost unit is fitted by least
+    squares through the origin and each task's prediction is cost times that
+    rate. Writes one row per task to path (xlsx) if given and returns the
+    summary line: fitted rate, Pearson r, median relative error, and total
+    predicted vs actual worker time."""
+    if not entries:
+        return "Schedule: no timed tasks"
+    cost = np.array([e[2] for e in entries], dtype=np.float64)
+    actual = np.array([e[3] for e in entries], dtype=np.float64)
+    rate = float(cost @ actual / (cost @ cost)) if cost.any() else 0.0
+    predicted = cost * rate
+    error = np.abs(predicted - actual) / np.maximum(actual, 1e-3)
+    r = (float(np.corrcoef(cost, actual)[0, 1])
+         if len(entries) > 1 and cost.std() > 0 and actual.std() > 0 else float("nan"))
+    if path:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        save_excel(pd.DataFrame({
+            "subject": [e[0] for e in entries], "file": [e[1] for e in entries],
+            f"cost ({unit})": cost, "predicted_s": predicted, "actual_s": actual,
+            "error_pct": 100.0 * error,
+        }).sort_values("actual_s", ascending=False), path)
+    return (f"Schedule (lpt): {len(entries)} tasks, {rate:.4g} s per {unit} (fitted), r={r:.2f}, "
+            f"median error {100.0 * float(np.median(error)):.0f}%, predicted {predicted.sum():.1f} s vs "
+            f"actual {actual.sum():.1f} s of worker time" + (f" -> {path}" if path else ""))
+
+
+# ---------------------------------------------------------------------------
+# Checkpoint writers (xlsx / parquet)
+# ---------------------------------------------------------------------------
+
+def add_checkpoint_args(parser):
+    """Register the shared --checkpoint-format flag."""
+    parser.add_argument("--checkpoint-format", choices=CHECKPOINT_FORMATS, default="xlsx",
+                        help="Per-subject checkpoint format: xlsx (default) or parquet "
+                             "(streamed row groups, typed columns; Excel only at --merge)")
+
+
+def checkpoint_path(checkpoint_dir, name, fmt="xlsx"):
+    return os.path.join(checkpoint_dir, f"{name}.{fmt}")
+
+
+def checkpoint_done(checkpoint_dir, name):
+    """True if the subject has a checkpoint in any format (resume works
+    across --checkpoint-format changes)."""
+    return any(os.path.isfile(checkpoint_path(checkpoint_dir, name, fmt)) for fmt in CHECKPOINT_FORMATS)
+
+
+def _is_missing(v):
+    return v is None or v is pd.NA or (isinstance(v, float) and math.isnan(v))
+
+
+def _column_kind(name, s, str_cols, int_cols):
+    """Parquet column type, fixed on a checkpoint's first batch."""
+    if name in str_cols:
+        return "string"
+    if name in int_cols:
+        return "int"
+    if pd.api.types.is_bool_dtype(s):
+        return "bool"
+    if pd.api.types.is_numeric_dtype(s):
+        return "float"
+    # Object columns: decide from the values. Blank strings are Excel's
+    # missing value (e.g. absent EXIF tags).
+    values = [v for v in s if not (_is_missing(v) or (isinstance(v, str) and v == ""))]
+    inferred = pd.api.types.infer_dtype(values, skipna=True) if values else "empty"
+    if inferred == "boolean":
+        return "bool"
+    if inferred in ("empty", "integer", "floating", "mixed-integer-float", "decimal"):
+        return "float"
+    return "string"
+
+
+def _arrow_column(s, kind):
+    if kind == "string":
+        return pa.array([None if _is_missing(v) else str(v) for v in s], type=pa.string())
+    if kind == "bool":
+        return pa.array([None if _is_missing(v) else bool(v) for v in s], type=pa.bool_())
+    # Blank strings are Excel's missing value; anything else non-numeric raises
+    num = pd.to_numeric(s.replace("", np.nan))
+    if kind == "int":
+        return pa.array(num.astype("Int64"), type=pa.int64())
+    return pa.array(num.astype("float64"), type=pa.float64(), from_pandas=True)
+
+
+class CheckpointWriter:
+    """One checkpoint file, written batch by batch.
+
+    parquet: batches are buffered into row groups of ~ROW_GROUP_ROWS and
+    streamed to disk. Column types are fixed by the first batch (str_cols ->
+    string, int_cols -> int64, bool -> bool, other numerics -> float64,
+    other objects -> string); later batches must have the same columns.
+    xlsx: batches are concatenated and written with save_excel on close.
+
+    Either way the file is written as <path>.tmp and renamed on close, so a
+    checkpoint only exists once complete. No batches -> no file."""
+
+    def __init__(self, path, fmt="xlsx", str_cols=(), int_cols=(), row_group_rows=ROW_GROUP_ROWS):
+        if fmt not in CHECKPOINT_FORMATS:
+            raise ValueError(f"unknown checkpoint format: {fmt}; expected one of {list(CHECKPOINT_FORMATS)}")
+        if fmt == "parquet" and pq is None:
+            raise RuntimeError("parquet checkpoints need pyarrow. Run: pip install pyarrow")
+        self.path = path
+        self.fmt = fmt
+        self.str_cols = set(str_cols)
+        self.int_cols = set(int_cols)
+        self.row_group_rows = row_group_rows
+        self.rows = 0
+        self._tmp = path + ".tmp"
+        self._buffer = []
+        self._buffered = 0
+        self._schema = None
+        self._kinds = None
+        self._writer = None
+
+    def write(self, df):
+        if df.empty:
+            return
+        self._buffer.append(df)
+        self._buffered += len(df)
+        self.rows += len(df)
+        if self.fmt == "parquet" and self._buffered >= self.row_group_rows:
+            self._flush_row_group()
+
+    def _flush_row_group(self):
+        df = pd.concat(self._buffer, ignore_index=True) if len(self._buffer) > 1 else self._buffer[0]
+        self._buffer, self._buffered = [], 0
+        cols = list(df.columns)
+        if self._schema is None:
+            self._kinds = [_column_kind(c, df[c], self.str_cols, self.int_cols) for c in cols]
+            arrays = [_arrow_column(df[c], k) for c, k in zip(cols, self._kinds)]
+            self._schema = pa.schema([pa.field(c, a.type) for c, a in zip(cols, arrays)])
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._writer = pq.ParquetWriter(self._tmp, self._schema)
+        else:
+            if cols != self._schema.names:
+                raise ValueError(f"{self.path}: batch columns differ from the checkpoint schema "
+                                 f"(missing {[c for c in self._schema.names if c not in cols]}, "
+                                 f"extra {[c for c in cols if c not in self._schema.names]})")
+            arrays = [_arrow_column(df[c], k) for c, k in zip(cols, self._kinds)]
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self._schema))
+
+    def close(self):
+        """Finish and atomically publish the file. Returns rows written."""
+        if self.fmt == "parquet":
+            if self._buffer:
+                self._flush_row_group()
+            if self._writer is None:
+                return 0
+            self._writer.close()
+        else:
+            if not self._buffer:
+                return 0
+            df = pd.concat(self._buffer, ignore_index=True) if len(self._buffer) > 1 else self._buffer[0]
+            self._buffer = []
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            save_excel(df, Path(self._tmp))
+        os.replace(self._tmp, self.path)
+        return self.rows
+
+
+class SubjectStream:
+    """Streams one subject's per-item results to a CheckpointWriter in input
+    order. put(i, result) accepts results in any order; whenever the items
+    from the next unwritten position onward are complete, they are written
+    as one batch via to_frame(positions, results) and released."""
+
+    def __init__(self, writer, n_items, to_frame):
+        self.writer = writer
+        self.n_items = n_items
+        self.to_frame = to_frame
+        self.ok = 0
+        self._ready = {}
+        self._next = 0
+
+    def put(self, i, result):
+        self._ready[i] = result
+        self.ok += bool(result["ok"])
+        positions = []
+        while self._next in self._ready:
+            positions.append(self._next)
+            self._next += 1
+        if positions:
+            self.writer.write(self.to_frame(positions, [self._ready.pop(p) for p in positions]))
+
+    @property
+    def complete(self):
+        """True once every item has been written."""
+        return self._next == self.n_items
+
+    def close(self):
+        """Publish the checkpoint. Returns {total, ok, fail, path}."""
+        if self._next != self.n_items:
+            raise RuntimeError(f"{self.writer.path}: {self.n_items - self._next} results never arrived")
+        self.writer.close()
+        return {"total": self.n_items, "ok": self.ok, "fail": self.n_items - self.ok,
+                "path": self.writer.path}
+
+
+def _read_checkpoint(path, conv):
+    """Read one xlsx or parquet checkpoint; conv columns come back as strings."""
+    if path.suffix == ".parquet":
+        df = pd.read_parquet(path)
+        for c in conv:
+            if c in df.columns:
+                df[c] = df[c].map(lambda v: v if pd.isna(v) else str(v))
+        return df
+    return pd.read_excel(path, converters=conv)
+
+
 def merge_checkpoints(checkpoint_dir, output_path, file_col="file_path",
-                      exclude_prefix="_", dedup_cols=None):
-    """Merge all checkpoint xlsx files in a directory into one file.
+                      exclude_prefix="_", dedup_cols=None, optional_cols=None):
+    """Merge all checkpoint files (xlsx and parquet) in a directory into one
+    xlsx file.
 
     Args:
-        checkpoint_dir: Directory containing per-subject checkpoint xlsx files.
+        checkpoint_dir: Directory containing per-subject checkpoint files.
         output_path: Path for the merged output xlsx file.
         file_col: Column name used as default dedup key (default: "file_path").
         exclude_prefix: Skip files whose name starts with this prefix.
         dedup_cols: Columns for deduplication. Defaults to [file_col].
             Also read as strings (see read_input).
+        optional_cols: {column: fill value} for columns a newer version
+            writes on every run but older checkpoints lack. They are left
+            out of the schema check and filled in where missing, so a
+            resumed run can merge with checkpoints from before the upgrade.
     Returns:
         Tuple of (merged_df, stats_dict) with keys: files, rows, deduped.
     """
@@ -113,7 +477,8 @@ def merge_checkpoints(checkpoint_dir, output_path, file_col="file_path",
         print(f"  No checkpoint directory: {checkpoint_dir}", flush=True)
         return pd.DataFrame(), empty_stats
 
-    files = sorted(f for f in ckpt_path.glob("*.xlsx") if not f.name.startswith(exclude_prefix))
+    files = sorted(f for fmt in CHECKPOINT_FORMATS for f in ckpt_path.glob(f"*.{fmt}")
+                   if not f.name.startswith(exclude_prefix))
     if not files:
         print(f"  No checkpoints found in {checkpoint_dir}", flush=True)
         return pd.DataFrame(), empty_stats
@@ -122,10 +487,11 @@ def merge_checkpoints(checkpoint_dir, output_path, file_col="file_path",
     # silently drop, collapse, or null-pad assets.
     key_cols = dedup_cols if dedup_cols is not None else [file_col]
     conv = {c: str for c in key_cols if c != "frame_number"}
+    optional = dict(optional_cols or {})
     dfs, errors, schema = [], [], None
     for f in files:
         try:
-            df = pd.read_excel(f, converters=conv)
+            df = _read_checkpoint(f, conv)
         except Exception as e:
             errors.append(f"{f.name}: unreadable ({e})")
             continue
@@ -137,7 +503,7 @@ def merge_checkpoints(checkpoint_dir, output_path, file_col="file_path",
         if missing:
             errors.append(f"{f.name}: missing key column(s) {missing}")
             continue
-        cols = list(df.columns)
+        cols = [c for c in df.columns if c not in optional]
         if schema is None:
             schema = (f.name, cols)
         elif cols != schema[1]:
@@ -156,6 +522,13 @@ def merge_checkpoints(checkpoint_dir, output_path, file_col="file_path",
     if not dfs:
         return pd.DataFrame(), empty_stats
 
+    if optional:
+        # Fill what older checkpoints lack, in the column order of the
+        # checkpoint carrying the most optional columns
+        order = max((list(df.columns) for df in dfs), key=len)
+        order += [c for c in dict.fromkeys(c for df in dfs for c in df.columns) if c not in order]
+        dfs = [df.reindex(columns=order).fillna({c: optional[c] for c in order if c not in df.columns})
+               for df in dfs]
     merged = pd.concat(dfs, ignore_index=True)
     before = len(merged)
     merged = merged.drop_duplicates(subset=key_cols, keep="last")
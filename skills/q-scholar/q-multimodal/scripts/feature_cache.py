@@ -0,0 +1,166 @@
+"""
+Persistent per-file feature cache shared by the local pipelines.
+
+One SQLite file maps (file key, namespace) -> pickled feature values. The
+file key identifies the exact bytes of a media file: path + size + mtime by
+default, or a BLAKE2b content hash (`key_mode="content"`, survives moves and
+touch-without-change, costs one full read per file). The namespace names the
+extractor, the feature group, that group's code version, and every parameter
+that changes its values — so bumping a version or changing a parameter
+misses cleanly instead of returning stale values.
+
+Only the parent process touches the database (workers never do), so lookups
+and writes need no cross-process locking. Eviction is least-recently-used,
+bounded by max_bytes of stored values.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import time
+from collections import Counter
+
+DEFAULT_CACHE_MB = 1024
+KEY_MODES = {"stat", "content"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    file_key  TEXT NOT NULL,
+    namespace TEXT NOT NULL,
+    value     BLOB NOT NULL,
+    size      INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (file_key, namespace)
+);
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+"""
+
+
+def namespace(extractor, group, version, **params):
+    """Cache namespace: extractor/group/v<version>/<sorted params json>."""
+    return f"{extractor}/{group}/v{version}/{json.dumps(params, sort_keys=True, default=str)}"
+
+
+class FeatureCache:
+    """SQLite-backed feature cache with LRU eviction and hit/miss counters.
+
+    get()/put() are keyed by file_key() and a namespace(); call flush() at
+    natural checkpoints (e.g. after each subject) and close() at the end."""
+
+    def __init__(self, path, max_bytes=DEFAULT_CACHE_MB * 1024 * 1024, key_mode="stat"):
+        if key_mode not in KEY_MODES:
+            raise ValueError(f"unknown cache key mode: {key_mode}; expected one of {sorted(KEY_MODES)}")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.key_mode = key_mode
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+        self.hits = Counter()
+        self.misses = Counter()
+        self.evicted = 0
+        self._touched = {}
+
+    # -- keys -------------------------------------------------------------
+
+    def file_key(self, abs_path):
+        """Identity of the file's current contents, or None if it is missing."""
+        try:
+            st = os.stat(abs_path)
+        except OSError:
+            return None
+        if self.key_mode == "stat":
+            return f"stat:{os.path.abspath(abs_path)}:{st.st_size}:{st.st_mtime_ns}"
+        h = hashlib.blake2b(digest_size=20)
+        with open(abs_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        return f"blake2b:{h.hexdigest()}:{st.st_size}"
+
+    # -- lookups ------------------------------------------------------------
+
+    def get(self, file_key, ns, label=None):
+        """Cached value or None. label groups the hit/miss counters."""
+        label = label or ns.split("/", 2)[1]
+        row = self.conn.execute(
+            "SELECT value FROM entries WHERE file_key = ? AND namespace = ?", (file_key, ns)
+        ).fetchone()
+        if row is None:
+            self.misses[label] += 1
+            return None
+        self.hits[label] += 1
+        self._touched[(file_key, ns)] = time.time()
+        return pickle.loads(row[0])
+
+    def put(self, file_key, ns, value):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO entries (file_key, namespace, value, size, last_used) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (file_key, ns, blob, len(blob), time.time()),
+        )
+
+    # -- maintenance ------------------------------------------------------------
+
+    def flush(self):
+        """Persist LRU timestamps, evict down to ~90% of max_bytes, commit."""
+        if self._touched:
+            self.conn.executemany(
+                "UPDATE entries SET last_used = ? WHERE file_key = ? AND namespace = ?",
+                [(t, k, ns) for (k, ns), t in self._touched.items()],
+            )
+            self._touched.clear()
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total > self.max_bytes:
+            target = int(self.max_bytes * 0.9)
+            freed = 0
+            victims = []
+            for key, ns, size in self.conn.execute(
+                "SELECT file_key, namespace, size FROM entries ORDER BY last_used"
+            ):
+                if total - freed <= target:
+                    break
+                victims.append((key, ns))
+                freed += size
+            self.conn.executemany(
+                "DELETE FROM entries WHERE file_key = ? AND namespace = ?", victims)
+            self.evicted += len(victims)
+        self.conn.commit()
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def summary(self):
+        """One-line hit/miss report for the run summary."""
+        hits, misses = sum(self.hits.values()), sum(self.misses.values())
+        total = hits + misses
+        rate = f"{100.0 * hits / total:.1f}%" if total else "n/a"
+        size = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        groups = ", ".join(f"{g} {self.hits[g]}/{self.hits[g] + self.misses[g]}"
+                           for g in sorted(set(self.hits) | set(self.misses)))
+        line = (f"Cache: {hits} hits, {misses} misses ({rate} hit rate), "
+                f"{self.evicted} evicted, {size / 1e6:.1f} MB -> {self.path}")
+        return line + (f"\n  hits per group: {groups}" if groups else "")
+
+
+def add_cache_args(parser):
+    """Register the shared --cache / --no-cache / --cache-max-mb / --cache-key flags."""
+    parser.add_argument("--cache", default=None,
+                        help="Feature cache SQLite file (default: <output-dir>/_cache/features.sqlite)")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the persistent feature cache")
+    parser.add_argument("--cache-max-mb", type=float, default=DEFAULT_CACHE_MB,
+                        help=f"Evict least-recently-used entries above this size (default: {DEFAULT_CACHE_MB})")
+    parser.add_argument("--cache-key", choices=sorted(KEY_MODES), default="stat",
+                        help="File identity: stat (path+size+mtime, default) or content (BLAKE2b hash)")
+
+
+def open_cache(args):
+    """FeatureCache from the add_cache_args flags, or None with --no-cache."""
+    if args.no_cache:
+        return None
+    path = args.cache or os.path.join(args.output_dir, "_cache", "features.sqlite")
+    return FeatureCache(path, max_bytes=int(args.cache_max_mb * 1024 * 1024), key_mode=args.cache_key)
@@ -0,0 +1,337 @@
+"""
+Micro-benchmarks for the librosa music pipeline.
+
+Each subcommand times the current implementation against a reference
+(the previous implementation, kept here verbatim) on synthetic inputs, and
+reports how far the outputs drift from that reference.
+
+  graph     shared analysis graph (MusicContext: one STFT, mel, CQT and
+            HPSS per clip, only the nodes a feature set needs) vs one
+            librosa y= call per feature; also a regression check of every
+            output column per feature set
+  load      one long stereo AAC track: librosa.load vs the ffmpeg pipe
+            (--decode pipe) at each --resample-quality, and whole-track
+            analysis vs --excerpts windows; drift of samples and features
+  startup   worker startup with an empty numba cache (the JIT compile every
+            fresh process used to pay) vs a populated --numba-cache dir vs a
+            worker forked after the parent's warm-up; then the steady-state
+            time per clip, and a check that all three return identical
+            features
+
+Synthetic inputs only — no input files or CLI paths needed (graph builds
+its clips in memory; load writes its track, and startup its numba cache, to
+a temp directory and removes it afterwards; load needs ffmpeg and ffprobe).
+
+Usage: python bench_music.py graph [--clips 4] [--seconds 30] [--feature-sets scores curated full]
+       python bench_music.py load [--minutes 10] [--excerpts 3] [--excerpt-seconds 30]
+       python bench_music.py startup [--clips 4] [--seconds 30] [--feature-set curated]
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from music_features import (
+    RESAMPLE_QUALITY, VALID_FEATURE_SETS, _mean_std, analyze_music, analyze_signal, estimate_key_mode,
+    ffmpeg_resampler, librosa, load_audio, set_numba_cache_dir, warm_up,
+)
+
+
+# ---------------------------------------------------------------------------
+# graph
+# ---------------------------------------------------------------------------
+
+def _synthetic_clip(seed, seconds, sr=22050):
+    """A music-like mono clip: a chord progression of harmonic tones with
+    note envelopes, plus noise-burst drums on a steady beat."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sr)) / sr
+    bpm = rng.uniform(80, 150)
+    beat = 60.0 / bpm
+    root = 110.0 * 2 ** (rng.integers(0, 12) / 12)
+    y = np.zeros_like(t)
+    for bar, start in enumerate(np.arange(0, seconds, 4 * beat)):
+        degree = [0, 5, 7, 3][bar % 4]
+        seg = (t >= start) & (t < start + 4 * beat)
+        env = np.exp(-(t[seg] - start) / (2 * beat))
+        for interval in (0, 4, 7):
+            f = root * 2 ** ((degree + interval) / 12)
+            for h in (1, 2, 3):
+                y[seg] += 0.2 / h * env * np.sin(2 * np.pi * f * h * t[seg])
+    noise = rng.normal(0, 1, t.size)
+    for start in np.arange(0, seconds, beat):
+        hit = (t >= start) & (t < start + 0.08)
+        y[hit] += 0.3 * noise[hit] * np.exp(-(t[hit] - start) / 0.02)
+    return (y / np.abs(y).max() * 0.8).astype(np.float32)
+
+
+def _reference_analyze(y, sr, feature_set):
+    """analyze_signal as it was before the shared analysis graph: every
+    feature computes its own spectrogram from y."""
+    duration = float(len(y) / sr)
+
+    centroid = librosa.feature.spectral_centroid(y=y, sr=sr)
+    bandwidth = librosa.feature.spectral_bandwidth(y=y, sr=sr)
+    rolloff = librosa.feature.spectral_rolloff(y=y, sr=sr)
+    flatness = librosa.feature.spectral_flatness(y=y)
+    contrast = librosa.feature.spectral_contrast(y=y, sr=sr)
+    zcr = librosa.feature.zero_crossing_rate(y=y)
+    rms = librosa.feature.rms(y=y)
+
+    n_mfcc = 20 if feature_set == "full" else 13
+    mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=n_mfcc)
+    chroma = librosa.feature.chroma_cqt(y=y, sr=sr)
+    tonnetz = librosa.feature.tonnetz(y=y, sr=sr)
+
+    onset_env = librosa.onset.onset_strength(y=y, sr=sr)
+    tempo = librosa.beat.beat_track(onset_envelope=onset_env, sr=sr)[0]
+    onsets = librosa.onset.onset_detect(onset_envelope=onset_env, sr=sr)
+    onset_rate = float(len(onsets) / duration) if duration else 0.0
+    ac = librosa.autocorrelate(onset_env)
+    beat_strength = float(ac[1:].max() / ac[0]) if ac.size > 1 and ac[0] > 0 else 0.0
+
+    y_harm, y_perc = librosa.effects.hpss(y)
+    total_e = float(np.sum(y_harm ** 2) + np.sum(y_perc ** 2))
+    harmonic_ratio = float(np.sum(y_harm ** 2) / total_e) if total_e > 0 else float("nan")
+
+    key, mode, mode_conf = estimate_key_mode(chroma.mean(axis=1))
+
+    scores = {
+        "tempo_bpm": float(np.atleast_1d(tempo)[0]),
+        "onset_rate": onset_rate,
+        "beat_strength": beat_strength,
+        "rms_energy": float(np.mean(rms)),
+        "dynamic_range": float(np.std(rms)),
+        "spectral_centroid_hz": float(np.mean(centroid)),
+        "spectral_flatness": float(np.mean(flatness)),
+        "zcr": float(np.mean(zcr)),
+        "harmonic_ratio": harmonic_ratio,
+        "key": key,
+        "mode": mode,
+        "mode_confidence": mode_conf,
+        "duration_s": duration,
+    }
+    if feature_set == "scores":
+        return {"ok": True, "scores": scores, "raw": {}, "error": ""}
+
+    raw = {}
+    _mean_std("chroma", chroma, raw)
+    _mean_std("mfcc", mfcc, raw)
+    _mean_std("spectral_contrast", contrast, raw)
+    _mean_std("tonnetz", tonnetz, raw)
+    _mean_std("spectral_centroid", centroid, raw)
+    _mean_std("spectral_bandwidth", bandwidth, raw)
+    _mean_std("spectral_rolloff", rolloff, raw)
+    _mean_std("spectral_flatness", flatness, raw)
+    _mean_std("zcr", zcr, raw)
+    _mean_std("rms", rms, raw)
+    _mean_std("onset_strength", onset_env, raw)
+
+    if feature_set == "full":
+        _mean_std("mfcc_delta", librosa.feature.delta(mfcc), raw)
+        _mean_std("mfcc_delta2", librosa.feature.delta(mfcc, order=2), raw)
+        tgr = librosa.feature.tempogram_ratio(onset_envelope=onset_env, sr=sr)
+        _mean_std("tempogram_ratio", tgr, raw)
+
+    return {"ok": True, "scores": scores, "raw": raw, "error": ""}
+
+
+def _drift(ref, new):
+    """Largest relative difference over all numeric columns, and the column."""
+    worst = (0.0, "")
+    for tier in ("scores", "raw"):
+        for k, v in ref[tier].items():
+            w = new[tier].get(k)
+            if isinstance(v, str) or isinstance(w, str):
+                d = float(v != w)
+            elif np.isnan(v) and np.isnan(w):
+                d = 0.0
+            else:
+                d = abs(w - v) / max(abs(v), 1e-9)
+            worst = max(worst, (d, k))
+    if set(ref["raw"]) != set(new["raw"]):
+        worst = (float("inf"), "raw columns")
+    return worst
+
+
+def bench_graph(args):
+    sr = 22050
+    clips = [_synthetic_clip(i, args.seconds, sr) for i in range(args.clips)]
+    print(f"graph: {len(clips)} clips x {args.seconds:g}s at {sr} Hz", flush=True)
+    # Warm-up: numba JIT (librosa's and the HPSS median kernel) is paid once
+    # per process, not per clip
+    warm = clips[0][:10 * sr]
+    _reference_analyze(warm, sr, "full")
+    analyze_signal(warm, sr, "full")
+    failed = False
+    for feature_set in args.feature_sets:
+        t_ref = t_new = 0.0
+        worst = (0.0, "")
+        for y in clips:
+            t0 = time.perf_counter()
+            ref = _reference_analyze(y, sr, feature_set)
+            t1 = time.perf_counter()
+            new = analyze_signal(y, sr, feature_set)
+            t_new += time.perf_counter() - t1
+            t_ref += t1 - t0
+            if not new["ok"]:
+                worst = (float("inf"), new["error"])
+                break
+            worst = max(worst, _drift(ref, new))
+        failed |= worst[0] != 0
+        print(f"  {feature_set:<8}: reference {t_ref / len(clips):6.2f} s/clip   graph {t_new / len(clips):6.2f} "
+              f"s/clip  ({t_ref / t_new:4.1f}x); max relative drift {worst[0]:g}"
+              + (f" ({worst[1]})" if worst[0] else "") + f"  {'PASS' if worst[0] == 0 else 'FAIL'}", flush=True)
+    if failed:
+        sys.exit(1)
+
+
+# ---------------------------------------------------------------------------
+# load
+# ---------------------------------------------------------------------------
+
+def _write_long_track(path, minutes, rate=44100):
+    """A long stereo track: a different gliding tone per channel with a beat
+    of noise bursts, mixed with pink noise, AAC (so the decode is real work)."""
+    seconds = minutes * 60
+    tone = "0.3*sin(2*PI*({f}+40*sin(t/{p}))*t)*(0.5+0.5*gt(mod(t\\,0.5)\\,0.1))"  # lavfi-escaped commas
+    cmd = [
+        "ffmpeg", "-loglevel", "error", "-y",
+        "-f", "lavfi", "-i", f"aevalsrc={tone.format(f=220, p=7)}|{tone.format(f=330, p=5)}:s={rate}:d={seconds}",
+        "-f", "lavfi", "-i", f"anoisesrc=color=pink:amplitude=0.05:sample_rate={rate}:d={seconds}",
+        "-filter_complex", "[0:a][1:a]amix=inputs=2:duration=shortest[a]",
+        "-map", "[a]", "-ac", "2", "-c:a", "aac", "-b:a", "128k",
+        path,
+    ]
+    subprocess.run(cmd, check=True, capture_output=True)
+
+
+def bench_load(args):
+    sr = 22050
+    tmp = tempfile.mkdtemp(prefix="bench_music_")
+    try:
+        path = os.path.join(tmp, "long.m4a")
+        _write_long_track(path, args.minutes)
+        resampler = ffmpeg_resampler()
+        print(f"load: {args.minutes:g} min stereo AAC -> {sr} Hz mono, ffmpeg resampler {resampler}", flush=True)
+        load_audio(path, sr, duration=1.0)  # imports and resampler setup
+        t0 = time.perf_counter()
+        ref = load_audio(path, sr)
+        t_ref = time.perf_counter() - t0
+        print(f"  librosa  high  : {t_ref:6.2f} s", flush=True)
+        for decode in ("librosa", "pipe"):
+            for quality in RESAMPLE_QUALITY:
+                if (decode, quality) == ("librosa", "high"):
+                    continue
+                t0 = time.perf_counter()
+                y = load_audio(path, sr, decode=decode, resample_quality=quality, ffmpeg_resampler=resampler)
+                elapsed = time.perf_counter() - t0
+                n = min(y.size, ref.size)
+                print(f"  {decode:<8} {quality:<6}: {elapsed:6.2f} s  ({t_ref / elapsed:4.1f}x)  max |y - librosa high| "
+                      f"{float(np.abs(y[:n] - ref[:n]).max()):.2e}", flush=True)
+
+        # Whole track vs excerpts, both through the pipe (JIT warmed first)
+        analyze_signal(ref[:10 * sr], sr, "curated")
+        load = dict(decode="pipe", ffmpeg_resampler=resampler)
+        t0 = time.perf_counter()
+        whole = analyze_music(path, sr, "curated", **load)
+        t_whole = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        part = analyze_music(path, sr, "curated", excerpts=args.excerpts, excerpt_seconds=args.excerpt_seconds, **load)
+        t_part = time.perf_counter() - t0
+        print(f"  whole track: {t_whole:6.2f} s   {args.excerpts} x {args.excerpt_seconds:g} s excerpts: {t_part:6.2f} s "
+              f"({t_whole / t_part:4.1f}x) [{part['excerpt_windows']}]", flush=True)
+        drift = sorted(((abs(v - whole["scores"][k]) / max(abs(whole["scores"][k]), 1e-9), k)
+                        for k, v in part["scores"].items() if not isinstance(v, str) and k != "duration_s"),
+                       reverse=True)
+        print("  excerpt drift (relative): " + ", ".join(f"{k} {d:.3f}" for d, k in drift[:4])
+              + f"; key {whole['scores']['key']} {whole['scores']['mode']} -> {part['scores']['key']} "
+                f"{part['scores']['mode']}", flush=True)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# ---------------------------------------------------------------------------
+# startup
+# ---------------------------------------------------------------------------
+
+def _start_worker(cache_dir, feature_set, n_clips, seconds, sr=22050):
+    """One worker's life in a pool process: warm_up against cache_dir, then
+    the clips. Returns (warm-up stats, seconds per clip, results)."""
+    set_numba_cache_dir(cache_dir)
+    info = warm_up(sr, feature_set)
+    clips = [_synthetic_clip(i, seconds, sr) for i in range(n_clips)]
+    t0 = time.perf_counter()
+    results = [analyze_signal(y, sr, feature_set) for y in clips]
+    return info, (time.perf_counter() - t0) / n_clips, results
+
+
+def bench_startup(args):
+    tmp = tempfile.mkdtemp(prefix="bench_music_")
+    try:
+        cache_dir = os.path.join(tmp, "numba")
+        print(f"startup: feature_set={args.feature_set}, then {args.clips} clips x {args.seconds:g}s", flush=True)
+        ref, failed = None, False
+        for label, method in (("spawned, empty numba cache", "spawn"), ("spawned, populated cache", "spawn"),
+                              ("forked after parent warm-up", "fork")):
+            if method == "fork":
+                set_numba_cache_dir(cache_dir)
+                warm_up(22050, args.feature_set)
+            # A fresh single-worker pool per row, so each starts from nothing
+            # but what its start method carries over
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context(method)) as pool:
+                info, per_clip, results = pool.submit(_start_worker, cache_dir, args.feature_set,
+                                                      args.clips, args.seconds).result()
+            ref = ref or results
+            same = results == ref and all(r["ok"] for r in results)
+            failed |= not same
+            print(f"  {label:<28}: warm-up {info['seconds']:6.2f} s (numba: {info['cache_hits']} from cache, "
+                  f"{info['compiled']} compiled); steady state {per_clip:5.2f} s/clip  "
+                  f"{'PASS' if same else 'FAIL'}", flush=True)
+        if failed:
+            sys.exit(1)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the librosa music pipeline")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p = sub.add_parser("graph", help="Shared analysis graph vs one librosa call per feature")
+    p.add_argument("--clips", type=int, default=4, help="Number of synthetic clips")
+    p.add_argument("--seconds", type=float, default=30.0, help="Length of each clip")
+    p.add_argument("--feature-sets", nargs="+", default=["scores", "curated", "full"],
+                   choices=sorted(VALID_FEATURE_SETS), help="Feature sets to time")
+    p.set_defaults(func=bench_graph)
+
+    p = sub.add_parser("load", help="librosa.load vs ffmpeg pipe decode; whole track vs excerpts")
+    p.add_argument("--minutes", type=float, default=10.0, help="Length of the synthetic track")
+    p.add_argument("--excerpts", type=int, default=3, help="--excerpts windows to compare")
+    p.add_argument("--excerpt-seconds", type=float, default=30.0, help="Length of each window")
+    p.set_defaults(func=bench_load)
+
+    p = sub.add_parser("startup", help="Worker startup: empty vs populated numba cache vs forked warm worker")
+    p.add_argument("--clips", type=int, default=4, help="Synthetic clips each worker analyzes after warm-up")
+    p.add_argument("--seconds", type=float, default=30.0, help="Length of each clip")
+    p.add_argument("--feature-set", default="curated", choices=sorted(VALID_FEATURE_SETS),
+                   help="Feature set the workers warm up and run")
+    p.set_defaults(func=bench_startup)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
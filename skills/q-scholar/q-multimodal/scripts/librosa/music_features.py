@@ -27,6 +27,25 @@ one row of features per clip. Output has two tiers:
 --feature-set: curated (default, both tiers) | scores (tier 1 only) |
 full (curated + delta/delta-delta MFCC, 20 MFCCs, tempogram-ratio).
 
+Each clip goes through one MusicContext: the STFT, mel spectrogram, CQT
+chroma, and HPSS are computed once, on demand, and shared by every feature
+that uses them, so a feature set pays only for the nodes its columns need.
+
+--decode pipe has one ffmpeg process decode each file straight to --sr mono
+(no native-rate decode, no separate resampler); --resample-quality trades
+resampler accuracy for speed. Excerpt mode analyzes part of each track:
+--offset/--duration one window, or --excerpts N evenly spaced windows of
+--excerpt-seconds, pooled into one row; excerpt_windows records them.
+
+--dedupe fingerprints each file's audio first; a file whose track matches
+an earlier file (a re-encode, or a copy under another name) reuses that
+file's row instead of being analyzed again (see audio_fingerprint.py).
+
+The run warms up once before the first file (librosa imports and numba JIT,
+compiled into the --numba-cache dir) and every worker again in its pool
+initializer; the summary reports that startup apart from steady-state
+throughput.
+
 Generic - no project-specific names. All paths come from CLI args.
 
 Tip: set PYTHONUNBUFFERED=1 or use `python -u` for live progress in
@@ -35,27 +54,62 @@ background/piped execution.
 
 import argparse
 import os
-from concurrent.futures import ProcessPoolExecutor, as_completed
+import shutil
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import cached_property
 from pathlib import Path
 
 import sys
+
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
 import numpy as np
 import pandas as pd
-from common import read_input, save_excel, derive_subject, merge_checkpoints
+from common import (
+    read_input, derive_subject, merge_checkpoints, run_work_queue, source_columns,
+    add_checkpoint_args, checkpoint_path, checkpoint_done, CheckpointWriter, SubjectStream,
+    add_schedule_args, schedule_report,
+)
+from audio_fingerprint import add_fingerprint_args, dedupe_summary, find_audio_duplicates, open_fingerprint_index
+from feature_cache import add_cache_args, namespace, open_cache
+from media_probe import (
+    COST_UNITS, add_probe_args, estimate_cost, open_probe_cache, probe_media, probe_subjects, probe_summary,
+)
 from tqdm import tqdm
 
 try:
     import librosa
+    import numba  # librosa dependency
 except ImportError:
-    librosa = None
+    librosa = numba = None
 
 AUDIO_EXTENSIONS = {".wav", ".mp3", ".flac", ".ogg", ".m4a", ".aac",
                     ".mp4", ".mov", ".mkv", ".webm"}
 
 VALID_FEATURE_SETS = {"curated", "scores", "full"}
 
+# --decode: librosa (soundfile/audioread at the native rate, then librosa's
+# resampler) or pipe (one ffmpeg process decodes straight to --sr mono).
+DECODE_MODES = ["librosa", "pipe"]
+
+# --resample-quality -> librosa res_type, and for --decode pipe the ffmpeg
+# soxr precision (bits) or, in ffmpeg builds without libsoxr, the swr filter
+# length. "high" is librosa's default; ffmpeg's soxr at 20 bits matches it to
+# ~1e-8, while swr's wider transition band shifts the top spectral-contrast
+# band on tonal clips.
+RESAMPLE_QUALITY = {
+    "high": ("soxr_hq", 20, 32),
+    "medium": ("soxr_mq", 16, 16),
+    "low": ("soxr_lq", 15, 8),
+}
+
+# Defaults of the loader options (load_options); only options that differ
+# from these enter the cache namespace.
+LOAD_DEFAULTS = {"decode": "librosa", "resample_quality": "high", "ffmpeg_resampler": "",
+                 "offset": 0.0, "duration": 0.0, "excerpts": 0, "excerpt_seconds": 30.0}
+
 NOTE_NAMES = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
 
 # Krumhansl-Kessler key profiles (major, minor): perceptual weights for the 12
@@ -72,6 +126,28 @@ SCORE_COLS = [
     "key", "mode", "mode_confidence", "duration_s",
 ]
 
+# Tier-2 blocks: (name, rows) in analyze_music order; n_mfcc depends on the set.
+# tempogram_ratio rows follow librosa's default factor list (13).
+TEMPOGRAM_RATIO_ROWS = 13
+
+
+def raw_columns(feature_set):
+    """Sorted tier-2 column names a successful file yields for feature_set."""
+    if feature_set == "scores":
+        return []
+    n_mfcc = 20 if feature_set == "full" else 13
+    blocks = [("chroma", 12), ("mfcc", n_mfcc), ("spectral_contrast", 7), ("tonnetz", 6),
+              ("spectral_centroid", 1), ("spectral_bandwidth", 1), ("spectral_rolloff", 1),
+              ("spectral_flatness", 1), ("zcr", 1), ("rms", 1), ("onset_strength", 1)]
+    if feature_set == "full":
+        blocks += [("mfcc_delta", n_mfcc), ("mfcc_delta2", n_mfcc),
+                   ("tempogram_ratio", TEMPOGRAM_RATIO_ROWS)]
+    cols = []
+    for name, n in blocks:
+        stems = [f"{name}_{i}" for i in range(n)] if n > 1 else [name]
+        cols += [f"{stem}_{stat}" for stem in stems for stat in ("mean", "std")]
+    return sorted(cols)
+
 
 # ---------------------------------------------------------------------------
 # Key / mode estimation
@@ -111,13 +187,285 @@ def _mean_std(name, mat, out):
         out[f"{stem}_std"] = float(np.std(mat[i]))
 
 
-def analyze_music(abs_path, sr, feature_set):
-    """Extract music features from one audio file. Returns {ok, scores, raw, error}."""
+# HPSS median-filter width (frames for the harmonic filter, bins for the
+# percussive one), as in librosa.effects.hpss.
+HPSS_KERNEL = 31
+
+
+def _sliding_median_rows(padded, k, out):
+    """out[r, j] = median(padded[r, j:j + k]) for odd k. Keeps one sorted
+    window per row and moves a single value in and out per step, so a row
+    costs O(n * k) comparisons instead of a selection per output."""
+    h = k // 2
+    for r in range(padded.shape[0]):
+        row = padded[r]
+        win = np.sort(row[:k])
+        out[r, 0] = win[h]
+        for j in range(1, out.shape[1]):
+            old, new = row[j - 1], row[j + k - 1]
+            i = np.searchsorted(win, old)
+            if new > old:
+                while i < k - 1 and win[i + 1] < new:
+                    win[i] = win[i + 1]
+                    i += 1
+            else:
+                while i > 0 and win[i - 1] > new:
+                    win[i] = win[i - 1]
+                    i -= 1
+            win[i] = new
+            out[r, j] = win[h]
+
+
+if numba is not None:
+    _sliding_median_rows = numba.njit(cache=True)(_sliding_median_rows)
+
+
+def median_filter_axis(S, k, axis):
+    """Median filter of width k along one axis of a 2-D array, with
+    scipy.ndimage's "reflect" edges: the same values as
+    median_filter(S, size=<k along axis>, mode="reflect"), ~8x faster."""
+    x = np.ascontiguousarray(np.moveaxis(S, axis, -1))
+    padded = np.pad(x, ((0, 0), (k // 2, k // 2)), mode="symmetric")
+    out = np.empty_like(x)
+    _sliding_median_rows(padded, k, out)
+    return np.moveaxis(out, -1, axis)
+
+
+class MusicContext:
+    """Lazy, compute-once analysis graph for one loaded clip.
+
+    Each node is derived on first access from the nodes it depends on and
+    memoized: the complex STFT feeds the magnitude (all spectral
+    descriptors) and HPSS; the power mel spectrogram in dB feeds MFCC and
+    the onset envelope; the CQT chroma feeds key/mode and tonnetz. Features
+    receive these through librosa's S= / chroma= / onset_envelope=
+    parameters with librosa's default frame settings, so values match the
+    per-feature y= calls, while a feature set evaluates only the nodes its
+    columns use."""
+
+    def __init__(self, y, sr):
+        self.y = y
+        self.sr = sr
+
+    @cached_property
+    def stft(self):
+        return librosa.stft(self.y)
+
+    @cached_property
+    def magphase(self):
+        return librosa.magphase(self.stft)
+
+    @property
+    def magnitude(self):
+        return self.magphase[0]
+
+    @cached_property
+    def mel_db(self):
+        return librosa.power_to_db(librosa.feature.melspectrogram(S=self.magnitude ** 2, sr=self.sr))
+
+    @cached_property
+    def chroma(self):
+        return librosa.feature.chroma_cqt(y=self.y, sr=self.sr)  # 12 pitch classes
+
+    @cached_property
+    def onset_env(self):
+        return librosa.onset.onset_strength(S=self.mel_db, sr=self.sr)
+
+    @cached_property
+    def centroid(self):
+        return librosa.feature.spectral_centroid(S=self.magnitude, sr=self.sr)
+
+    @cached_property
+    def flatness(self):
+        return librosa.feature.spectral_flatness(S=self.magnitude)
+
+    @cached_property
+    def zcr(self):
+        return librosa.feature.zero_crossing_rate(y=self.y)
+
+    @cached_property
+    def rms(self):
+        return librosa.feature.rms(y=self.y)
+
+    def mfcc(self, n_mfcc):
+        return librosa.feature.mfcc(S=self.mel_db, sr=self.sr, n_mfcc=n_mfcc)
+
+    @cached_property
+    def hpss(self):
+        """(y_harm, y_perc): librosa.effects.hpss on the shared STFT, with
+        the median filters from median_filter_axis."""
+        S, phase = self.magphase
+        harm = median_filter_axis(S, HPSS_KERNEL, axis=-1)
+        perc = median_filter_axis(S, HPSS_KERNEL, axis=-2)
+        mask_harm = librosa.util.softmask(harm, perc, power=2.0, split_zeros=True)
+        mask_perc = librosa.util.softmask(perc, harm, power=2.0, split_zeros=True)
+        return tuple(librosa.istft((S * mask) * phase, dtype=self.y.dtype, length=len(self.y))
+                     for mask in (mask_harm, mask_perc))
+
+
+def ffmpeg_resampler():
+    """"soxr" when the ffmpeg on PATH is built with libsoxr, else "swr"."""
     try:
-        y, sr = librosa.load(abs_path, sr=sr, mono=True)
+        conf = subprocess.run(["ffmpeg", "-hide_banner", "-buildconf"], capture_output=True, text=True).stdout
+    except OSError:
+        return "swr"
+    return "soxr" if "--enable-libsoxr" in conf else "swr"
+
+
+def load_audio(abs_path, sr, decode="librosa", resample_quality="high", ffmpeg_resampler="swr",
+               offset=0.0, duration=0.0):
+    """Mono float32 samples at sr, from offset for duration seconds (0: to
+    the end). decode="pipe" has ffmpeg seek and resample (with
+    ffmpeg_resampler) in one process, reads a float WAV from its stdout,
+    and averages the channels; "librosa" is librosa.load."""
+    res_type, precision, filter_size = RESAMPLE_QUALITY[resample_quality]
+    if decode == "librosa":
+        return librosa.load(abs_path, sr=sr, mono=True, offset=offset, duration=duration or None,
+                            res_type=res_type)[0]
+    cmd = ["ffmpeg", "-nostdin", "-v", "error"]
+    if offset:
+        cmd += ["-ss", f"{offset:g}"]
+    cmd += ["-i", str(abs_path)]
+    if duration:
+        cmd += ["-t", f"{duration:g}"]
+    resample = (f"aresample={sr}:resampler=soxr:precision={precision}" if ffmpeg_resampler == "soxr"
+                else f"aresample={sr}:filter_size={filter_size}")
+    cmd += ["-vn", "-af", resample, "-c:a", "pcm_f32le", "-f", "wav", "-"]
+    result = subprocess.run(cmd, capture_output=True)
+    if result.returncode != 0:
+        lines = result.stderr.decode(errors="replace").strip().splitlines()
+        raise RuntimeError(lines[-1] if lines else f"ffmpeg exited with {result.returncode}")
+    return _wav_f32_mono(result.stdout)
+
+
+def _wav_f32_mono(data):
+    """Samples of a float32 WAV byte stream, averaged over channels like
+    librosa.to_mono (ffmpeg's own downmix weights channels by 1/sqrt(2)).
+    Piped output leaves the data size unset, so data runs to the end."""
+    channels, pos = 1, 12
+    while pos + 8 <= len(data):
+        chunk, size = data[pos:pos + 4], int.from_bytes(data[pos + 4:pos + 8], "little")
+        if chunk == b"fmt ":
+            channels = int.from_bytes(data[pos + 10:pos + 12], "little")
+        elif chunk == b"data":
+            body = data[pos + 8:]
+            samples = np.frombuffer(body[:len(body) // (4 * channels) * 4 * channels], dtype="<f4")
+            if channels == 1:
+                return samples.copy()
+            return samples.reshape(-1, channels).T.mean(axis=0)
+        pos += 8 + size + (size & 1)
+    raise RuntimeError("ffmpeg produced no audio data")
+
+
+def excerpt_starts(track_duration, excerpts, excerpt_seconds):
+    """Start times of `excerpts` evenly spaced windows of excerpt_seconds:
+    window i is centered in the i-th of `excerpts` equal slices of the
+    range a window can start in. [0.0] (the whole track) when the windows
+    would cover it anyway or its length is unknown."""
+    if not track_duration or excerpts * excerpt_seconds >= track_duration:
+        return [0.0]
+    span = track_duration - excerpt_seconds
+    return [round(span * (i + 0.5) / excerpts, 1) for i in range(excerpts)]
+
+
+def pool_windows(results, weights):
+    """Combine per-window results (all ok) into one, weighting by samples.
+
+    Means and rates are weighted means, `_std` columns and dynamic_range
+    are the pooled std (from each window's std and mean), duration_s is
+    the total, tempo_bpm the median, and key/mode the weighted vote, with
+    mode_confidence averaged over the windows that agree with it."""
+    w = np.asarray(weights, dtype=float) / float(np.sum(weights))
+
+    def mean(values):
+        return float(np.dot(w, values))
+
+    def pooled_std(stds, means):
+        stds, means = np.asarray(stds, dtype=float), np.asarray(means, dtype=float)
+        m = np.dot(w, means)
+        return float(np.sqrt(max(np.dot(w, stds ** 2 + means ** 2) - m ** 2, 0.0)))
+
+    first = results[0]
+    scores = {}
+    for col in SCORE_COLS:
+        if col in ("key", "mode", "mode_confidence"):
+            continue
+        values = [r["scores"][col] for r in results]
+        if col == "duration_s":
+            scores[col] = float(np.sum(values))
+        elif col == "tempo_bpm":
+            scores[col] = float(np.median(values))
+        elif col == "dynamic_range":
+            scores[col] = pooled_std(values, [r["scores"]["rms_energy"] for r in results])
+        else:
+            scores[col] = mean(values)
+    votes = {}
+    for wi, r in zip(w, results):
+        if r["scores"]["key"]:
+            kv = (r["scores"]["key"], r["scores"]["mode"])
+            votes[kv] = votes.get(kv, 0.0) + wi
+    if votes:
+        best = max(votes, key=votes.get)
+        agree = [(wi, r["scores"]["mode_confidence"]) for wi, r in zip(w, results)
+                 if (r["scores"]["key"], r["scores"]["mode"]) == best]
+        scores["key"], scores["mode"] = best
+        scores["mode_confidence"] = float(sum(wi * c for wi, c in agree) / sum(wi for wi, _ in agree))
+    else:
+        scores["key"], scores["mode"], scores["mode_confidence"] = "", "", float("nan")
+
+    raw = {}
+    for col in first["raw"]:
+        values = [r["raw"][col] for r in results]
+        if col.endswith("_std"):
+            raw[col] = pooled_std(values, [r["raw"][col[:-4] + "_mean"] for r in results])
+        else:
+            raw[col] = mean(values)
+    return {"ok": True, "scores": {c: scores[c] for c in SCORE_COLS}, "raw": raw, "error": ""}
+
+
+def analyze_music(abs_path, sr, feature_set, decode="librosa", resample_quality="high", ffmpeg_resampler="",
+                  offset=0.0, duration=0.0, excerpts=0, excerpt_seconds=30.0, track_duration=None):
+    """Extract music features from one audio file. Returns {ok, scores, raw,
+    error}, plus excerpt_windows ("start-end;..." seconds) when offset,
+    duration, or excerpts restrict the analysis to part of the track.
+
+    With excerpts, each window is loaded and analyzed on its own (windows
+    that are silent or too short are skipped) and the results are pooled
+    (pool_windows). track_duration places the windows; without it the
+    track is measured first (ffprobe with decode="pipe")."""
+    load = dict(decode=decode, resample_quality=resample_quality, ffmpeg_resampler=ffmpeg_resampler)
+    try:
+        if excerpts:
+            if track_duration is None:
+                track_duration = (probe_media(abs_path)["duration"] if decode == "pipe" and shutil.which("ffprobe")
+                                  else librosa.get_duration(path=abs_path))
+            windows = [(start, excerpt_seconds) for start in excerpt_starts(track_duration, excerpts, excerpt_seconds)]
+            if windows == [(0.0, excerpt_seconds)]:
+                windows = [(0.0, 0.0)]
+        else:
+            windows = [(offset, duration)]
+        clips = [(start, load_audio(abs_path, sr, offset=start, duration=length, **load))
+                 for start, length in windows]
     except Exception as e:
         return {"ok": False, "scores": {}, "raw": {}, "error": f"load failed: {e}"}
 
+    if not (excerpts or offset or duration):
+        return analyze_signal(clips[0][1], sr, feature_set)
+    results, used = [], []
+    for start, y in clips:
+        r = analyze_signal(y, sr, feature_set)
+        if r["ok"]:
+            results.append(r)
+            used.append((start, y.size))
+    if not results:
+        return dict(r, excerpt_windows="")
+    result = results[0] if len(results) == 1 else pool_windows(results, [n for _, n in used])
+    result["excerpt_windows"] = ";".join(f"{start:.1f}-{start + n / sr:.1f}" for start, n in used)
+    return result
+
+
+def analyze_signal(y, sr, feature_set):
+    """Features of one loaded mono clip. Returns {ok, scores, raw, error}."""
     if y.size == 0 or float(np.max(np.abs(y))) < 1e-5:
         return {"ok": False, "scores": {}, "raw": {}, "error": "empty or silent"}
     if y.size < sr * 0.1:  # < 100 ms: functionals are unreliable
@@ -125,24 +473,10 @@ def analyze_music(abs_path, sr, feature_set):
 
     try:
         duration = float(len(y) / sr)
-
-        # Frame-wise spectral / energy descriptors
-        centroid = librosa.feature.spectral_centroid(y=y, sr=sr)
-        bandwidth = librosa.feature.spectral_bandwidth(y=y, sr=sr)
-        rolloff = librosa.feature.spectral_rolloff(y=y, sr=sr)
-        flatness = librosa.feature.spectral_flatness(y=y)
-        contrast = librosa.feature.spectral_contrast(y=y, sr=sr)  # 7 sub-bands
-        zcr = librosa.feature.zero_crossing_rate(y=y)
-        rms = librosa.feature.rms(y=y)
-
-        # Timbre / tonal
-        n_mfcc = 20 if feature_set == "full" else 13
-        mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=n_mfcc)
-        chroma = librosa.feature.chroma_cqt(y=y, sr=sr)  # 12 pitch classes
-        tonnetz = librosa.feature.tonnetz(y=y, sr=sr)    # 6-dim tonal centroid
+        ctx = MusicContext(y, sr)
 
         # Rhythm
-        onset_env = librosa.onset.onset_strength(y=y, sr=sr)
+        onset_env = ctx.onset_env
         tempo = librosa.beat.beat_track(onset_envelope=onset_env, sr=sr)[0]
         onsets = librosa.onset.onset_detect(onset_envelope=onset_env, sr=sr)
         onset_rate = float(len(onsets) / duration) if duration else 0.0
@@ -151,21 +485,21 @@ def analyze_music(abs_path, sr, feature_set):
         beat_strength = float(ac[1:].max() / ac[0]) if ac.size > 1 and ac[0] > 0 else 0.0
 
         # Harmonic balance: harmonic energy / total energy (HPSS)
-        y_harm, y_perc = librosa.effects.hpss(y)
+        y_harm, y_perc = ctx.hpss
         total_e = float(np.sum(y_harm ** 2) + np.sum(y_perc ** 2))
         harmonic_ratio = float(np.sum(y_harm ** 2) / total_e) if total_e > 0 else float("nan")
 
-        key, mode, mode_conf = estimate_key_mode(chroma.mean(axis=1))
+        key, mode, mode_conf = estimate_key_mode(ctx.chroma.mean(axis=1))
 
         scores = {
             "tempo_bpm": float(np.atleast_1d(tempo)[0]),
             "onset_rate": onset_rate,
             "beat_strength": beat_strength,
-            "rms_energy": float(np.mean(rms)),
-            "dynamic_range": float(np.std(rms)),
-            "spectral_centroid_hz": float(np.mean(centroid)),
-            "spectral_flatness": float(np.mean(flatness)),
-            "zcr": float(np.mean(zcr)),
+            "rms_energy": float(np.mean(ctx.rms)),
+            "dynamic_range": float(np.std(ctx.rms)),
+            "spectral_centroid_hz": float(np.mean(ctx.centroid)),
+            "spectral_flatness": float(np.mean(ctx.flatness)),
+            "zcr": float(np.mean(ctx.zcr)),
             "harmonic_ratio": harmonic_ratio,
             "key": key,
             "mode": mode,
@@ -175,17 +509,21 @@ def analyze_music(abs_path, sr, feature_set):
         if feature_set == "scores":
             return {"ok": True, "scores": scores, "raw": {}, "error": ""}
 
+        # Tier-2 only: timbre, contrast, tonal centroid, spectral shape
+        S = ctx.magnitude
+        n_mfcc = 20 if feature_set == "full" else 13
+        mfcc = ctx.mfcc(n_mfcc)
         raw = {}
-        _mean_std("chroma", chroma, raw)
+        _mean_std("chroma", ctx.chroma, raw)
         _mean_std("mfcc", mfcc, raw)
-        _mean_std("spectral_contrast", contrast, raw)
-        _mean_std("tonnetz", tonnetz, raw)
-        _mean_std("spectral_centroid", centroid, raw)
-        _mean_std("spectral_bandwidth", bandwidth, raw)
-        _mean_std("spectral_rolloff", rolloff, raw)
-        _mean_std("spectral_flatness", flatness, raw)
-        _mean_std("zcr", zcr, raw)
-        _mean_std("rms", rms, raw)
+        _mean_std("spectral_contrast", librosa.feature.spectral_contrast(S=S, sr=sr), raw)  # 7 sub-bands
+        _mean_std("tonnetz", librosa.feature.tonnetz(chroma=ctx.chroma, sr=sr), raw)  # 6-dim tonal centroid
+        _mean_std("spectral_centroid", ctx.centroid, raw)
+        _mean_std("spectral_bandwidth", librosa.feature.spectral_bandwidth(S=S, sr=sr, centroid=ctx.centroid), raw)
+        _mean_std("spectral_rolloff", librosa.feature.spectral_rolloff(S=S, sr=sr), raw)
+        _mean_std("spectral_flatness", ctx.flatness, raw)
+        _mean_std("zcr", ctx.zcr, raw)
+        _mean_std("rms", ctx.rms, raw)
         _mean_std("onset_strength", onset_env, raw)
 
         if feature_set == "full":
@@ -200,29 +538,124 @@ def analyze_music(abs_path, sr, feature_set):
         return {"ok": False, "scores": {}, "raw": {}, "error": str(e)}
 
 
-def _worker(args):
-    """Top-level wrapper so ProcessPoolExecutor can pickle the call."""
-    idx, abs_path, sr, feature_set = args
-    return idx, analyze_music(abs_path, sr, feature_set)
+def _worker(task):
+    """Top-level work-queue task so ProcessPoolExecutor can pickle the call.
+    task: list of (abs_path, sr, feature_set, load options); returns one
+    result per item. A worker's first result also carries its warm-up
+    stats (worker_start), which the parent pops before storing it."""
+    results = [analyze_music(abs_path, sr, feature_set, **load) for abs_path, sr, feature_set, load in task]
+    if _WORKER_START and results:
+        results[0] = dict(results[0], worker_start=dict(_WORKER_START))
+        _WORKER_START.clear()
+    return results
+
+
+def _task_failed(exc):
+    return {"ok": False, "scores": {}, "raw": {}, "error": str(exc)}
+
+
+# ---------------------------------------------------------------------------
+# Worker warm-up and the numba cache
+# ---------------------------------------------------------------------------
+
+# Length of the synthetic clip warm_up runs through analyze_signal
+WARMUP_SECONDS = 3.0
+
+# Set by _init_worker in each pool process; reported with its first result
+_WORKER_START = {}
+
+
+def set_numba_cache_dir(path):
+    """Point numba's on-disk cache (librosa's cache=True functions and the
+    HPSS median kernel) at path. Call before any librosa submodule is
+    imported; worker processes inherit it through the environment."""
+    os.makedirs(path, exist_ok=True)
+    os.environ["NUMBA_CACHE_DIR"] = path
+    numba.core.config.reload_config()
+    # The kernel's cache locator was fixed when this module was imported
+    _sliding_median_rows.enable_caching()
+
+
+def numba_cache_stats():
+    """(loaded from the on-disk cache, compiled) counts of the numba
+    signatures this process holds for librosa and the median kernel."""
+    dispatchers = [_sliding_median_rows]
+    for name, module in list(sys.modules.items()):
+        if name.startswith("librosa") and module is not None:
+            dispatchers += [obj for obj in list(vars(module).values())
+                            if isinstance(obj, numba.core.registry.CPUDispatcher)]
+    hits = compiled = 0
+    for d in {id(d): d for d in dispatchers}.values():
+        n_hits = sum(d.stats.cache_hits.values())
+        hits += n_hits
+        compiled += len(d.signatures) - n_hits
+    return hits, compiled
+
+
+def warm_up(sr, feature_set):
+    """Run a synthetic clip (a pulsed tone) through analyze_signal so that
+    librosa's lazy imports and numba functions are loaded, or compiled and
+    written to the numba cache, before real files arrive.
+    Returns {seconds, cache_hits, compiled} for this call."""
+    before = numba_cache_stats()
+    t0 = time.perf_counter()
+    t = np.arange(int(WARMUP_SECONDS * sr)) / sr
+    y = 0.3 * np.sin(2 * np.pi * 220.0 * t) * (np.sin(2 * np.pi * 2.0 * t) > 0)
+    analyze_signal(y.astype(np.float32), sr, feature_set)
+    hits, compiled = numba_cache_stats()
+    return {"seconds": time.perf_counter() - t0,
+            "cache_hits": hits - before[0], "compiled": compiled - before[1]}
+
+
+def _init_worker(sr, feature_set, pool_started):
+    """ProcessPoolExecutor initializer: warm the worker up before it takes
+    its first task. Forked workers inherit the parent's warm state, so this
+    is near-free there; spawned ones load from the numba cache."""
+    _WORKER_START.update(warm_up(sr, feature_set), ready=time.time() - pool_started)
+
+
+def startup_report(parent, starts, pool_started, pool_done, n_files):
+    """Summary lines separating one-time startup (warm-ups, numba compile
+    or cache load) from steady-state throughput once a worker is ready."""
+    numba_dir = os.environ.get("NUMBA_CACHE_DIR") or "numba default"
+    lines = [f"Startup: warm-up {parent['seconds']:.1f} s (numba: {parent['cache_hits']} from cache, "
+             f"{parent['compiled']} compiled -> {numba_dir})"]
+    if starts:
+        warm = sorted(s["seconds"] for s in starts)
+        lines[0] += (f"; {len(starts)} workers ready after {max(s['ready'] for s in starts):.1f} s "
+                     f"(warm-up {warm[len(warm) // 2]:.2f} s each)")
+        steady = pool_done - (pool_started + min(s["ready"] for s in starts))
+        lines.append(f"Steady state: {n_files} files in {steady:.1f} s"
+                     + (f" = {n_files / steady:.2f} files/s" if steady > 0 else ""))
+    return "\n".join(lines)
 
 
 # ---------------------------------------------------------------------------
 # DataFrame construction and subject processing
 # ---------------------------------------------------------------------------
 
-def build_output_df(rows, results, id_cols=None, file_col="file_path"):
-    """Merge source id columns with tier-1 scores + tier-2 raw features."""
+def build_output_df(rows, results, id_cols=None, file_col="file_path", raw_cols=None):
+    """Merge source id columns with tier-1 scores + tier-2 raw features.
+
+    raw_cols fixes the tier-2 column list (streamed batches must share one
+    schema); by default it is the union over results. reused_from names
+    the file whose result a row reuses (--dedupe), else blank.
+    excerpt_windows lists the analyzed windows (excerpt mode), else blank;
+    both are written on every run so all checkpoints share one schema."""
     source_df = pd.DataFrame(rows)
     keep = [c for c in (id_cols or [file_col]) if c in source_df.columns]
     source_df = source_df[keep]
 
-    raw_cols = sorted({c for r in results for c in r.get("raw", {})})
+    if raw_cols is None:
+        raw_cols = sorted({c for r in results for c in r.get("raw", {})})
 
     out_rows = []
     for r in results:
         row = {s: r.get("scores", {}).get(s, np.nan) for s in SCORE_COLS}
         for c in raw_cols:
             row[c] = r.get("raw", {}).get(c, np.nan)
+        row["excerpt_windows"] = r.get("excerpt_windows", "")
+        row["reused_from"] = r.get("reused_from", "")
         row["ok"] = r["ok"]
         out_rows.append(row)
 
@@ -231,38 +664,81 @@ def build_output_df(rows, results, id_cols=None, file_col="file_path"):
                       feature_df.reset_index(drop=True)], axis=1)
 
 
-def process_subject(name, subject_df, base_dir, file_col, max_workers,
-                    output_dir, sr, feature_set, id_cols=None):
-    """Process all audio files for one subject, save checkpoint.
+def subject_tasks(rows, base_dir, file_col, sr, feature_set, load=None):
+    """One single-file work-queue task per row. load: analyze_music loader
+    options (load_options)."""
+    return [[(os.path.join(base_dir, str(row.get(file_col, ""))), sr, feature_set, dict(load or {}))]
+            for row in rows]
 
-    Uses ProcessPoolExecutor: librosa is CPU-bound (NumPy/FFT), so processes
-    parallelize better than threads here (unlike the openSMILE pipeline, where
-    work happens in a separate native binary)."""
-    rows = subject_df.to_dict("records")
-    results = [None] * len(rows)
 
-    tasks = []
-    for i, row in enumerate(rows):
-        abs_path = os.path.join(base_dir, str(row.get(file_col, "")))
-        tasks.append((i, abs_path, sr, feature_set))
+def load_options(args):
+    """analyze_music loader options from the CLI flags. The ffmpeg resampler
+    is detected once, here, and only for --decode pipe."""
+    load = {name: getattr(args, name) for name in LOAD_DEFAULTS if name != "ffmpeg_resampler"}
+    load["ffmpeg_resampler"] = ffmpeg_resampler() if args.decode == "pipe" else ""
+    return load
 
-    with ProcessPoolExecutor(max_workers=max_workers) as pool:
-        futures = [pool.submit(_worker, t) for t in tasks]
-        with tqdm(total=len(rows), desc=f"  {name}", position=1, leave=False) as bar:
-            for future in as_completed(futures):
-                idx, res = future.result()
-                results[idx] = res
-                bar.update(1)
 
-    out_df = build_output_df(rows, results, id_cols, file_col=file_col)
-    ckpt_dir = os.path.join(output_dir, "checkpoints")
-    os.makedirs(ckpt_dir, exist_ok=True)
-    out_path = os.path.join(ckpt_dir, f"{name}.xlsx")
-    save_excel(out_df, out_path)
+def excerpt_mode(load):
+    """True when the loader options analyze only part of each track."""
+    return bool(load and (load["offset"] or load["duration"] or load["excerpts"]))
 
-    ok_count = sum(1 for r in results if r["ok"])
-    return {"name": name, "total": len(rows), "ok": ok_count,
-            "fail": len(results) - ok_count, "path": out_path}
+
+# ---------------------------------------------------------------------------
+# Persistent feature cache
+# ---------------------------------------------------------------------------
+
+# Bump when the computation of a tier changes, so older cached values miss.
+CACHE_VERSIONS = {"scores": 1, "raw": 1}
+
+
+def _cache_namespaces(sr, feature_set, load=None):
+    """Tier -> namespace. Scores do not depend on the feature set; the raw
+    block does (and is empty for --feature-set scores). Loader options that
+    differ from LOAD_DEFAULTS key both tiers, so default runs keep their
+    entries; excerpt runs also cache the windows they used."""
+    params = {k: v for k, v in (load or {}).items() if k in LOAD_DEFAULTS and v != LOAD_DEFAULTS[k]}
+    ns = {"scores": namespace("music", "scores", CACHE_VERSIONS["scores"], sr=sr, **params)}
+    if feature_set != "scores":
+        ns["raw"] = namespace("music", "raw", CACHE_VERSIONS["raw"], sr=sr, feature_set=feature_set, **params)
+    if excerpt_mode(load):
+        ns["excerpt_windows"] = namespace("music", "excerpt_windows", CACHE_VERSIONS["scores"], sr=sr, **params)
+    return ns
+
+
+def cache_lookup(cache, abs_path, sr, feature_set, load=None):
+    """Returns (file_key, cached result or None). A result is only reused
+    when every tier this feature set needs is cached; otherwise the whole
+    file is recomputed (the tiers share one load and one set of spectra)."""
+    key = cache.file_key(abs_path)
+    if key is None:
+        return None, None
+    tiers = {tier: cache.get(key, ns, label=tier)
+             for tier, ns in _cache_namespaces(sr, feature_set, load).items()}
+    if any(v is None for v in tiers.values()):
+        return key, None
+    result = {"ok": True, "scores": tiers["scores"], "raw": tiers.get("raw", {}), "error": ""}
+    if "excerpt_windows" in tiers:
+        result["excerpt_windows"] = tiers["excerpt_windows"]
+    return key, result
+
+
+def cache_store(cache, file_key, result, sr, feature_set, load=None):
+    """Store each tier of one successful result."""
+    for tier, ns in _cache_namespaces(sr, feature_set, load).items():
+        cache.put(file_key, ns, result[tier])
+
+
+def open_subject_stream(name, rows, output_dir, feature_set, id_cols=None, file_col="file_path",
+                        fmt="xlsx"):
+    """SubjectStream that writes one subject's checkpoint, in row order, as
+    results arrive."""
+    path = checkpoint_path(os.path.join(output_dir, "checkpoints"), name, fmt)
+    writer = CheckpointWriter(path, fmt, str_cols=source_columns(id_cols, file_col)
+                              + ["key", "mode", "excerpt_windows", "reused_from"])
+    raw_cols = raw_columns(feature_set)
+    return SubjectStream(writer, len(rows), lambda positions, results: build_output_df(
+        [rows[i] for i in positions], results, id_cols, file_col=file_col, raw_cols=raw_cols))
 
 
 # ---------------------------------------------------------------------------
@@ -272,7 +748,9 @@ def process_subject(name, subject_df, base_dir, file_col, max_workers,
 def _run_merge(args):
     ckpt_dir = os.path.join(args.output_dir, "checkpoints")
     out_path = os.path.join(args.output_dir, "_music_features.xlsx")
-    _, stats = merge_checkpoints(ckpt_dir, out_path, file_col=args.file_col)
+    # Checkpoints from before --excerpt-seconds / --dedupe lack these
+    _, stats = merge_checkpoints(ckpt_dir, out_path, file_col=args.file_col,
+                                 optional_cols={"excerpt_windows": "", "reused_from": ""})
     if stats["files"]:
         print(f"Merged {stats['files']} checkpoints -> {out_path} ({stats['rows']} rows)", flush=True)
 
@@ -289,9 +767,32 @@ def main():
     parser.add_argument("--feature-set", default="curated",
                         help="curated (default) | scores (tier-1 only) | full (adds delta MFCC, 20 MFCC, tempogram-ratio)")
     parser.add_argument("--sr", type=int, default=22050, help="Target load sample rate (mono)")
+    parser.add_argument("--decode", choices=DECODE_MODES, default="librosa",
+                        help="How audio is loaded: librosa (soundfile/audioread at the native rate, then "
+                             "resampled) or pipe (one ffmpeg process decodes straight to --sr mono; needs "
+                             "ffmpeg) (default: librosa)")
+    parser.add_argument("--resample-quality", choices=list(RESAMPLE_QUALITY), default="high",
+                        help="Resampler quality: high (default), medium, or low (faster). soxr_hq/mq/lq with "
+                             "--decode librosa; with --decode pipe, ffmpeg's soxr at 20/16/15 bits (or swr "
+                             "filter length 32/16/8 when ffmpeg lacks libsoxr)")
+    parser.add_argument("--offset", type=float, default=0.0, help="Start analysis this many seconds into each file")
+    parser.add_argument("--duration", type=float, default=0.0,
+                        help="Analyze at most this many seconds of each file (default: to the end)")
+    parser.add_argument("--excerpts", type=int, default=0,
+                        help="Analyze N evenly spaced windows of --excerpt-seconds per file and pool them, "
+                             "instead of the whole file (default: 0, whole file)")
+    parser.add_argument("--excerpt-seconds", type=float, default=30.0, help="Length of each --excerpts window")
     parser.add_argument("--max-workers", type=int, default=8, help="Number of concurrent worker processes")
+    parser.add_argument("--numba-cache", default=None,
+                        help="numba JIT cache directory, shared by runs and workers "
+                             "(default: <output-dir>/_cache/numba; --no-cache keeps numba's default)")
     parser.add_argument("--limit", type=int, default=0, help="Smoke-test: only first N rows")
     parser.add_argument("--subjects", nargs="*", default=None, help="Process only these subjects")
+    add_checkpoint_args(parser)
+    add_cache_args(parser)
+    add_probe_args(parser)
+    add_schedule_args(parser)
+    add_fingerprint_args(parser)
     parser.add_argument("--preview", action="store_true", help="Dry run: show pending subjects and exit")
     args = parser.parse_args()
 
@@ -301,6 +802,10 @@ def main():
         parser.error("--base-dir is required when --input is specified")
     if args.feature_set not in VALID_FEATURE_SETS:
         parser.error(f"Unknown feature set: {args.feature_set}. Available: {sorted(VALID_FEATURE_SETS)}")
+    if args.excerpts and (args.offset or args.duration):
+        parser.error("--excerpts cannot be combined with --offset/--duration")
+    if min(args.offset, args.duration, args.excerpts) < 0 or args.excerpt_seconds <= 0:
+        parser.error("--offset, --duration, --excerpts, and --excerpt-seconds must not be negative")
 
     if args.merge and not args.input:
         _run_merge(args)
@@ -312,6 +817,14 @@ def main():
     if not os.path.isfile(args.input):
         print(f"Input file not found: {args.input}", flush=True)
         return
+    for needed, flag in ((args.schedule == "lpt", "--schedule lpt"), (args.dedupe, "--dedupe")):
+        if needed and shutil.which("ffprobe") is None:
+            print(f"Not found on PATH: ffprobe (needed by {flag})", flush=True)
+            return
+    for needed, flag in ((args.decode == "pipe", "--decode pipe"), (args.dedupe, "--dedupe")):
+        if needed and shutil.which("ffmpeg") is None:
+            print(f"Not found on PATH: ffmpeg (needed by {flag})", flush=True)
+            return
 
     df = read_input(args.input)
     print(f"Loaded {len(df)} rows from {args.input}", flush=True)
@@ -338,7 +851,7 @@ def main():
     ckpt_dir = os.path.join(args.output_dir, "checkpoints")
     os.makedirs(ckpt_dir, exist_ok=True)
     pending = {name: g for name, g in sorted(groups.items())
-               if not os.path.isfile(os.path.join(ckpt_dir, f"{name}.xlsx"))}
+               if not checkpoint_done(ckpt_dir, name)}
     print(f"  {len(pending)} subjects pending ({len(groups) - len(pending)} already done)", flush=True)
 
     if args.preview or not pending:
@@ -346,19 +859,182 @@ def main():
             print(f"  {name}: {len(g)} files", flush=True)
         return
 
-    summaries = []
-    for name in tqdm(sorted(pending.keys()), desc="Subjects", position=0):
-        group_df = pending[name].drop(columns=["_subject"])
-        summary = process_subject(
-            name, group_df, args.base_dir, args.file_col, args.max_workers,
-            args.output_dir, args.sr, args.feature_set, args.id_cols,
-        )
-        summaries.append(summary)
+    # One process pool and one work queue across all subjects: librosa is
+    # CPU-bound (NumPy/FFT), so processes parallelize better than threads here
+    # (unlike the openSMILE pipeline, where work happens in a separate native
+    # binary). Rows stream into each subject's checkpoint as files finish; the
+    # checkpoint is published as soon as the subject's last file finishes.
+    # Cache lookups run in this process only; cached files never reach the pool.
+    # With ffprobe on PATH the rest are probed once through the shared probe
+    # cache, and files with no audio stream are resolved here, before any
+    # decoder is spawned.
+    # The probe's durations also place --excerpts windows, so workers need
+    # not measure each track first.
+    cache = open_cache(args)
+    probe_cache = open_probe_cache(args)
+    index = open_fingerprint_index(args)
+    load = load_options(args)
+    analyzed_s = args.excerpts * args.excerpt_seconds or args.duration
+    print(f"Decode: {args.decode} (resample quality {args.resample_quality}"
+          + (f", ffmpeg {load['ffmpeg_resampler']}" if load["ffmpeg_resampler"] else "") + ")"
+          + (f"; excerpts: {args.excerpts} x {args.excerpt_seconds:g} s" if args.excerpts else "")
+          + (f"; window: {args.offset:g} s + {args.duration:g} s" if args.offset or args.duration else ""),
+          flush=True)
+    if args.numba_cache or not args.no_cache:
+        set_numba_cache_dir(args.numba_cache or os.path.join(args.output_dir, "_cache", "numba"))
+    rows_by_subject = {name: pending[name].drop(columns=["_subject"]).to_dict("records")
+                       for name in sorted(pending)}
+    work, plans, positions, streams = {}, {}, {}, {}
+    for name, rows in rows_by_subject.items():
+        stream = open_subject_stream(name, rows, args.output_dir, args.feature_set, args.id_cols,
+                                     file_col=args.file_col, fmt=args.checkpoint_format)
+        tasks = subject_tasks(rows, args.base_dir, args.file_col, args.sr, args.feature_set, load)
+        plan = [(None, None)] * len(rows)
+        if cache is not None:
+            plan = [cache_lookup(cache, task[0][0], args.sr, args.feature_set, load) for task in tasks]
+        for i, (_, cached) in enumerate(plan):
+            if cached is not None:
+                stream.put(i, cached)
+        positions[name] = [i for i, (_, cached) in enumerate(plan) if cached is None]
+        work[name] = [tasks[i] for i in positions[name]]
+        plans[name], streams[name] = plan, stream
+
+    summaries, queue_done = [], set()
+
+    def finish(name):
+        # A subject is published once its own tasks are done and every
+        # duplicate waiting on another subject's file has arrived
+        if name not in queue_done or not streams[name].complete:
+            return
+        queue_done.discard(name)
+        for d in (rows_by_subject, plans, positions):
+            d.pop(name)
+        summary = {"name": name, **streams.pop(name).close()}
+        if cache is not None:
+            cache.flush()
+        subj_bar.update(1)
         tqdm.write(f"  {summary['name']}: {summary['ok']}/{summary['total']} ok -> {summary['path']}")
+        summaries.append(summary)
+
+    def deliver(name, i, r):
+        """Store and stream one result, then hand it to the duplicates
+        waiting on it. Reused results are not stored under the duplicate's
+        own key, so a later run without --dedupe computes it."""
+        key = plans[name][i][0]
+        if r["ok"] and cache is not None and key is not None and "reused_from" not in r:
+            cache_store(cache, key, r, args.sr, args.feature_set, load)
+        streams[name].put(i, r)
+        for dup_name, dup_i, reused_from in waiting.pop((name, i), ()):
+            deliver(dup_name, dup_i, dict(r, reused_from=reused_from))
+            finish(dup_name)
+
+    waiting = {}
+    costs = {name: [0.0] * len(tasks) for name, tasks in work.items()}
+    probed = {}
+    if shutil.which("ffprobe") is not None:
+        infos = probe_subjects({name: [task[0][0] for task in tasks] for name, tasks in work.items()}, probe_cache)
+        print(probe_summary(probe_cache, sum(len(t) for t in work.values())), flush=True)
+        for name, tasks in work.items():
+            keep = []
+            for i, task, info in zip(positions[name], tasks, infos[name]):
+                if info is not None and info["audio"] is None:
+                    deliver(name, i, _task_failed(RuntimeError("no audio stream")))
+                else:
+                    probed[name, i] = info
+                    cost = estimate_cost(info, "music")
+                    if args.excerpts and info is not None and info["duration"]:
+                        task[0][3]["track_duration"] = info["duration"]
+                    keep.append((i, task, min(cost, analyzed_s) if analyzed_s else cost))
+            positions[name] = [i for i, _, _ in keep]
+            work[name] = [task for _, task, _ in keep]
+            costs[name] = [c for _, _, c in keep]
+    # Copies of an earlier file's track (in this run, or cached by an
+    # earlier one) reuse its result and never reach the pool; copies of a
+    # file still queued wait for it. Fingerprinting runs after the probe, so
+    # files without an audio stream never spawn a decode for it.
+    if index is not None:
+        entries = [((name, i), os.path.join(args.base_dir, str(row.get(args.file_col, ""))),
+                    plans[name][i][1] is not None)
+                   for name, rows in rows_by_subject.items() for i, row in enumerate(rows)
+                   if plans[name][i][1] is not None or (name, i) in probed]
+        lookup = None if cache is None else (
+            lambda path: cache_lookup(cache, path, args.sr, args.feature_set, load)[1])
+        dups = find_audio_duplicates(index, entries, args.dedupe_ber, lookup,
+                                     infos=[probed.get(key) for key, _, _ in entries])
+        for (name, i), (source_path, _, source, stored) in dups.items():
+            reused_from = os.path.relpath(source_path, args.base_dir)
+            if source is not None and plans[source[0]][source[1]][1] is not None:
+                stored = plans[source[0]][source[1]][1]
+            if stored is not None:
+                deliver(name, i, dict(stored, reused_from=reused_from))
+            else:
+                waiting.setdefault(source, []).append((name, i, reused_from))
+        for name in positions:
+            keep = [(i, task, cost) for i, task, cost in zip(positions[name], work[name], costs[name])
+                    if (name, i) not in dups]
+            positions[name] = [i for i, _, _ in keep]
+            work[name] = [task for _, task, _ in keep]
+            costs[name] = [c for _, _, c in keep]
+        print(dedupe_summary(index, len(entries), len(dups)), flush=True)
+    timings = None
+    if args.schedule == "lpt":
+        files = {name: [str(rows_by_subject[name][i].get(args.file_col, "")) for i in positions[name]]
+                 for name in work}
+        timings = []
+        print(f"Schedule: lpt over {sum(len(c) for c in costs.values())} files "
+              f"({sum(sum(c) for c in costs.values()):.0f} {COST_UNITS['music']})", flush=True)
+
+    # Warm up here before the pool starts: the JIT compile (or numba cache load) happens once
+    # and fills the cache, forked workers inherit the warm state, and each
+    # worker's initializer then warms it before its first task, so startup
+    # cost stays out of the per-file timings and the steady-state rate.
+    n_files = sum(len(t) for t in work.values())
+    parent = warm_up(args.sr, args.feature_set) if n_files else None
+
+    subj_bar = tqdm(total=len(work), desc="Subjects", position=0)
+    file_bar = tqdm(total=n_files,
+                    desc="Files", position=1, leave=False)
+
+    starts = []
+
+    def on_task_done(name, start, results):
+        for i, r in zip(positions[name][start:start + len(results)], results):
+            if "worker_start" in r:
+                starts.append(r.pop("worker_start"))
+            deliver(name, i, r)
+        return [None] * len(results)
+
+    def on_subject_done(name, _):
+        queue_done.add(name)
+        finish(name)
+
+    pool_started = time.time()
+    with ProcessPoolExecutor(max_workers=args.max_workers, initializer=_init_worker,
+                             initargs=(args.sr, args.feature_set, pool_started)) as pool:
+        run_work_queue(pool, work, _worker, on_subject_done, _task_failed,
+                       max_in_flight=args.max_workers * 2, progress=file_bar,
+                       on_task_done=on_task_done,
+                       costs=costs if timings is not None else None, timings=timings)
+        pool_done = time.time()
+    file_bar.close()
+    subj_bar.close()
 
     total_ok = sum(s["ok"] for s in summaries)
     total_fail = sum(s["fail"] for s in summaries)
     print(f"\nDone: {len(summaries)} subjects, {total_ok} ok, {total_fail} failed", flush=True)
+    if parent is not None:
+        print(startup_report(parent, starts, pool_started, pool_done, n_files), flush=True)
+    if timings is not None:
+        entries = [(name, files[name][start], costs[name][start], seconds) for name, start, seconds in timings]
+        print(schedule_report(entries, COST_UNITS["music"], os.path.join(args.output_dir, "_schedule.xlsx")),
+              flush=True)
+    if cache is not None:
+        print(cache.summary(), flush=True)
+        cache.close()
+    if probe_cache is not None:
+        probe_cache.close()
+    if index is not None:
+        index.close()
 
     if args.merge:
         _run_merge(args)
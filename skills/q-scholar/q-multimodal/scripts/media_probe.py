@@ -0,0 +1,187 @@
+"""
+ffprobe stream metadata, its persistent cache, and the per-file cost model.
+
+`probe_media` runs one ffprobe per file and returns its duration plus the
+first video and audio stream (codec, size, rotation, frame rate, sample
+rate, channels). `probe_files` is the probe service the video, openSMILE
+and librosa pipelines share: it looks each file up in a persistent cache
+keyed by path + size + mtime (a FeatureCache file, by default one per
+output root so all pipelines writing under it reuse each other's probes)
+and probes only the misses, a bounded number at a time. `estimate_cost`
+turns metadata into a relative cost in the unit the pipeline's work scales
+with — megapixels decoded for video, seconds of audio for openSMILE and
+librosa — so work can be submitted longest-processing-time first (LPT).
+"""
+
+import json
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from feature_cache import FeatureCache, namespace
+
+# Relative cost unit per pipeline kind (see estimate_cost)
+COST_UNITS = {"video": "Mpx decoded", "audio": "s audio", "music": "s audio"}
+
+PROBE_WORKERS = 8
+
+# Bump when probe_media's output changes, so older cached probes miss.
+PROBE_VERSION = 1
+PROBE_NS = namespace("ffprobe", "streams", PROBE_VERSION)
+
+
+def _rate(value):
+    """ffprobe rational ("30000/1001") -> float, 0.0 if missing."""
+    try:
+        num, _, den = str(value).partition("/")
+        return float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def probe_media(path):
+    """{duration, video, audio} for one file. video is {codec, width, height,
+    rotation, fps, duration} and audio {codec, sample_rate, channels,
+    duration} for the first stream of each kind, or None when absent.
+    width/height are coded (rotation in degrees is applied by the caller);
+    stream durations may be None. duration (s) is the container's, else the
+    longest stream's, else None. Raises RuntimeError if ffprobe fails."""
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-show_entries",
+        "stream=codec_type,codec_name,width,height,avg_frame_rate,r_frame_rate,"
+        "sample_rate,channels,duration:stream_tags=rotate:stream_side_data=rotation:format=duration",
+        "-of", "json",
+        str(path),
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe failed: {result.stderr.strip()}")
+    probed = json.loads(result.stdout or "{}")
+    video = audio = None
+    durations = []
+    for stream in probed.get("streams") or []:
+        kind = stream.get("codec_type")
+        durations.append(_float(stream.get("duration")))
+        if kind == "video" and video is None:
+            rotation = stream.get("tags", {}).get("rotate", 0)
+            for side_data in stream.get("side_data_list", []):
+                rotation = side_data.get("rotation", rotation)
+            video = {
+                "codec": stream.get("codec_name"),
+                "width": int(stream.get("width") or 0),
+                "height": int(stream.get("height") or 0),
+                "rotation": int(float(rotation)),
+                "fps": _rate(stream.get("avg_frame_rate")) or _rate(stream.get("r_frame_rate")),
+                "duration": _float(stream.get("duration")),
+            }
+        elif kind == "audio" and audio is None:
+            audio = {
+                "codec": stream.get("codec_name"),
+                "sample_rate": int(stream.get("sample_rate") or 0),
+                "channels": int(stream.get("channels") or 0),
+                "duration": _float(stream.get("duration")),
+            }
+    duration = _float(probed.get("format", {}).get("duration"))
+    if duration is None:
+        duration = max((d for d in durations if d is not None), default=None)
+    return {"duration": duration, "video": video, "audio": audio}
+
+
+def estimate_cost(info, kind):
+    """Relative cost of one file for a pipeline kind (COST_UNITS), or 0.0
+    when info is None or lacks the stream the pipeline needs — such files
+    fail or short-circuit quickly and are scheduled last.
+
+      video: duration x frame rate x frame pixels / 1e6 — every extractor
+             but keyframes decodes every frame
+      audio / music: duration in seconds (decode, resample and features all
+             scale with it)
+    """
+    if info is None or not info["duration"]:
+        return 0.0
+    if kind == "video":
+        v = info["video"]
+        if v is None:
+            return 0.0
+        return info["duration"] * (v["fps"] or 25.0) * v["width"] * v["height"] / 1e6
+    if kind in ("audio", "music"):
+        return info["duration"] if info["audio"] is not None else 0.0
+    raise ValueError(f"unknown cost kind: {kind}; expected one of {sorted(COST_UNITS)}")
+
+
+def add_probe_args(parser):
+    """Register the shared --probe-cache flag (disabled by --no-cache)."""
+    parser.add_argument("--probe-cache", default=None,
+                        help="ffprobe metadata cache SQLite file (default: <output-dir>/_cache/media_probe.sqlite; "
+                             "point the video, audio and music pipelines at one path to share it)")
+
+
+def open_probe_cache(args):
+    """Probe cache from the add_probe_args/add_cache_args flags, or None
+    with --no-cache. Keys are always path + size + mtime."""
+    if args.no_cache:
+        return None
+    path = args.probe_cache or os.path.join(args.output_dir, "_cache", "media_probe.sqlite")
+    return FeatureCache(path, key_mode="stat")
+
+
+def probe_files(paths, cache=None, max_workers=PROBE_WORKERS):
+    """probe_media for each path, None where the file is missing or ffprobe
+    fails. Cached probes are reused; only the misses spawn ffprobe,
+    max_workers at a time, and successful probes are stored. Missing files
+    never spawn a subprocess. Only the calling thread touches the cache."""
+    infos = [None] * len(paths)
+    keys = [None] * len(paths)
+    todo = []
+    for i, path in enumerate(paths):
+        if cache is None:
+            if os.path.isfile(path):
+                todo.append(i)
+            continue
+        keys[i] = cache.file_key(path)
+        if keys[i] is None:
+            continue
+        infos[i] = cache.get(keys[i], PROBE_NS, label="probe")
+        if infos[i] is None:
+            todo.append(i)
+
+    def one(i):
+        try:
+            return probe_media(paths[i])
+        except Exception:
+            return None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for i, info in zip(todo, pool.map(one, todo)):
+            infos[i] = info
+            if cache is not None and info is not None:
+                cache.put(keys[i], PROBE_NS, info)
+    if cache is not None:
+        cache.flush()
+    return infos
+
+
+def probe_subjects(paths, cache=None, max_workers=PROBE_WORKERS):
+    """{subject: [probe_media or None, ...]} for {subject: [path, ...]},
+    probing every subject's files through one probe_files call."""
+    flat = probe_files([p for ps in paths.values() for p in ps], cache, max_workers)
+    out, i = {}, 0
+    for name, ps in paths.items():
+        out[name], i = flat[i:i + len(ps)], i + len(ps)
+    return out
+
+
+def probe_summary(cache, n_files):
+    """One-line report of a probe pre-pass."""
+    if cache is None:
+        return f"Probed {n_files} files with ffprobe (no probe cache)"
+    return (f"Probed {n_files} files: {cache.hits['probe']} from cache, {cache.misses['probe']} with "
+            f"ffprobe -> {cache.path}")
@@ -1,11 +1,22 @@
 """
 Audio feature extraction using openSMILE.
 
-Preflights ffmpeg + ffprobe, probes each file for an audio stream, extracts
-normalized 16 kHz mono PCM WAV, measures RMS/peak/duration from the PCM
-samples, then runs openSMILE with the emobase configuration (52 LLDs) at the
-Functionals level. Keeps only mean (amean) and std (stddev) per descriptor
-= 104 raw features.
+Preflights ffmpeg + ffprobe, probes each file for an audio stream (once,
+through the shared media_probe cache; files without one never reach a
+worker), extracts normalized 16 kHz mono PCM WAV, measures RMS/peak/duration
+from the PCM samples, then runs openSMILE with the emobase configuration
+(52 LLDs) at the Functionals level. Keeps only mean (amean) and std (stddev)
+per descriptor = 104 raw features.
+
+--decode pipe skips the probe and the temp WAV: one ffmpeg process decodes
+the PCM to its stdout, and the level measurements and openSMILE
+(process_signal) run on the in-memory samples. --window-seconds streams
+either decode in fixed windows with running level accumulators and pooled
+amean/stddev functionals, so multi-hour files run in constant memory.
+
+Workers set up their openSMILE instance once (--executor: shared across
+threads, one per thread, or one per worker process) and take files in
+chunks (--chunk-size).
 
 Additionally computes 8 interpretable score columns:
   - loudness_mean/std      (dB, Eq. A.1: 10*log10(intensity/I0))
@@ -34,8 +45,9 @@ import os
 import shutil
 import subprocess
 import tempfile
+import threading
 import wave
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 
 import sys
@@ -43,7 +55,14 @@ sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
 import numpy as np
 import pandas as pd
-from common import read_input, save_excel, derive_subject, merge_checkpoints, source_columns
+from common import (
+    read_input, derive_subject, merge_checkpoints, source_columns, run_work_queue,
+    add_checkpoint_args, checkpoint_path, checkpoint_done, CheckpointWriter, SubjectStream,
+    add_schedule_args, schedule_report,
+)
+from audio_fingerprint import add_fingerprint_args, dedupe_summary, find_audio_duplicates, open_fingerprint_index
+from feature_cache import add_cache_args, namespace, open_cache
+from media_probe import COST_UNITS, add_probe_args, estimate_cost, open_probe_cache, probe_subjects, probe_summary
 from tqdm import tqdm
 
 try:
@@ -60,6 +79,12 @@ VALID_FEATURE_LEVELS = {"functionals"}
 # is reported as this floor instead of -inf so the column stays numeric.
 DBFS_FLOOR = -120.0
 
+# Normalized PCM handed to openSMILE: 16 kHz mono int16
+PCM_RATE = 16000
+
+# How normalized PCM reaches openSMILE (see --decode)
+DECODE_MODES = ["wav", "pipe"]
+
 # Default RMS threshold separating usable signal from silent/near-silent.
 DEFAULT_SILENCE_THRESHOLD_DBFS = -80.0
 
@@ -79,12 +104,24 @@ DIAG_COLS = [
 ]
 
 
+# Worker backends (see make_executor)
+EXECUTORS = ["thread", "thread-local", "process"]
+
+
 def _get_feature_set(name):
     """Resolve openSMILE feature set enum by name."""
     if opensmile is None:
         raise ImportError("opensmile is not installed. Run: pip install opensmile")
     return getattr(opensmile.FeatureSet, name)
 
+
+def make_smile(feature_set_name):
+    """openSMILE extractor for a feature set at the Functionals level."""
+    return opensmile.Smile(
+        feature_set=_get_feature_set(feature_set_name),
+        feature_level=opensmile.FeatureLevel.Functionals,
+    )
+
 # LLD name patterns for the 8 interpretable scores (emobase column names)
 SCORE_MAPPINGS = {
     "loudness_mean": "pcm_loudness_sma_amean",
@@ -112,13 +149,13 @@ def _to_db(value):
 # Tool preflight, stream probe, audio extraction, PCM measurement
 # ---------------------------------------------------------------------------
 
-def preflight_tools():
+def preflight_tools(tools=("ffmpeg", "ffprobe")):
     """Fail fast when ffmpeg or ffprobe is not on PATH."""
-    missing = [t for t in ("ffmpeg", "ffprobe") if shutil.which(t) is None]
+    missing = [t for t in tools if shutil.which(t) is None]
     if missing:
         raise SystemExit(
             f"Required tool(s) not found on PATH: {', '.join(missing)}. "
-            "Both ffmpeg and ffprobe are needed for audio extraction."
+            f"{' and '.join(tools)} {'are' if len(tools) > 1 else 'is'} needed for audio extraction."
         )
 
 
@@ -141,7 +178,7 @@ def extract_audio_wav(video_path, output_path):
     """Extract audio from video to 16kHz mono PCM WAV using FFmpeg."""
     cmd = [
         "ffmpeg", "-i", video_path,
-        "-vn", "-acodec", "pcm_s16le", "-ar", "16000", "-ac", "1",
+        "-vn", "-acodec", "pcm_s16le", "-ar", str(PCM_RATE), "-ac", "1",
         output_path,
         "-loglevel", "error",
         "-y",
@@ -151,6 +188,81 @@ def extract_audio_wav(video_path, output_path):
         raise RuntimeError(f"ffmpeg audio extraction failed: {result.stderr.strip()}")
 
 
+def _pcm_pipe_cmd(path):
+    """ffmpeg command writing a file's normalized PCM (s16le) to stdout."""
+    return [
+        "ffmpeg", "-nostdin", "-v", "error", "-i", str(path),
+        "-vn", "-f", "s16le", "-acodec", "pcm_s16le", "-ar", str(PCM_RATE), "-ac", "1",
+        "-",
+    ]
+
+
+def _no_stream_error(error):
+    return "does not contain any stream" in error
+
+
+def decode_pcm(path):
+    """Normalized PCM of a file's audio (int16 samples at PCM_RATE, mono),
+    decoded by one ffmpeg process straight to its stdout — no temp file.
+    None when the file has no audio stream."""
+    result = subprocess.run(_pcm_pipe_cmd(path), capture_output=True)
+    if result.returncode != 0:
+        error = result.stderr.decode(errors="replace").strip()
+        if _no_stream_error(error):
+            return None
+        raise RuntimeError(f"ffmpeg audio extraction failed: {error}")
+    return np.frombuffer(result.stdout, dtype=np.int16)
+
+
+def _pcm_blocks(source, block_samples, decode="wav"):
+    """int16 blocks of block_samples (the last one shorter) from a normalized
+    WAV (decode="wav") or from ffmpeg's stdout (decode="pipe"). Yields
+    nothing when a piped file has no audio stream."""
+    if decode == "wav":
+        with wave.open(source, "rb") as wf:
+            while True:
+                raw = wf.readframes(block_samples)
+                if not raw:
+                    return
+                yield np.frombuffer(raw, dtype=np.int16)
+    # stderr goes to a file so a chatty ffmpeg can never block on a full pipe
+    with tempfile.TemporaryFile() as err:
+        proc = subprocess.Popen(_pcm_pipe_cmd(source), stdout=subprocess.PIPE, stderr=err)
+        try:
+            while True:
+                raw = proc.stdout.read(block_samples * 2)
+                if not raw:
+                    break
+                yield np.frombuffer(raw, dtype=np.int16)
+            if proc.wait() != 0:
+                err.seek(0)
+                error = err.read().decode(errors="replace").strip()
+                if not _no_stream_error(error):
+                    raise RuntimeError(f"ffmpeg audio extraction failed: {error}")
+        finally:
+            proc.stdout.close()
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+
+
+def pcm_windows(source, window_samples, decode="wav"):
+    """Normalized PCM of source in windows of window_samples, read as they
+    are needed (see _pcm_blocks). A remainder shorter than half a window
+    joins the last window, so openSMILE never sees a sliver and a file
+    shorter than 1.5 windows arrives as one window."""
+    held = None
+    for block in _pcm_blocks(source, window_samples, decode):
+        if held is not None:
+            if block.size < window_samples // 2:
+                block = np.concatenate([held, block])
+            else:
+                yield held
+        held = block
+    if held is not None:
+        yield held
+
+
 def measure_pcm(wav_path):
     """Measure RMS/peak level (dBFS, floored at DBFS_FLOOR) and duration from
     the normalized PCM samples. Preferred over parsing FFmpeg volumedetect."""
@@ -158,8 +270,12 @@ def measure_pcm(wav_path):
         n_frames = wf.getnframes()
         rate = wf.getframerate()
         raw = wf.readframes(n_frames)
-    duration_s = n_frames / float(rate) if rate else 0.0
-    samples = np.frombuffer(raw, dtype=np.int16)
+    return measure_samples(np.frombuffer(raw, dtype=np.int16), rate)
+
+
+def measure_samples(samples, rate=PCM_RATE):
+    """measure_pcm for int16 samples already in memory."""
+    duration_s = samples.size / float(rate) if rate else 0.0
     if samples.size == 0:
         return DBFS_FLOOR, DBFS_FLOOR, duration_s
     x = samples.astype(np.float64) / 32768.0
@@ -170,10 +286,88 @@ def measure_pcm(wav_path):
     return max(rms_dbfs, DBFS_FLOOR), max(peak_dbfs, DBFS_FLOOR), duration_s
 
 
+def _dbfs(level):
+    """Linear level (1.0 = full scale) -> dBFS, floored at DBFS_FLOOR."""
+    return max(20.0 * math.log10(level), DBFS_FLOOR) if level > 0 else DBFS_FLOOR
+
+
+class WindowedFunctionals:
+    """Running level measurements and amean/stddev functionals over PCM
+    windows, so a file of any length is measured in constant memory.
+
+    RMS accumulates the exact integer sum of squared samples and peak the
+    largest magnitude. Each window's openSMILE functionals are pooled
+    weighted by window length (Chan et al.'s parallel mean/variance update):
+    amean and stddev are population statistics over LLD frames, so the pool
+    reproduces the whole-file values except for what smoothing, deltas and
+    envelopes lose at each window boundary. A single window is returned
+    unchanged."""
+
+    def __init__(self, rate=PCM_RATE):
+        self.rate = rate
+        self.n_samples = 0
+        self.sum_sq = 0
+        self.peak = 0
+        self.windows = 0
+        self._first = None
+        self._names = self._mean = self._m2 = None
+
+    def add(self, samples, functionals):
+        """Fold in one int16 window and openSMILE's one-row Functionals
+        DataFrame for it."""
+        x = samples.astype(np.int64)
+        if x.size:
+            self.sum_sq += int(np.dot(x, x))
+            self.peak = max(self.peak, int(np.abs(x).max()))
+        if self._first is None:
+            self._first = functionals
+            self._names = [c[:-len("_amean")] for c in functionals.columns
+                           if c.endswith("_amean") and c[:-len("_amean")] + "_stddev" in functionals.columns]
+        row = functionals.iloc[0]
+        mean = row[[f"{n}_amean" for n in self._names]].to_numpy(np.float64)
+        m2 = np.square(row[[f"{n}_stddev" for n in self._names]].to_numpy(np.float64)) * x.size
+        if self.windows == 0:
+            self._mean, self._m2 = mean, m2
+        else:
+            total = self.n_samples + x.size
+            delta = mean - self._mean
+            self._mean = self._mean + delta * (x.size / total)
+            self._m2 = self._m2 + m2 + np.square(delta) * (self.n_samples * x.size / total)
+        self.n_samples += x.size
+        self.windows += 1
+
+    def levels(self):
+        """(rms_dbfs, peak_dbfs, duration_s) over every sample added."""
+        duration_s = self.n_samples / float(self.rate)
+        if self.n_samples == 0:
+            return DBFS_FLOOR, DBFS_FLOOR, duration_s
+        return (_dbfs(math.sqrt(self.sum_sq / self.n_samples) / 32768.0),
+                _dbfs(self.peak / 32768.0), duration_s)
+
+    def functionals(self):
+        """One-row DataFrame of the pooled *_amean/*_stddev columns (empty
+        before any window)."""
+        if self.windows <= 1:
+            return self._first if self._first is not None else pd.DataFrame()
+        std = np.sqrt(self._m2 / self.n_samples)
+        pooled = {}
+        for name, mean, sd in zip(self._names, self._mean, std):
+            pooled[f"{name}_amean"] = mean
+            pooled[f"{name}_stddev"] = sd
+        return pd.DataFrame([pooled])
+
+
 # ---------------------------------------------------------------------------
 # Per-file processing
 # ---------------------------------------------------------------------------
 
+def _keep_raw_columns(columns, feature_set_name):
+    """Raw openSMILE columns kept in output — amean and stddev only for emobase."""
+    if feature_set_name == "emobase":
+        return [c for c in columns if c.endswith("_amean") or c.endswith("_stddev")]
+    return list(columns)
+
+
 def _result(ok, status, stream=None, signal=None, rms=None, peak=None,
             duration=None, error="", data=None, scores=None):
     """Assemble one file's result. stream/signal use None for 'unknown'."""
@@ -191,9 +385,86 @@ def _result(ok, status, stream=None, signal=None, rms=None, peak=None,
     }
 
 
+def _smile_result(process, feature_set_name, signal_ok, rms_dbfs, peak_dbfs, duration_s):
+    """Run openSMILE via process() -> features DataFrame and assemble the
+    result with raw features and interpretable scores."""
+    status = STATUS_OK if signal_ok else STATUS_SILENT
+
+    # openSMILE still runs on a valid silent stream.
+    try:
+        features_df = process()
+        if features_df.empty:
+            raise RuntimeError("openSMILE returned empty")
+    except Exception as e:
+        return _result(False, STATUS_FEATURE_ERROR, stream=True,
+                       signal=signal_ok, rms=rms_dbfs, peak=peak_dbfs,
+                       duration=duration_s, error=str(e))
+
+    keep_cols = _keep_raw_columns(features_df.columns.tolist(), feature_set_name)
+
+    raw_data = {}
+    for col in keep_cols:
+        raw_data[col] = float(features_df.iloc[0][col])
+
+    # Compute interpretable scores
+    scores = {}
+    for score_name, source_col in SCORE_MAPPINGS.items():
+        if source_col in raw_data:
+            val = raw_data[source_col]
+            # Apply dB conversion for loudness mean only (Eq. A.1)
+            # loudness_std stays in raw units (std of dB values is not meaningful via this formula)
+            if score_name == "loudness_mean":
+                scores[score_name] = _to_db(val)
+            else:
+                scores[score_name] = val
+        else:
+            scores[score_name] = np.nan
+
+    return _result(True, status, stream=True, signal=signal_ok,
+                   rms=rms_dbfs, peak=peak_dbfs, duration=duration_s,
+                   data=raw_data, scores=scores)
+
+
+def _windowed_result(source, smile, feature_set_name, silence_threshold_dbfs, window_seconds, decode,
+                     has_stream=True):
+    """_smile_result for source processed in windows of window_seconds
+    (pcm_windows, WindowedFunctionals): one window of PCM in memory at a
+    time, however long the file. A piped file that yields no samples has no
+    audio stream. has_stream: what the caller knows of the stream (None when
+    a piped file was not probed), reported if the decode fails."""
+    acc = WindowedFunctionals()
+    windows = pcm_windows(source, max(int(window_seconds * PCM_RATE), 1), decode)
+    while True:
+        try:
+            block = next(windows, None)
+        except Exception as e:
+            return _result(False, STATUS_EXTRACTION_ERROR, stream=has_stream, error=str(e))
+        if block is None:
+            break
+        try:
+            acc.add(block, smile.process_signal(block.astype(np.float32) / 32768.0, PCM_RATE))
+        except Exception as e:
+            windows.close()
+            return _result(False, STATUS_FEATURE_ERROR, stream=True, error=str(e))
+    if decode == "pipe" and acc.n_samples == 0:
+        return _result(False, STATUS_NO_STREAM, stream=False, signal=False)
+    rms_dbfs, peak_dbfs, duration_s = acc.levels()
+    return _smile_result(acc.functionals, feature_set_name, rms_dbfs > silence_threshold_dbfs,
+                         rms_dbfs, peak_dbfs, duration_s)
+
+
 def analyze_audio(idx, row, base_dir, file_col, smile, feature_set_name,
-                  silence_threshold_dbfs=DEFAULT_SILENCE_THRESHOLD_DBFS):
-    """Extract audio features from one file with stream/signal diagnostics."""
+                  silence_threshold_dbfs=DEFAULT_SILENCE_THRESHOLD_DBFS, has_stream=None,
+                  decode="wav", window_seconds=0.0):
+    """Extract audio features from one file with stream/signal diagnostics.
+    has_stream: audio stream presence from the probe cache; None probes here
+    (decode="wav") or lets the decode tell (decode="pipe").
+    decode: "wav" extracts a temp WAV that openSMILE reads back; "pipe"
+    decodes PCM from ffmpeg's stdout into memory (decode_pcm) and runs
+    smile.process_signal on it — one subprocess per file, no temp file. A
+    stream that decodes to no samples then counts as no audio stream.
+    window_seconds > 0 streams either decode through openSMILE one window at
+    a time (_windowed_result) instead of holding the whole file."""
     rel_path = row.get(file_col, "")
     if not rel_path:
         return _result(False, STATUS_FILE_NOT_FOUND, error="empty path")
@@ -206,14 +477,33 @@ def analyze_audio(idx, row, base_dir, file_col, smile, feature_set_name,
     if not os.path.isfile(abs_path):
         return _result(False, STATUS_FILE_NOT_FOUND, error=f"file not found: {abs_path}")
 
-    try:
-        has_stream = probe_audio_stream(abs_path)
-    except Exception as e:
-        return _result(False, STATUS_PROBE_ERROR, error=str(e))
-    if not has_stream:
+    if has_stream is None and decode == "wav":
+        try:
+            has_stream = probe_audio_stream(abs_path)
+        except Exception as e:
+            return _result(False, STATUS_PROBE_ERROR, error=str(e))
+    if has_stream is False:
         # Structural absence, not an error: audio_error stays blank.
         return _result(False, STATUS_NO_STREAM, stream=False, signal=False)
 
+    if decode == "pipe" and window_seconds:
+        return _windowed_result(abs_path, smile, feature_set_name, silence_threshold_dbfs,
+                                window_seconds, decode, has_stream)
+    if decode == "pipe":
+        try:
+            samples = decode_pcm(abs_path)
+        except Exception as e:
+            return _result(False, STATUS_EXTRACTION_ERROR, stream=has_stream, error=str(e))
+        if samples is None or samples.size == 0:
+            return _result(False, STATUS_NO_STREAM, stream=False, signal=False)
+        try:
+            rms_dbfs, peak_dbfs, duration_s = measure_samples(samples)
+            return _smile_result(
+                lambda: smile.process_signal(samples.astype(np.float32) / 32768.0, PCM_RATE),
+                feature_set_name, rms_dbfs > silence_threshold_dbfs, rms_dbfs, peak_dbfs, duration_s)
+        except Exception as e:
+            return _result(False, STATUS_FEATURE_ERROR, stream=True, error=str(e))
+
     tmp_wav = None
     try:
         fd, tmp_wav = tempfile.mkstemp(suffix=".wav", prefix="osmile_")
@@ -223,52 +513,16 @@ def analyze_audio(idx, row, base_dir, file_col, smile, feature_set_name,
         except Exception as e:
             return _result(False, STATUS_EXTRACTION_ERROR, stream=True, error=str(e))
 
+        if window_seconds:
+            return _windowed_result(tmp_wav, smile, feature_set_name, silence_threshold_dbfs,
+                                    window_seconds, decode)
         try:
             rms_dbfs, peak_dbfs, duration_s = measure_pcm(tmp_wav)
         except Exception as e:
             return _result(False, STATUS_EXTRACTION_ERROR, stream=True, error=str(e))
 
-        signal_ok = rms_dbfs > silence_threshold_dbfs
-        status = STATUS_OK if signal_ok else STATUS_SILENT
-
-        # openSMILE still runs on a valid silent stream.
-        try:
-            features_df = smile.process_file(tmp_wav)
-            if features_df.empty:
-                raise RuntimeError("openSMILE returned empty")
-        except Exception as e:
-            return _result(False, STATUS_FEATURE_ERROR, stream=True,
-                           signal=signal_ok, rms=rms_dbfs, peak=peak_dbfs,
-                           duration=duration_s, error=str(e))
-
-        # Get all columns — filter to amean and stddev only for emobase
-        all_cols = features_df.columns.tolist()
-        if feature_set_name == "emobase":
-            keep_cols = [c for c in all_cols if c.endswith("_amean") or c.endswith("_stddev")]
-        else:
-            keep_cols = all_cols
-
-        raw_data = {}
-        for col in keep_cols:
-            raw_data[col] = float(features_df.iloc[0][col])
-
-        # Compute interpretable scores
-        scores = {}
-        for score_name, source_col in SCORE_MAPPINGS.items():
-            if source_col in raw_data:
-                val = raw_data[source_col]
-                # Apply dB conversion for loudness mean only (Eq. A.1)
-                # loudness_std stays in raw units (std of dB values is not meaningful via this formula)
-                if score_name == "loudness_mean":
-                    scores[score_name] = _to_db(val)
-                else:
-                    scores[score_name] = val
-            else:
-                scores[score_name] = np.nan
-
-        return _result(True, status, stream=True, signal=signal_ok,
-                       rms=rms_dbfs, peak=peak_dbfs, duration=duration_s,
-                       data=raw_data, scores=scores)
+        return _smile_result(lambda: smile.process_file(tmp_wav), feature_set_name,
+                             rms_dbfs > silence_threshold_dbfs, rms_dbfs, peak_dbfs, duration_s)
     except Exception as e:
         return _result(False, STATUS_FEATURE_ERROR, stream=True, error=str(e))
     finally:
@@ -280,17 +534,19 @@ def analyze_audio(idx, row, base_dir, file_col, smile, feature_set_name,
 # DataFrame construction and subject processing
 # ---------------------------------------------------------------------------
 
-def build_output_df(rows, results, id_cols=None, file_col="file_path"):
-    """Merge source rows with scores + raw features + diagnostics."""
+def build_output_df(rows, results, id_cols=None, file_col="file_path", raw_cols=None):
+    """Merge source rows with scores + raw features + diagnostics.
+
+    raw_cols fixes the raw column list (streamed batches must share one
+    schema); by default it is the union over results. reused_from names
+    the file whose result a row reuses (--dedupe); it is blank otherwise,
+    so checkpoints from runs with and without --dedupe share one schema."""
     source_df = pd.DataFrame(rows)
     keep = [c for c in source_columns(id_cols, file_col) if c in source_df.columns]
     source_df = source_df[keep]
 
-    # Collect all raw column names from successful results
-    raw_cols = set()
-    for r in results:
-        raw_cols.update(r.get("data", {}).keys())
-    raw_cols = sorted(raw_cols)
+    if raw_cols is None:
+        raw_cols = sorted({c for r in results for c in r.get("data", {})})
 
     score_names = list(SCORE_MAPPINGS.keys())
 
@@ -308,6 +564,7 @@ def build_output_df(rows, results, id_cols=None, file_col="file_path"):
         row["audio_peak_dbfs"] = r.get("audio_peak_dbfs")
         row["audio_duration_s"] = r.get("audio_duration_s")
         row["audio_error"] = r.get("error", "")
+        row["reused_from"] = r.get("reused_from", "")
         row["ok"] = r["ok"]
         out_rows.append(row)
 
@@ -319,37 +576,113 @@ def build_output_df(rows, results, id_cols=None, file_col="file_path"):
     return out
 
 
-def process_subject(name, subject_df, base_dir, file_col, max_workers,
-                    output_dir, smile, feature_set_name, id_cols=None,
-                    silence_threshold_dbfs=DEFAULT_SILENCE_THRESHOLD_DBFS):
-    """Process all audio/video files for one subject, save checkpoint."""
-    rows = subject_df.to_dict("records")
-    results = [None] * len(rows)
-
-    with ThreadPoolExecutor(max_workers=max_workers) as pool:
-        futures = {
-            pool.submit(analyze_audio, i, row, base_dir, file_col, smile,
-                        feature_set_name, silence_threshold_dbfs): i
-            for i, row in enumerate(rows)
-        }
-        with tqdm(total=len(rows), desc=f"  {name}", position=1, leave=False) as file_bar:
-            for future in as_completed(futures):
-                idx = futures[future]
-                try:
-                    results[idx] = future.result()
-                except Exception as e:
-                    results[idx] = _result(False, STATUS_FEATURE_ERROR, error=str(e))
-                file_bar.update(1)
-
-    out_df = build_output_df(rows, results, id_cols, file_col=file_col)
-    ckpt_dir = os.path.join(output_dir, "checkpoints")
-    os.makedirs(ckpt_dir, exist_ok=True)
-    out_path = os.path.join(ckpt_dir, f"{name}.xlsx")
-    save_excel(out_df, out_path)
+def _task_failed(exc):
+    return _result(False, STATUS_FEATURE_ERROR, error=str(exc))
 
-    ok_count = sum(1 for r in results if r["ok"])
-    fail_count = len(results) - ok_count
-    return {"name": name, "total": len(rows), "ok": ok_count, "fail": fail_count, "path": out_path}
+
+# ---------------------------------------------------------------------------
+# Worker pool
+# ---------------------------------------------------------------------------
+
+# Per-run config pinned once per worker by _init_worker; worker-local Smile
+# instances live in _LOCAL (one per thread, or per process).
+_WORKER = {}
+_LOCAL = threading.local()
+
+
+def _init_worker(base_dir, file_col, feature_set_name, silence_threshold_dbfs, decode, window_seconds,
+                 smile=None):
+    """Pool initializer: pin the per-run config once per worker, so tasks
+    carry only (row, has_stream) items. smile: one instance shared by every
+    worker; None builds the worker's own Smile here, once."""
+    _WORKER.update(base_dir=base_dir, file_col=file_col, feature_set_name=feature_set_name,
+                   silence_threshold_dbfs=silence_threshold_dbfs, decode=decode,
+                   window_seconds=window_seconds, smile=smile)
+    if smile is None:
+        _LOCAL.smile = make_smile(feature_set_name)
+
+
+def _analyze_chunk(chunk):
+    """Work-queue task: analyze each (row, has_stream) item of a chunk with
+    this worker's Smile. Top-level so process pools can pickle the call."""
+    cfg = _WORKER
+    smile = cfg["smile"] if cfg["smile"] is not None else _LOCAL.smile
+    return [
+        analyze_audio(None, row, cfg["base_dir"], cfg["file_col"], smile, cfg["feature_set_name"],
+                      cfg["silence_threshold_dbfs"], has_stream, cfg["decode"], cfg["window_seconds"])
+        for row, has_stream in chunk
+    ]
+
+
+def make_executor(kind, max_workers, base_dir, file_col, feature_set_name,
+                  silence_threshold_dbfs=DEFAULT_SILENCE_THRESHOLD_DBFS, decode="wav", window_seconds=0.0):
+    """Long-lived pool for the whole run. "thread" shares one Smile across
+    all threads; "thread-local" builds one Smile per thread; "process" builds
+    one per worker process, so openSMILE's Python wrapper (config setup,
+    per-frame result callbacks, DataFrame assembly) never contends for one
+    GIL."""
+    if kind not in EXECUTORS:
+        raise ValueError(f"unknown executor: {kind}; expected one of {EXECUTORS}")
+    cls = ProcessPoolExecutor if kind == "process" else ThreadPoolExecutor
+    shared = make_smile(feature_set_name) if kind == "thread" else None
+    return cls(max_workers=max_workers, initializer=_init_worker,
+               initargs=(base_dir, file_col, feature_set_name, silence_threshold_dbfs, decode, window_seconds,
+                         shared))
+
+
+def auto_chunk_size(n_files, max_workers):
+    """~4 chunks per worker, capped at 8 files per chunk."""
+    return max(1, min(8, n_files // max(max_workers * 4, 1)))
+
+
+def chunk_items(items, chunk_size):
+    """Split one subject's (row, has_stream) items into task chunks."""
+    return [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+
+# ---------------------------------------------------------------------------
+# Persistent feature cache
+# ---------------------------------------------------------------------------
+
+# Bump when analyze_audio's outputs change, so older cached results miss.
+CACHE_VERSION = 1
+
+# Only outcomes determined by the file's bytes are cached; tool and I/O
+# failures (probe/extraction/feature errors) are retried on the next run.
+CACHEABLE_STATUSES = {STATUS_OK, STATUS_SILENT, STATUS_NO_STREAM}
+
+
+def _cache_ns(feature_set_name, silence_threshold_dbfs, window_seconds=0.0):
+    # Windowed functionals differ slightly from whole-file ones; whole-file
+    # results keep their original namespace.
+    params = {"window_seconds": window_seconds} if window_seconds else {}
+    return namespace("opensmile", "functionals", CACHE_VERSION,
+                     feature_set=feature_set_name, silence_threshold_dbfs=silence_threshold_dbfs, **params)
+
+
+def cache_lookup(cache, abs_path, feature_set_name, silence_threshold_dbfs, window_seconds=0.0):
+    """Returns (file_key, cached result or None)."""
+    key = cache.file_key(abs_path)
+    if key is None:
+        return None, None
+    return key, cache.get(key, _cache_ns(feature_set_name, silence_threshold_dbfs, window_seconds),
+                          label="functionals")
+
+
+def cache_store(cache, file_key, result, feature_set_name, silence_threshold_dbfs, window_seconds=0.0):
+    if result["audio_status"] in CACHEABLE_STATUSES:
+        cache.put(file_key, _cache_ns(feature_set_name, silence_threshold_dbfs, window_seconds), result)
+
+
+def open_subject_stream(name, rows, output_dir, raw_cols, id_cols=None, file_col="file_path",
+                        fmt="xlsx"):
+    """SubjectStream that writes one subject's checkpoint, in row order, as
+    results arrive."""
+    path = checkpoint_path(os.path.join(output_dir, "checkpoints"), name, fmt)
+    writer = CheckpointWriter(path, fmt, str_cols=source_columns(id_cols, file_col)
+                              + ["audio_status", "audio_error", "reused_from"])
+    return SubjectStream(writer, len(rows), lambda positions, results: build_output_df(
+        [rows[i] for i in positions], results, id_cols, file_col=file_col, raw_cols=raw_cols))
 
 
 # ---------------------------------------------------------------------------
@@ -362,8 +695,9 @@ def _run_merge(args):
     # Merge key: id columns + file column — never an id alone, so
     # multi-asset posts keep one row per file.
     dedup = source_columns(args.id_cols, args.file_col)
+    # Checkpoints from before --dedupe lack reused_from
     _, stats = merge_checkpoints(ckpt_dir, out_path, file_col=args.file_col,
-                                 dedup_cols=dedup)
+                                 dedup_cols=dedup, optional_cols={"reused_from": ""})
     if stats["files"]:
         print(f"Merged {stats['files']} checkpoints -> {out_path} ({stats['rows']} rows)", flush=True)
 
@@ -386,8 +720,26 @@ def main():
                         default=DEFAULT_SILENCE_THRESHOLD_DBFS,
                         help="RMS dBFS at or below which a stream is classified "
                              f"silent_or_near_silent (default: {DEFAULT_SILENCE_THRESHOLD_DBFS})")
+    parser.add_argument("--decode", choices=DECODE_MODES, default="wav",
+                        help="How 16 kHz mono PCM reaches openSMILE: wav (temp WAV file, re-read for levels "
+                             "and features) or pipe (one ffmpeg process decodes to stdout; levels and "
+                             "features run on the in-memory samples, no ffprobe or temp files) (default: wav)")
+    parser.add_argument("--window-seconds", type=float, default=0.0,
+                        help="Stream each file through openSMILE in windows of this many seconds and pool "
+                             "their amean/stddev functionals, so memory stays constant for multi-hour files "
+                             "(emobase only; default: 0 = whole file)")
     parser.add_argument("--subjects", nargs="*", default=None, help="Process only these subjects")
     parser.add_argument("--max-workers", type=int, default=10, help="Number of concurrent workers")
+    parser.add_argument("--executor", choices=EXECUTORS, default="thread",
+                        help="Worker backend: thread (one shared Smile, default), thread-local (one Smile "
+                             "per thread) or process (one Smile per worker process, no GIL contention)")
+    parser.add_argument("--chunk-size", type=int, default=0,
+                        help="Files per submitted task (default: auto, ~4 chunks per worker, max 8)")
+    add_checkpoint_args(parser)
+    add_cache_args(parser)
+    add_probe_args(parser)
+    add_fingerprint_args(parser)
+    add_schedule_args(parser)
     parser.add_argument("--preview", action="store_true", help="Dry run: show pending subjects and exit")
     args = parser.parse_args()
 
@@ -404,7 +756,11 @@ def main():
         print("Error: opensmile package not installed. Run: pip install opensmile", flush=True)
         return
 
-    preflight_tools()
+    # The pipe decode tells missing streams itself; ffprobe is only needed
+    # for WAV mode's stream check, the lpt cost model, and --dedupe (track
+    # durations, and no fingerprint decode for files without audio).
+    probing = args.decode == "wav" or args.schedule == "lpt" or args.dedupe
+    preflight_tools(("ffmpeg", "ffprobe") if probing else ("ffmpeg",))
 
     if not os.path.isfile(args.input):
         print(f"Input file not found: {args.input}", flush=True)
@@ -418,13 +774,20 @@ def main():
         print(f"Unknown feature level: {args.feature_level}. Available: {sorted(VALID_FEATURE_LEVELS)}", flush=True)
         return
 
-    # Initialize openSMILE
-    smile = opensmile.Smile(
-        feature_set=_get_feature_set(args.feature_set),
-        feature_level=opensmile.FeatureLevel.Functionals,
-    )
+    # Only amean/stddev pool across windows; emobase keeps nothing else.
+    if args.window_seconds and args.feature_set != "emobase":
+        print(f"--window-seconds requires --feature-set emobase (got {args.feature_set})", flush=True)
+        return
+
+    # Workers build their own openSMILE instances (see make_executor); this
+    # one only lists the feature names.
+    smile = make_smile(args.feature_set)
     print(f"openSMILE: {args.feature_set}, level={args.feature_level}", flush=True)
     print(f"Silence threshold: {args.silence_threshold_dbfs} dBFS", flush=True)
+    print(f"Decode: {args.decode} ({'temp WAV file' if args.decode == 'wav' else 'in-memory PCM from ffmpeg stdout'})",
+          flush=True)
+    if args.window_seconds:
+        print(f"Windows: {args.window_seconds:g} s (streamed functionals, constant memory per file)", flush=True)
 
     # id/file columns as strings from the read point (never through float)
     df = read_input(args.input, str_cols=source_columns(args.id_cols, args.file_col))
@@ -452,8 +815,7 @@ def main():
     os.makedirs(ckpt_dir, exist_ok=True)
     pending = {}
     for name, group_df in sorted(groups.items()):
-        checkpoint = os.path.join(ckpt_dir, f"{name}.xlsx")
-        if os.path.isfile(checkpoint):
+        if checkpoint_done(ckpt_dir, name):
             continue
         pending[name] = group_df
 
@@ -465,22 +827,165 @@ def main():
             print(f"  {name}: {len(group_df)} files", flush=True)
         return
 
-    # Process
-    summaries = []
-    for name in tqdm(sorted(pending.keys()), desc="Subjects", position=0):
-        group_df = pending[name].drop(columns=["_subject"])
-        summary = process_subject(
-            name, group_df, args.base_dir, args.file_col, args.max_workers,
-            args.output_dir, smile, args.feature_set, args.id_cols,
-            args.silence_threshold_dbfs,
-        )
-        summaries.append(summary)
+    # Process: one pool and one work queue across all subjects. Rows stream
+    # into each subject's checkpoint as files finish; the checkpoint is
+    # published as soon as the subject's last file finishes.
+    # Cache lookups run in this thread only; cached files never reach the pool.
+    # The rest are probed once through the shared probe cache: files with no
+    # audio stream are resolved here, without spawning any subprocess, and
+    # workers get the stream presence instead of probing again. With
+    # --decode pipe the decode itself finds missing streams, so files are
+    # only probed for --schedule lpt.
+    cache = open_cache(args)
+    probe_cache = open_probe_cache(args) if probing else None
+    index = open_fingerprint_index(args)
+    raw_cols = sorted(_keep_raw_columns(smile.feature_names, args.feature_set))
+    rows_by_subject = {name: pending[name].drop(columns=["_subject"]).to_dict("records")
+                       for name in sorted(pending)}
+    work, plans, positions, streams = {}, {}, {}, {}
+    for name, rows in rows_by_subject.items():
+        stream = open_subject_stream(name, rows, args.output_dir, raw_cols, args.id_cols,
+                                     file_col=args.file_col, fmt=args.checkpoint_format)
+        plan = [(None, None)] * len(rows)
+        if cache is not None:
+            plan = [cache_lookup(cache, os.path.join(args.base_dir, str(row.get(args.file_col, ""))),
+                                 args.feature_set, args.silence_threshold_dbfs, args.window_seconds)
+                    for row in rows]
+        for i, (_, cached) in enumerate(plan):
+            if cached is not None:
+                stream.put(i, cached)
+        positions[name] = [i for i, (_, cached) in enumerate(plan) if cached is None]
+        plans[name], streams[name] = plan, stream
+
+    summaries, queue_done = [], set()
+
+    def finish(name):
+        # A subject is published once its own tasks are done and every
+        # duplicate waiting on another subject's file has arrived
+        if name not in queue_done or not streams[name].complete:
+            return
+        queue_done.discard(name)
+        for d in (rows_by_subject, plans, positions):
+            d.pop(name)
+        summary = {"name": name, **streams.pop(name).close()}
+        if cache is not None:
+            cache.flush()
+        subj_bar.update(1)
         tqdm.write(f"  {summary['name']}: {summary['ok']}/{summary['total']} ok -> {summary['path']}")
+        summaries.append(summary)
+
+    def deliver(name, i, r):
+        """Store and stream one result, then hand it to the duplicates
+        waiting on it. Reused results are not stored under the duplicate's
+        own key, so a later run without --dedupe computes it."""
+        if cache is not None and plans[name][i][0] is not None and "reused_from" not in r:
+            cache_store(cache, plans[name][i][0], r, args.feature_set, args.silence_threshold_dbfs, args.window_seconds)
+        streams[name].put(i, r)
+        for dup_name, dup_i, reused_from in waiting.pop((name, i), ()):
+            deliver(dup_name, dup_i, dict(r, reused_from=reused_from))
+            finish(dup_name)
+
+    if probing:
+        infos = probe_subjects({name: [os.path.join(args.base_dir, str(rows_by_subject[name][i].get(args.file_col, "")))
+                                       for i in positions[name]] for name in positions}, probe_cache)
+        print(probe_summary(probe_cache, sum(len(p) for p in positions.values())), flush=True)
+    else:
+        infos = {name: [None] * len(positions[name]) for name in positions}
+    # Copies of an earlier file's track (in this run, or cached by an
+    # earlier one) reuse its result and never reach the pool; copies of a
+    # file still queued wait for it. Fingerprinting runs after the probe, so
+    # files without an audio stream never spawn a decode for it.
+    waiting = {}
+    if index is not None:
+        probed = {(name, i): info for name in positions for i, info in zip(positions[name], infos[name])}
+        entries = [((name, i), os.path.join(args.base_dir, str(row.get(args.file_col, ""))),
+                    plans[name][i][1] is not None)
+                   for name, rows in rows_by_subject.items() for i, row in enumerate(rows)]
+        lookup = None if cache is None else (lambda path: cache_lookup(
+            cache, path, args.feature_set, args.silence_threshold_dbfs, args.window_seconds)[1])
+        dups = find_audio_duplicates(index, entries, args.dedupe_ber, lookup,
+                                     infos=[probed.get(key) for key, _, _ in entries])
+        for (name, i), (source_path, _, source, stored) in dups.items():
+            reused_from = os.path.relpath(source_path, args.base_dir)
+            if source is not None and plans[source[0]][source[1]][1] is not None:
+                stored = plans[source[0]][source[1]][1]
+            if stored is not None:
+                deliver(name, i, dict(stored, reused_from=reused_from))
+            else:
+                waiting.setdefault(source, []).append((name, i, reused_from))
+        for name in positions:
+            keep = [(i, info) for i, info in zip(positions[name], infos[name]) if (name, i) not in dups]
+            positions[name] = [i for i, _ in keep]
+            infos[name] = [info for _, info in keep]
+        print(dedupe_summary(index, len(entries), len(dups)), flush=True)
+    costs = {}
+    for name, rows in rows_by_subject.items():
+        queued = []
+        for i, info in zip(positions[name], infos[name]):
+            if info is not None and info["audio"] is None:
+                # Structural absence, not an error: audio_error stays blank.
+                deliver(name, i, _result(False, STATUS_NO_STREAM, stream=False, signal=False))
+            else:
+                queued.append((i, info))
+        if args.schedule == "lpt":
+            # Chunk files of similar length together, longest first, so one
+            # long file does not sit behind short ones in its chunk.
+            queued.sort(key=lambda q: -estimate_cost(q[1], "audio"))
+        positions[name] = [i for i, _ in queued]
+        work[name] = [(rows[i], None if info is None else True) for i, info in queued]
+        costs[name] = [estimate_cost(info, "audio") for _, info in queued]
+    chunk_size = args.chunk_size or auto_chunk_size(sum(len(w) for w in work.values()), args.max_workers)
+    # A chunk costs the sum of its files; its LPT report row is labeled by
+    # its first file.
+    chunk_costs = {name: [sum(c) for c in chunk_items(costs[name], chunk_size)] for name in work}
+    work = {name: chunk_items(items, chunk_size) for name, items in work.items()}
+    print(f"Executor: {args.executor} ({args.max_workers} workers, chunk={chunk_size})", flush=True)
+    timings = None
+    if args.schedule == "lpt":
+        files = {name: [str(rows_by_subject[name][i].get(args.file_col, "")) for i in positions[name]]
+                 for name in work}
+        timings = []
+        print(f"Schedule: lpt over {sum(len(c) for c in costs.values())} files "
+              f"({sum(sum(c) for c in costs.values()):.0f} {COST_UNITS['audio']})", flush=True)
+
+    subj_bar = tqdm(total=len(work), desc="Subjects", position=0)
+    file_bar = tqdm(total=sum(len(positions[name]) for name in work),
+                    desc="Files", position=1, leave=False)
+
+    def on_task_done(name, start, results):
+        for i, r in zip(positions[name][start:start + len(results)], results):
+            deliver(name, i, r)
+        return [None] * len(results)
+
+    def on_subject_done(name, _):
+        queue_done.add(name)
+        finish(name)
+
+    with make_executor(args.executor, args.max_workers, args.base_dir, args.file_col, args.feature_set,
+                       args.silence_threshold_dbfs, args.decode, args.window_seconds) as pool:
+        run_work_queue(pool, work, _analyze_chunk, on_subject_done, _task_failed,
+                       max_in_flight=args.max_workers * 2, progress=file_bar,
+                       on_task_done=on_task_done,
+                       costs=chunk_costs if timings is not None else None, timings=timings)
+    file_bar.close()
+    subj_bar.close()
 
     print(f"\nDone: {len(summaries)} subjects processed", flush=True)
     total_ok = sum(s["ok"] for s in summaries)
     total_fail = sum(s["fail"] for s in summaries)
     print(f"  Total: {total_ok} ok, {total_fail} failed", flush=True)
+    if timings is not None:
+        entries = [(name, files[name][start], chunk_costs[name][start // chunk_size], seconds)
+                   for name, start, seconds in timings]
+        print(schedule_report(entries, COST_UNITS["audio"], os.path.join(args.output_dir, "_schedule.xlsx")),
+              flush=True)
+    if cache is not None:
+        print(cache.summary(), flush=True)
+        cache.close()
+    if probe_cache is not None:
+        probe_cache.close()
+    if index is not None:
+        index.close()
 
     if args.merge:
         _run_merge(args)
@@ -0,0 +1,194 @@
+"""
+Micro-benchmarks for the openSMILE audio pipeline.
+
+Each subcommand times the pipeline's alternatives on a synthetic corpus and
+checks that they produce the same features.
+
+  executor  files/sec for one shared Smile on a thread pool vs one Smile
+            per thread vs one per worker process, across worker counts;
+            also a check that every mode returns identical features
+  windows   one long clip analyzed whole vs in --window-seconds windows:
+            worker peak memory, wall time, and drift of the pooled
+            amean/stddev functionals against the whole-file ones
+
+Synthetic inputs only — no input files or CLI paths needed (executor writes
+its WAV corpus, and windows its clip, to a temp directory and removes it
+afterwards; both need ffmpeg, ffprobe and opensmile).
+
+Usage: python bench_audio.py executor [--files 48] [--seconds 4] [--workers 1 2 4]
+       python bench_audio.py windows [--minutes 20] [--windows 60 300]
+"""
+
+import argparse
+import os
+import resource
+import sys
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from audio_features import (
+    DECODE_MODES,
+    EXECUTORS,
+    _analyze_chunk,
+    _task_failed,
+    analyze_audio,
+    auto_chunk_size,
+    chunk_items,
+    make_executor,
+    make_smile,
+)
+from common import run_work_queue
+
+
+# ---------------------------------------------------------------------------
+# executor
+# ---------------------------------------------------------------------------
+
+def _write_synthetic_corpus(out_dir, n_files, seconds, rate=16000):
+    """Short speech-like clips: a tone whose pitch varies per file, mixed
+    with pink noise, 16-bit mono WAV. Returns the file names."""
+    names = []
+    for i in range(n_files):
+        name = f"clip_{i:03d}.wav"
+        cmd = [
+            "ffmpeg", "-loglevel", "error", "-y",
+            "-f", "lavfi", "-i", f"sine=frequency={110 + 15 * i}:sample_rate={rate}:duration={seconds}",
+            "-f", "lavfi", "-i", f"anoisesrc=color=pink:amplitude=0.05:seed={i}:sample_rate={rate}:d={seconds}",
+            "-filter_complex", "[0:a][1:a]amix=inputs=2:duration=shortest,tremolo=f=4:d=0.6[a]",
+            "-map", "[a]", "-ac", "1", "-c:a", "pcm_s16le",
+            os.path.join(out_dir, name),
+        ]
+        subprocess.run(cmd, check=True, capture_output=True)
+        names.append(name)
+    return names
+
+
+def _analyze_corpus(pool, items, chunk_size):
+    chunks = chunk_items(items, chunk_size)
+    return run_work_queue(pool, {"_": chunks}, _analyze_chunk, lambda _, results: results,
+                          _task_failed, max_in_flight=max(len(chunks), 1))[0]
+
+
+def bench_executor(args):
+    tmp = tempfile.mkdtemp(prefix="bench_audio_")
+    try:
+        names = _write_synthetic_corpus(tmp, args.files, args.seconds)
+        # has_stream=True: the corpus is known-good, so no per-file probe
+        items = [({"file_path": n}, True) for n in names]
+        print(f"executor: {len(items)} files x {args.seconds:g}s, feature_set={args.feature_set}, "
+              f"decode={args.decode}, cpus={os.cpu_count()}", flush=True)
+        base = ref = None
+        for kind in EXECUTORS:
+            for workers in args.workers:
+                with make_executor(kind, workers, tmp, "file_path", args.feature_set,
+                                   decode=args.decode) as pool:
+                    # Warm-up excludes pool startup and per-worker Smile setup
+                    _analyze_corpus(pool, items[:workers], 1)
+                    chunk = args.chunk_size or auto_chunk_size(len(items), workers)
+                    t0 = time.perf_counter()
+                    results = _analyze_corpus(pool, items, chunk)
+                    elapsed = time.perf_counter() - t0
+                fails = sum(1 for r in results if not r["ok"])
+                data = [r["data"] for r in results]
+                ref = ref or data
+                rate = len(items) / elapsed
+                base = base or rate
+                print(f"  {kind:<12} workers={workers:<3} chunk={chunk:<3} {rate:7.1f} files/s  "
+                      f"({rate / base:4.1f}x vs thread/{args.workers[0]})"
+                      + ("" if data == ref else "  [features differ]")
+                      + (f"  [{fails} failed]" if fails else ""), flush=True)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# ---------------------------------------------------------------------------
+# windows
+# ---------------------------------------------------------------------------
+
+def _write_long_clip(path, minutes, rate=16000):
+    """A long speech-like clip: a tone gliding in pitch and loudness, mixed
+    with pink noise, MP3 (so the decode is part of the work)."""
+    seconds = minutes * 60
+    cmd = [
+        "ffmpeg", "-loglevel", "error", "-y",
+        "-f", "lavfi", "-i", f"aevalsrc=0.3*sin(2*PI*(140+40*sin(t/7))*t)*(0.6+0.4*sin(t/3)):s={rate}:d={seconds}",
+        "-f", "lavfi", "-i", f"anoisesrc=color=pink:amplitude=0.05:sample_rate={rate}:d={seconds}",
+        "-filter_complex", "[0:a][1:a]amix=inputs=2:duration=shortest[a]",
+        "-map", "[a]", "-ac", "1", "-c:a", "libmp3lame", "-b:a", "64k",
+        path,
+    ]
+    subprocess.run(cmd, check=True, capture_output=True)
+
+
+def _analyze_once(base_dir, name, decode, window_seconds):
+    """analyze_audio in a fresh process -> (result, seconds, peak RSS MB)."""
+    smile = make_smile("emobase")
+    t0 = time.perf_counter()
+    result = analyze_audio(None, {"file_path": name}, base_dir, "file_path", smile, "emobase",
+                           has_stream=True, decode=decode, window_seconds=window_seconds)
+    elapsed = time.perf_counter() - t0
+    return result, elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def bench_windows(args):
+    tmp = tempfile.mkdtemp(prefix="bench_audio_")
+    try:
+        _write_long_clip(os.path.join(tmp, "long.mp3"), args.minutes)
+        print(f"windows: {args.minutes:g} min clip, decode={args.decode}, emobase", flush=True)
+        ref = None
+        for window in [0] + args.windows:
+            # One process per run, so peak RSS belongs to that run alone
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                result, elapsed, rss = pool.submit(_analyze_once, tmp, "long.mp3", args.decode, window).result()
+            if not result["ok"]:
+                print(f"  window={window:g}: {result['audio_status']} {result['error']}", flush=True)
+                continue
+            data = result["data"]
+            label = "whole file" if not window else f"{window:g} s windows"
+            if ref is None:
+                ref = data
+                print(f"  {label:<16}: {elapsed:6.1f} s  peak RSS {rss:7.1f} MB", flush=True)
+                continue
+            # amean drift in units of the whole-file stddev; stddev drift relative
+            drift = sorted(
+                ((abs(v - ref[k]) / max(abs(ref[k.replace("_amean", "_stddev")]), 1e-9), k) if k.endswith("_amean")
+                 else (abs(v - ref[k]) / max(abs(ref[k]), 1e-9), k)
+                 for k, v in data.items()), reverse=True)
+            print(f"  {label:<16}: {elapsed:6.1f} s  peak RSS {rss:7.1f} MB; drift median "
+                  f"{drift[len(drift) // 2][0]:.5f}, largest " + ", ".join(f"{k} {d:.4f}" for d, k in drift[:3]),
+                  flush=True)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the openSMILE audio pipeline")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p = sub.add_parser("executor", help="Shared vs thread-local vs per-process Smile instances")
+    p.add_argument("--files", type=int, default=48, help="Number of synthetic clips")
+    p.add_argument("--seconds", type=float, default=4.0, help="Length of each clip")
+    p.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker counts to sweep")
+    p.add_argument("--chunk-size", type=int, default=0, help="Files per task (default: auto)")
+    p.add_argument("--feature-set", default="emobase", help="openSMILE feature set")
+    p.add_argument("--decode", choices=DECODE_MODES, default="pipe", help="PCM decode mode")
+    p.set_defaults(func=bench_executor)
+
+    p = sub.add_parser("windows", help="Whole-file vs windowed functionals on one long clip")
+    p.add_argument("--minutes", type=float, default=20.0, help="Length of the synthetic clip")
+    p.add_argument("--windows", type=float, nargs="+", default=[60, 300], help="--window-seconds values to time")
+    p.add_argument("--decode", choices=DECODE_MODES, default="pipe", help="PCM decode mode")
+    p.set_defaults(func=bench_windows)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
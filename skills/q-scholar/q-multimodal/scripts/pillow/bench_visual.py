@@ -0,0 +1,719 @@
+"""
+Micro-benchmarks for the Pillow visual pipeline.
+
+Each subcommand times the current implementation against a reference
+(the previous implementation, kept here verbatim) on synthetic inputs, and
+reports how far the outputs drift from that reference.
+
+  palette   dominant-color k-means: per-image and stacked-batch engines
+  executor  images/sec for thread vs process pools across worker counts
+  filters   Laplacian/Sobel engine vs 8-bit ImageFilter.Kernel; also a
+            regression check of the texture/shape/spatial outputs
+  decode    header-only / luma / full decode levels for metadata and
+            quality runs; dynamic_range drift of the luma decode
+  grid      fixed-grid kernel vs the per-image extractors on the same grid
+            pixels; also a regression check of every output column
+  video     fixed-interval frame extraction: JPEG frames on disk
+            (--extractor ffmpeg) vs raw frames over a pipe (ffmpeg-pipe)
+  scenes    scene-mode frame capture: detect-then-seek (two decodes) vs
+            the single-pass ring buffer, by default (nearest held frame) and
+            with exact_frames (seeks); also a check of the sampled frames,
+            and detection on a reduced stream (--detect-scale/--detect-skip)
+  segments  one long video analyzed whole vs split into time segments on a
+            thread pool (--segment-over); also a check that the merged
+            result matches the whole-video one
+  reuse     frame-delta reuse (--reuse-delta) on a near-static slideshow
+            clip: frames analyzed vs reused, and drift of the video-level
+            means against analyzing every frame
+
+Synthetic inputs only — no input files or CLI paths needed (executor,
+filters and decode write their images, and video/scenes/segments their
+clips, to a temp directory and remove it afterwards; video needs ffmpeg and
+ffprobe, scenes needs ffmpeg and scenedetect[opencv], segments needs all
+three, reuse needs ffmpeg and ffprobe).
+
+Usage: python bench_visual.py palette [--images 200] [--repeat 3]
+       python bench_visual.py executor [--images 96] [--workers 1 2 4 8]
+       python bench_visual.py filters [--images 24] [--sizes 640x480 4000x3000]
+       python bench_visual.py decode [--images 24] [--size 4000x3000]
+       python bench_visual.py grid [--grid 256x256] [--images 16]
+       python bench_visual.py video [--size 1280x720] [--seconds 10] [--fps 2]
+       python bench_visual.py scenes [--size 1280x720] [--scene-seconds 4 1 6 2 8] [--detect-scale 0.25]
+       python bench_visual.py segments [--size 640x360] [--segment-seconds 10] [--workers 1 2 4]
+       python bench_visual.py reuse [--size 1280x720] [--slide-seconds 8 5 12 3 10] [--deltas 1 2 4]
+"""
+
+import argparse
+import os
+import sys
+import shutil
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+from visual_features import (
+    CATEGORY_ORDER,
+    EXTRACTORS,
+    FEATURE_CATEGORIES,
+    GRID_CATEGORIES,
+    PALETTE_K,
+    PALETTE_SAMPLE,
+    ImageContext,
+    analyze_image_array,
+    analyze_image_from_path,
+    analyze_rows,
+    auto_chunk_size,
+    dominant_colors_batch,
+    extract_shape_features,
+    extract_spatial_features,
+    extract_texture_features,
+    filter_bank,
+    grid_features,
+    kmeans_numpy,
+    make_executor,
+    parse_grid,
+)
+from video_features import (
+    SCENE_BUFFER,
+    _target_frames_for_scene,
+    aggregate_video_features,
+    analyze_video,
+    detect_scenes_scaled,
+    extract_frames_ffmpeg,
+    iter_frames_keyframes,
+    iter_frames_pipe,
+    iter_frames_scenedetect,
+    iter_frames_scenedetect_scaled,
+    merge_segments,
+    plan_segments,
+    probe_video,
+    probe_video_size,
+)
+
+
+def _timeit(fn, repeat):
+    """Best-of-N wall time in seconds, plus the last return value."""
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def _synthetic_samples(n_images, n=PALETTE_SAMPLE, seed=0):
+    """Pixel samples drawn around a few random palette colors per image."""
+    rng = np.random.default_rng(seed)
+    out = []
+    for _ in range(n_images):
+        palette = rng.integers(0, 256, size=(rng.integers(2, 7), 3))
+        px = palette[rng.integers(0, len(palette), size=n)] + rng.normal(0, 12, size=(n, 3))
+        out.append(np.clip(px, 0, 255).astype(np.uint8))
+    return out
+
+
+# ---------------------------------------------------------------------------
+# palette
+# ---------------------------------------------------------------------------
+
+def _kmeans_reference(pixels, k=5, max_iter=20):
+    """Previous kmeans_numpy: float64 n x k norm tensor, Python-loop updates."""
+    rng = np.random.default_rng(42)
+    n = len(pixels)
+    if n < k:
+        pad = np.zeros((k - n, 3), dtype=pixels.dtype)
+        pixels = np.vstack([pixels, pad])
+        n = len(pixels)
+    indices = rng.choice(n, size=k, replace=False)
+    centers = pixels[indices].astype(np.float64)
+    for _ in range(max_iter):
+        dists = np.linalg.norm(pixels[:, None].astype(np.float64) - centers[None, :], axis=2)
+        labels = np.argmin(dists, axis=1)
+        for j in range(k):
+            mask = labels == j
+            if mask.any():
+                centers[j] = pixels[mask].astype(np.float64).mean(axis=0)
+    counts = np.bincount(labels, minlength=k)
+    order = np.argsort(-counts)
+    return centers[order]
+
+
+def _hex(centers):
+    return [f"#{int(r):02X}{int(g):02X}{int(b):02X}" for r, g, b in centers[:3]]
+
+
+def bench_palette(args):
+    # Mixed sample sizes, so the batch also exercises its padding mask
+    samples = _synthetic_samples(args.images) + _synthetic_samples(4, n=300, seed=1)
+    print(f"palette: {len(samples)} images x <= {PALETTE_SAMPLE} samples, k={PALETTE_K}", flush=True)
+
+    t_ref, ref = _timeit(lambda: [_kmeans_reference(s) for s in samples], args.repeat)
+    t_one, one = _timeit(lambda: [kmeans_numpy(s) for s in samples], args.repeat)
+    t_bat, bat = _timeit(lambda: dominant_colors_batch(samples), args.repeat)
+
+    per = 1000.0 / len(samples)
+    print(f"  reference (float64, loop) : {t_ref * per:8.3f} ms/image", flush=True)
+    print(f"  kmeans_numpy (per image)  : {t_one * per:8.3f} ms/image  ({t_ref / t_one:5.1f}x)", flush=True)
+    print(f"  dominant_colors_batch     : {t_bat * per:8.3f} ms/image  ({t_ref / t_bat:5.1f}x)", flush=True)
+
+    # dominant_color_1..3 must be unchanged: compare the hex outputs
+    ref_hex = [_hex(r) for r in ref]
+    n_one = sum(_hex(c) != r for c, r in zip(one, ref_hex))
+    n_bat = sum(h != r for h, r in zip(bat, ref_hex))
+    print(f"  hex colors differing      : per image {n_one}/{len(samples)}, batch {n_bat}/{len(samples)}  "
+          f"{'PASS' if n_one == n_bat == 0 else 'FAIL'}", flush=True)
+    if n_one or n_bat:
+        sys.exit(1)
+
+
+# ---------------------------------------------------------------------------
+# executor
+# ---------------------------------------------------------------------------
+
+def _write_synthetic_jpegs(out_dir, n_images, size=(1280, 960), seed=0, noise=18):
+    """Gradient + noise JPEGs; returns relative file names."""
+    rng = np.random.default_rng(seed)
+    w, h = size
+    y, x = np.mgrid[0:h, 0:w]
+    names = []
+    for i in range(n_images):
+        base = np.stack([x * 255.0 / w, y * 255.0 / h, (x + y + 40 * i) % 256], axis=-1)
+        arr = np.clip(base + rng.normal(0, noise, size=base.shape), 0, 255).astype(np.uint8)
+        name = f"img_{i:04d}.jpg"
+        Image.fromarray(arr).save(os.path.join(out_dir, name), quality=90)
+        names.append(name)
+    return names
+
+
+def bench_executor(args):
+    cats = set(args.features.split(","))
+    fields = [f for c in CATEGORY_ORDER if c in cats for f in FEATURE_CATEGORIES[c]]
+    tmp = tempfile.mkdtemp(prefix="bench_visual_")
+    try:
+        rows = [{"file_path": n} for n in _write_synthetic_jpegs(tmp, args.images)]
+        print(f"executor: {len(rows)} images, features={args.features}, cpus={os.cpu_count()}", flush=True)
+        base = None
+        for kind in ("thread", "process"):
+            for workers in args.workers:
+                with make_executor(kind, workers, tmp, "file_path", cats, fields) as pool:
+                    # Warm-up excludes pool startup and worker initialization
+                    analyze_rows(pool, rows[:workers], "file_path", fields, 1)
+                    chunk = auto_chunk_size(len(rows), workers)
+                    t0 = time.perf_counter()
+                    results = analyze_rows(pool, rows, "file_path", fields, chunk)
+                    elapsed = time.perf_counter() - t0
+                fails = sum(1 for r in results if not r["ok"])
+                rate = len(rows) / elapsed
+                base = base or rate
+                print(f"  {kind:<7} workers={workers:<3} chunk={chunk:<3} {rate:8.1f} img/s  "
+                      f"({rate / base:4.1f}x vs thread/{args.workers[0]})"
+                      + (f"  [{fails} failed]" if fails else ""), flush=True)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# ---------------------------------------------------------------------------
+# filters
+# ---------------------------------------------------------------------------
+
+def _filter_bank_reference(gray):
+    """Previous engine: three 8-bit ImageFilter.Kernel passes with offset=128
+    (values clip at +/-127; border pixels are copied through unfiltered)."""
+    def kernel(weights):
+        k = ImageFilter.Kernel((3, 3), weights, scale=1, offset=128)
+        return np.array(gray.filter(k), dtype=np.float64) - 128.0
+    lap = kernel([0, 1, 0, 1, -4, 1, 0, 1, 0])
+    sx = kernel([-1, 0, 1, -2, 0, 2, -1, 0, 1])
+    sy = kernel([-1, -2, -1, 0, 0, 0, 1, 2, 1])
+    return lap, sx, sy, np.sqrt(sx ** 2 + sy ** 2)
+
+
+class _ReferenceContext(ImageContext):
+    """ImageContext whose filter planes come from the previous engine."""
+
+    @property
+    def filters(self):
+        if "_ref_filters" not in self.__dict__:
+            self._ref_filters = _filter_bank_reference(self.gray_image)
+        return self._ref_filters
+
+
+def _filter_features(ctx):
+    out = {}
+    for fn in (extract_texture_features, extract_shape_features, extract_spatial_features):
+        out.update(fn(ctx))
+    return out
+
+
+def bench_filters(args):
+    # 1. Plane regression: wherever the old engine did not saturate, interior
+    #    pixels must match exactly (the new engine only changes borders and
+    #    unclips values beyond +/-127).
+    rng = np.random.default_rng(0)
+    worst = 0.0
+    for contrast in (0.25, 1.0):
+        arr = np.clip(128 + contrast * rng.normal(0, 40, size=(240, 320)), 0, 255).astype(np.uint8)
+        gray = Image.fromarray(arr)
+        for ref, new in zip(_filter_bank_reference(gray)[:3], filter_bank(gray)[:3]):
+            inner_ref, inner_new = ref[1:-1, 1:-1], new[1:-1, 1:-1]
+            unclipped = np.abs(inner_ref) < 127
+            worst = max(worst, float(np.abs(inner_ref - inner_new)[unclipped].max()))
+    print(f"filters: unclipped interior max |new - reference| = {worst:g} "
+          f"({'PASS' if worst == 0 else 'FAIL'})", flush=True)
+
+    # 2. Timing per megapixel across image sizes
+    for size in args.sizes:
+        w, h = (int(v) for v in size.split("x"))
+        arr = rng.integers(0, 256, size=(h, w), dtype=np.uint8)
+        gray = Image.fromarray(arr)
+        t_ref, _ = _timeit(lambda: _filter_bank_reference(gray), args.repeat)
+        t_new, _ = _timeit(lambda: filter_bank(gray), args.repeat)
+        mp = w * h / 1e6
+        print(f"  {size:>10}: reference {t_ref * 1000 / mp:7.2f} ms/MP   "
+              f"filter_bank {t_new * 1000 / mp:7.2f} ms/MP  ({t_ref / t_new:4.1f}x)", flush=True)
+
+    # 3. Feature drift on synthetic JPEGs. Low noise keeps the orientation
+    #    histogram structured; the wrapping blue ramp saturates the old engine.
+    tmp = tempfile.mkdtemp(prefix="bench_visual_")
+    try:
+        names = _write_synthetic_jpegs(tmp, args.images, size=(640, 480), noise=4)
+        drift = {}
+        for name in names:
+            path = os.path.join(tmp, name)
+            ref, new = _filter_features(_ReferenceContext(path)), _filter_features(ImageContext(path))
+            for k, v in ref.items():
+                drift.setdefault(k, []).append(abs(new[k] - v) / max(abs(v), 1e-9))
+        print(f"  feature drift vs reference over {len(names)} images (relative):", flush=True)
+        for k, d in drift.items():
+            print(f"    {k:<18} median {np.median(d):8.4f}   max {np.max(d):8.4f}", flush=True)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    if worst != 0:
+        sys.exit(1)
+
+
+# ---------------------------------------------------------------------------
+# decode
+# ---------------------------------------------------------------------------
+
+def bench_decode(args):
+    w, h = (int(v) for v in args.size.split("x"))
+    tmp = tempfile.mkdtemp(prefix="bench_visual_")
+    try:
+        paths = [os.path.join(tmp, n) for n in _write_synthetic_jpegs(tmp, args.images, size=(w, h))]
+        print(f"decode: {len(paths)} JPEGs at {args.size}", flush=True)
+        runs = [("exif", {"exif"}, False), ("quality (luma)", {"quality"}, True),
+                ("quality (full)", {"quality"}, False)]
+        results = {}
+        for label, cats, luma in runs:
+            t, out = _timeit(lambda: [analyze_image_from_path(p, cats, luma_quality=luma) for p in paths],
+                             args.repeat)
+            results[label] = out
+            print(f"  {label:<15} {t * 1000 / len(paths):8.2f} ms/image", flush=True)
+        drift = [abs(a["data"]["dynamic_range"] - b["data"]["dynamic_range"])
+                 for a, b in zip(results["quality (luma)"], results["quality (full)"])]
+        print(f"  dynamic_range |luma - full|: median {np.median(drift):g}, max {np.max(drift):g} "
+              f"(gray levels)", flush=True)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# ---------------------------------------------------------------------------
+# grid
+# ---------------------------------------------------------------------------
+
+def _per_image_features(arr, size):
+    ctx = ImageContext.from_array(arr, size)
+    out = {}
+    for cat in EXTRACTORS:
+        if cat in GRID_CATEGORIES:
+            out.update(EXTRACTORS[cat](ctx))
+    return out
+
+
+def bench_grid(args):
+    w, h = parse_grid(args.grid)
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:h, 0:w]
+    n = args.images
+    # Gradient + noise images with a white band (exercises whitespace/edges)
+    base = np.stack([x * 255.0 / w, y * 255.0 / h, (x + y) % 256], axis=-1)
+    images = np.clip(base[None] + rng.normal(0, 25, size=(n, h, w, 3)), 0, 255).astype(np.uint8)
+    images[:, : h // 10] = 250
+    size = (4 * w, 3 * h)
+    print(f"grid: {w}x{h}, {n} images", flush=True)
+
+    # 1. Regression: every column matches the per-image extractors
+    ref = [_per_image_features(a, size) for a in images]
+    new = [grid_features(a, size, GRID_CATEGORIES) for a in images]
+    worst = {}
+    for r, b in zip(ref, new):
+        for k, v in r.items():
+            d = float(v != b[k]) if isinstance(v, str) else abs(v - b[k]) / max(abs(v), 1e-9)
+            worst[k] = max(worst.get(k, 0.0), d)
+    bad = {k: d for k, d in worst.items() if d > 1e-5}
+    print(f"  regression over {n} images: max relative diff {max(worst.values()):.2e} "
+          f"({'PASS' if not bad else 'FAIL ' + ', '.join(sorted(bad))})", flush=True)
+
+    # 2. Per-image time on the same grid pixels
+    t_ref, _ = _timeit(lambda: [_per_image_features(a, size) for a in images], args.repeat)
+    t_new, _ = _timeit(lambda: [grid_features(a, size, GRID_CATEGORIES) for a in images], args.repeat)
+    print(f"  per-image extractors : {t_ref * 1000 / n:8.2f} ms/image", flush=True)
+    print(f"  grid_features        : {t_new * 1000 / n:8.2f} ms/image  ({t_ref / t_new:4.1f}x)", flush=True)
+    if bad:
+        sys.exit(1)
+
+
+# ---------------------------------------------------------------------------
+# video
+# ---------------------------------------------------------------------------
+
+def _write_synthetic_video(path, size, seconds, rate=30):
+    """Moving test pattern with temporal noise, H.264."""
+    cmd = [
+        "ffmpeg", "-loglevel", "error", "-y",
+        "-f", "lavfi", "-i", f"testsrc2=size={size}:rate={rate}:duration={seconds}",
+        "-vf", "noise=alls=12:allf=t",
+        "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+        path,
+    ]
+    subprocess.run(cmd, check=True, capture_output=True)
+
+
+def bench_video(args):
+    cats = set(CATEGORY_ORDER) - {"exif"}
+    tmp = tempfile.mkdtemp(prefix="bench_visual_")
+    try:
+        video = os.path.join(tmp, "clip.mp4")
+        _write_synthetic_video(video, args.size, args.seconds)
+        size = probe_video_size(video)
+        print(f"video: {args.seconds}s at {args.size}, sampled at {args.fps} fps", flush=True)
+
+        def jpeg_path():
+            frame_dir = tempfile.mkdtemp(dir=tmp)
+            t0 = time.perf_counter()
+            frames = extract_frames_ffmpeg(video, frame_dir, fps=args.fps)
+            extract = time.perf_counter() - t0
+            disk = sum(os.path.getsize(f["image"]) for f in frames)
+            out = [analyze_image_from_path(f["image"], cats) for f in frames]
+            shutil.rmtree(frame_dir)
+            return out, extract, disk
+
+        def pipe_path(max_side=None):
+            return [analyze_image_array(frame, cats, size=size)
+                    for _, frame in iter_frames_pipe(video, size, fps=args.fps, max_side=max_side)]
+
+        t_jpeg, (ref, t_extract, disk) = _timeit(jpeg_path, args.repeat)
+        n = len(ref)
+        print(f"  ffmpeg (JPEG q2)   : {t_jpeg * 1000 / n:8.2f} ms/frame  "
+              f"({t_extract * 1000 / n:.2f} extracting; {disk / n / 1024:.0f} KiB/frame on disk)", flush=True)
+        t_pipe, new = _timeit(pipe_path, args.repeat)
+        print(f"  ffmpeg-pipe        : {t_pipe * 1000 / n:8.2f} ms/frame  ({t_jpeg / t_pipe:4.1f}x, nothing on disk)",
+              flush=True)
+        if args.frame_max_side:
+            t_small, _ = _timeit(lambda: pipe_path(args.frame_max_side), args.repeat)
+            label = f"ffmpeg-pipe <={args.frame_max_side}px"
+            print(f"  {label:<19}: {t_small * 1000 / n:8.2f} ms/frame  ({t_jpeg / t_small:4.1f}x)", flush=True)
+        t_key, keys = _timeit(lambda: [analyze_image_array(frame, cats, size=size)
+                                       for _, frame in iter_frames_keyframes(video, size)], args.repeat)
+        print(f"  keyframes          : {t_key * 1000 / max(len(keys), 1):8.2f} ms/frame  "
+              f"({len(keys)} frames in {t_key:.2f} s vs {t_pipe:.2f} s piped; only I-frames decoded)", flush=True)
+
+        # Same frames, so any drift is the JPEG round trip's compression loss
+        drift = {}
+        for a, b in zip(ref, new):
+            for k, v in a["data"].items():
+                if not isinstance(v, str):
+                    drift.setdefault(k, []).append(abs(v - b["data"][k]) / max(abs(v), 1e-9))
+        worst = sorted(((max(d), k) for k, d in drift.items()), reverse=True)[:4]
+        print(f"  frames: {n} JPEG, {len(new)} piped; largest relative drift (JPEG loss): "
+              + ", ".join(f"{k} {d:.3f}" for d, k in worst), flush=True)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# Distinct lavfi patterns, one per synthetic scene (cycled).
+SCENE_SOURCES = ["testsrc2", "smptebars", "mandelbrot", "rgbtestsrc", "testsrc", "cellauto"]
+
+
+def _write_synthetic_scenes(path, size, scene_seconds, rate=25, gop=250):
+    """Hard cuts between distinct test patterns, H.264 with a long GOP so
+    seeks re-decode from distant keyframes (as in typical camera/web video)."""
+    cmd = ["ffmpeg", "-loglevel", "error", "-y"]
+    chains = []
+    for i, sec in enumerate(scene_seconds):
+        cmd += ["-f", "lavfi", "-i", f"{SCENE_SOURCES[i % len(SCENE_SOURCES)]}=size={size}:rate={rate}"]
+        chains.append(f"[{i}:v]trim=duration={sec},setsar=1,format=yuv420p[s{i}]")
+    joined = "".join(f"[s{i}]" for i in range(len(scene_seconds)))
+    cmd += [
+        "-filter_complex", ";".join(chains) + f";{joined}concat=n={len(scene_seconds)}:v=1[v]",
+        "-map", "[v]",
+        "-c:v", "libx264", "-preset", "veryfast", "-g", str(gop), "-pix_fmt", "yuv420p",
+        path,
+    ]
+    subprocess.run(cmd, check=True, capture_output=True)
+
+
+def _scenes_reference(video_path, output_dir, threshold=27.0, min_scene_len=15,
+                      frame_mode="middle", frames_per_scene=3):
+    """Previous scene extractor: scenedetect.detect, then one seek per target."""
+    from scenedetect import detect, ContentDetector
+    import cv2
+
+    scene_list = detect(video_path, ContentDetector(threshold=threshold, min_scene_len=min_scene_len))
+    cap = cv2.VideoCapture(video_path)
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        if not scene_list:
+            scenes = [(0, total_frames)] if total_frames > 0 else []
+        else:
+            scenes = [(s.frame_num, e.frame_num) for s, e in scene_list]
+        results = []
+        for scene_idx, (start_f, end_f) in enumerate(scenes, start=1):
+            targets = _target_frames_for_scene(start_f, end_f, frame_mode, frames_per_scene)
+            for img_idx, target in enumerate(targets, start=1):
+                cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+                ret, frame = cap.read()
+                if not ret or frame is None:
+                    continue
+                out_path = os.path.join(output_dir, f"scene_{scene_idx:04d}_img_{img_idx:02d}.jpg")
+                cv2.imwrite(out_path, frame, [cv2.IMWRITE_JPEG_QUALITY, 95])
+                results.append({"image": out_path, "scene_id": scene_idx,
+                                "scene_start": start_f / fps, "scene_end": end_f / fps,
+                                "timestamp": target / fps})
+        return results
+    finally:
+        cap.release()
+
+
+def bench_scenes(args):
+    tmp = tempfile.mkdtemp(prefix="bench_visual_")
+    try:
+        video = os.path.join(tmp, "scenes.mp4")
+        _write_synthetic_scenes(video, args.size, args.scene_seconds)
+        print(f"video: {sum(args.scene_seconds)}s at {args.size}, {len(args.scene_seconds)} scenes "
+              f"({' '.join(str(s) for s in args.scene_seconds)} s), buffer={args.buffer} frames", flush=True)
+        for mode in ["middle", "boundaries", "evenly-spaced"]:
+            def two_pass():
+                frame_dir = tempfile.mkdtemp(dir=tmp)
+                out = _scenes_reference(video, frame_dir, frame_mode=mode, frames_per_scene=args.frames_per_scene)
+                return out, frame_dir
+
+            def one_pass(exact_frames):
+                return list(iter_frames_scenedetect(video, frame_mode=mode, frames_per_scene=args.frames_per_scene,
+                                                    buffer_frames=args.buffer, exact_frames=exact_frames))
+
+            t_ref, (ref, frame_dir) = _timeit(two_pass, args.repeat)
+            for exact_frames in (False, True):
+                t_new, new = _timeit(lambda: one_pass(exact_frames), args.repeat)
+                same_scenes = [(f["scene_id"], f["scene_start"], f["scene_end"]) for f in ref] == \
+                              [(f["scene_id"], f["scene_start"], f["scene_end"]) for f in new]
+                exact = sum(np.array_equal(np.asarray(Image.open(a["image"])), np.asarray(Image.open(b["image"])))
+                            for a, b in zip(ref, new))
+                offset = max((abs(a["timestamp"] - b["timestamp"]) for a, b in zip(ref, new)), default=0.0)
+                label = f"{mode}{' (exact)' if exact_frames else ''}"
+                print(f"  {label:<22}: detect+seek {t_ref:6.2f} s, single pass {t_new:6.2f} s "
+                      f"({t_ref / t_new:4.1f}x); {len(new)}/{len(ref)} frames, "
+                      f"scenes {'match' if same_scenes else 'DIFFER'}, {exact} identical, "
+                      f"max offset {offset:.2f} s", flush=True)
+            shutil.rmtree(frame_dir, ignore_errors=True)
+
+        def scene_bounds(frames):
+            return sorted({(f["scene_start"], f["scene_end"]) for f in frames})
+
+        t_full, full = _timeit(lambda: list(iter_frames_scenedetect(video, buffer_frames=args.buffer)), args.repeat)
+        t_detect, _ = _timeit(lambda: detect_scenes_scaled(video, probe_video(video), scale=args.detect_scale,
+                                                           skip=args.detect_skip), args.repeat)
+        t_red, reduced = _timeit(lambda: list(iter_frames_scenedetect_scaled(
+            video, detect_scale=args.detect_scale, detect_skip=args.detect_skip)), args.repeat)
+        cuts_full = [b[0] for b in scene_bounds(full)][1:]
+        cuts_red = [b[0] for b in scene_bounds(reduced)][1:]
+        moved = max((min(abs(a - b) for b in cuts_full) for a in cuts_red), default=0.0) if cuts_full else 0.0
+        print(f"  reduced detect ({args.detect_scale:g}x, every {args.detect_skip + 1} frame(s), middle): "
+              f"detect {t_detect:.2f} s + capture {t_red - t_detect:.2f} s vs single pass {t_full:.2f} s; "
+              f"{len(cuts_red)}/{len(cuts_full)} cuts, largest shift {moved:.2f} s", flush=True)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_segments(args):
+    from concurrent.futures import ThreadPoolExecutor
+
+    cats = set(CATEGORY_ORDER) - {"exif"}
+    tmp = tempfile.mkdtemp(prefix="bench_visual_")
+    try:
+        video = os.path.join(tmp, "long.mp4")
+        _write_synthetic_scenes(video, args.size, args.scene_seconds)
+        duration = probe_video(video)["duration"]
+        print(f"video: {duration:.0f}s at {args.size}, {len(args.scene_seconds)} scenes, "
+              f"{args.segment_seconds:g}s segments, {os.cpu_count()} CPUs", flush=True)
+        row = {"file_path": "long.mp4"}
+        for extractor in ["scenedetect", "ffmpeg-pipe"]:
+            config = dict(base_dir=tmp, file_col="file_path", active_categories=cats, extractor=extractor,
+                          fps=args.fps, scene_threshold=27.0, min_scene_len=15, frame_mode="middle",
+                          frames_per_scene=3)
+            t_whole, whole = _timeit(lambda: analyze_video(None, row, **config), args.repeat)
+            windows = plan_segments(duration, args.segment_seconds,
+                                    None if extractor == "scenedetect" else 1.0 / args.fps)
+            for workers in args.workers:
+                def segmented():
+                    with ThreadPoolExecutor(max_workers=workers) as pool:
+                        parts = list(pool.map(lambda w: analyze_video(None, row, window=w, **config), windows))
+                    return merge_segments(video, parts, cats, extractor)
+
+                t_seg, merged = _timeit(segmented, args.repeat)
+                same = [(f["second"], f["scene_id"], f["data"]) for f in whole["frames"]] == \
+                       [(f["second"], f["scene_id"], f["data"]) for f in merged["frames"]]
+                print(f"  {extractor:<12} {len(windows)} segments, {workers} workers: {t_seg:6.2f} s vs "
+                      f"whole {t_whole:6.2f} s ({t_whole / t_seg:4.1f}x); {len(merged['frames'])}/"
+                      f"{len(whole['frames'])} frames, {'identical' if same else 'DIFFER'}", flush=True)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# Static lavfi patterns, one per synthetic slide (cycled).
+SLIDE_SOURCES = ["smptebars", "rgbtestsrc", "pal100bars", "yuvtestsrc"]
+
+
+def _write_synthetic_slides(path, size, slide_seconds, rate=25, noise=4):
+    """Static slides with light temporal noise (sensor/compression grain),
+    as in screen recordings and slideshows, H.264."""
+    cmd = ["ffmpeg", "-loglevel", "error", "-y"]
+    chains = []
+    for i, sec in enumerate(slide_seconds):
+        cmd += ["-f", "lavfi", "-i", f"{SLIDE_SOURCES[i % len(SLIDE_SOURCES)]}=size={size}:rate={rate}"]
+        chains.append(f"[{i}:v]trim=duration={sec},setsar=1,format=yuv420p[s{i}]")
+    joined = "".join(f"[s{i}]" for i in range(len(slide_seconds)))
+    cmd += [
+        "-filter_complex", ";".join(chains) + f";{joined}concat=n={len(slide_seconds)}:v=1,"
+                                              f"noise=alls={noise}:allf=t[v]",
+        "-map", "[v]",
+        "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+        path,
+    ]
+    subprocess.run(cmd, check=True, capture_output=True)
+
+
+def bench_reuse(args):
+    import pandas as pd
+
+    cats = set(CATEGORY_ORDER) - {"exif"}
+    fields = [f for c in CATEGORY_ORDER if c in cats for f in FEATURE_CATEGORIES[c]]
+    tmp = tempfile.mkdtemp(prefix="bench_visual_")
+    try:
+        _write_synthetic_slides(os.path.join(tmp, "slides.mp4"), args.size, args.slide_seconds)
+        print(f"video: {sum(args.slide_seconds):g}s at {args.size}, {len(args.slide_seconds)} static slides, "
+              f"ffmpeg-pipe at {args.fps} fps", flush=True)
+        row = {"file_path": "slides.mp4"}
+        config = dict(base_dir=tmp, file_col="file_path", active_categories=cats, extractor="ffmpeg-pipe",
+                      fps=args.fps, scene_threshold=27.0, min_scene_len=15, frame_mode="middle",
+                      frames_per_scene=3)
+
+        def means(result):
+            frame_df = pd.DataFrame([fr["data"] for fr in result["frames"]]).assign(ok=True)
+            agg = aggregate_video_features(frame_df, np.zeros(len(frame_df), dtype=np.int64), fields)
+            return {k: v for k, v in agg.iloc[0].items() if k.endswith("_mean")}
+
+        t_all, ref = _timeit(lambda: analyze_video(None, row, **config), args.repeat)
+        n = len(ref["frames"])
+        print(f"  every frame      : {t_all:6.2f} s  ({n} frames analyzed)", flush=True)
+        ref_means = means(ref)
+        for delta in args.deltas:
+            t, out = _timeit(lambda: analyze_video(None, row, reuse_delta=delta, **config), args.repeat)
+            reused = sum(fr["reused"] for fr in out["frames"])
+            drift = sorted(((abs(v - ref_means[k]) / max(abs(ref_means[k]), 1e-9), k)
+                            for k, v in means(out).items()), reverse=True)[:3]
+            print(f"  --reuse-delta {delta:<3g}: {t:6.2f} s  ({t_all / t:4.1f}x; {n - reused} analyzed, "
+                  f"{reused} reused); largest relative drift of means: "
+                  + ", ".join(f"{k} {d:.4f}" for d, k in drift), flush=True)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the Pillow visual pipeline")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p = sub.add_parser("palette", help="Dominant-color k-means engines")
+    p.add_argument("--images", type=int, default=200, help="Number of synthetic images")
+    p.add_argument("--repeat", type=int, default=3, help="Timing repeats (best-of)")
+    p.set_defaults(func=bench_palette)
+
+    p = sub.add_parser("executor", help="Thread vs process pool scaling")
+    p.add_argument("--images", type=int, default=96, help="Number of synthetic JPEGs")
+    p.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="Worker counts to sweep")
+    p.add_argument("--features", default="rgb,hsv,texture,shape,spatial,quality",
+                   help="Feature categories to extract")
+    p.set_defaults(func=bench_executor)
+
+    p = sub.add_parser("filters", help="Laplacian/Sobel engine vs ImageFilter.Kernel")
+    p.add_argument("--images", type=int, default=24, help="Number of synthetic JPEGs for the drift report")
+    p.add_argument("--sizes", nargs="+", default=["640x480", "1920x1080", "4000x3000"],
+                   help="Plane sizes (WxH) to time")
+    p.add_argument("--repeat", type=int, default=3, help="Timing repeats (best-of)")
+    p.set_defaults(func=bench_filters)
+
+    p = sub.add_parser("decode", help="Header-only and luma decode vs full decode")
+    p.add_argument("--images", type=int, default=24, help="Number of synthetic JPEGs")
+    p.add_argument("--size", default="4000x3000", help="Image size (WxH)")
+    p.add_argument("--repeat", type=int, default=3, help="Timing repeats (best-of)")
+    p.set_defaults(func=bench_decode)
+
+    p = sub.add_parser("grid", help="Fixed-grid kernel vs per-image extractors")
+    p.add_argument("--grid", default="256x256", help="Common grid (WxH)")
+    p.add_argument("--images", type=int, default=16, help="Number of synthetic images")
+    p.add_argument("--repeat", type=int, default=3, help="Timing repeats (best-of)")
+    p.set_defaults(func=bench_grid)
+
+    p = sub.add_parser("video", help="JPEG frame extraction vs rawvideo pipe")
+    p.add_argument("--size", default="1280x720", help="Synthetic clip size (WxH)")
+    p.add_argument("--seconds", type=int, default=10, help="Synthetic clip length")
+    p.add_argument("--fps", type=float, default=2.0, help="Frames per second to sample")
+    p.add_argument("--frame-max-side", type=int, default=640,
+                   help="Also time the pipe with ffmpeg downscaling to this long side (0 = skip)")
+    p.add_argument("--repeat", type=int, default=2, help="Timing repeats (best-of)")
+    p.set_defaults(func=bench_video)
+
+    p = sub.add_parser("scenes", help="Detect-then-seek vs single-pass scene frame capture")
+    p.add_argument("--size", default="1280x720", help="Synthetic clip size (WxH)")
+    p.add_argument("--scene-seconds", type=float, nargs="+", default=[4, 1, 6, 2, 8],
+                   help="Length of each synthetic scene")
+    p.add_argument("--frames-per-scene", type=int, default=3, help="N for evenly-spaced")
+    p.add_argument("--buffer", type=int, default=SCENE_BUFFER, help="Candidate frames held per open scene")
+    p.add_argument("--detect-scale", type=float, default=0.25, help="Reduced detection stream scale")
+    p.add_argument("--detect-skip", type=int, default=2, help="Reduced detection stream frame skip")
+    p.add_argument("--repeat", type=int, default=1, help="Timing repeats (best-of)")
+    p.set_defaults(func=bench_scenes)
+
+    p = sub.add_parser("segments", help="Whole-video vs time-segmented analysis of one long video")
+    p.add_argument("--size", default="640x360", help="Synthetic clip size (WxH)")
+    p.add_argument("--scene-seconds", type=float, nargs="+", default=[7, 2, 12, 5, 9, 3, 14, 8],
+                   help="Length of each synthetic scene")
+    p.add_argument("--segment-seconds", type=float, default=10, help="Segment length")
+    p.add_argument("--fps", type=float, default=2.0, help="ffmpeg-pipe frames per second to sample")
+    p.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker counts to sweep")
+    p.add_argument("--repeat", type=int, default=1, help="Timing repeats (best-of)")
+    p.set_defaults(func=bench_segments)
+
+    p = sub.add_parser("reuse", help="Frame-delta reuse on a near-static clip")
+    p.add_argument("--size", default="1280x720", help="Synthetic clip size (WxH)")
+    p.add_argument("--slide-seconds", type=float, nargs="+", default=[8, 5, 12, 3, 10],
+                   help="Length of each synthetic slide")
+    p.add_argument("--fps", type=float, default=2.0, help="ffmpeg-pipe frames per second to sample")
+    p.add_argument("--deltas", type=float, nargs="+", default=[1, 2, 4], help="--reuse-delta values to time")
+    p.add_argument("--repeat", type=int, default=1, help="Timing repeats (best-of)")
+    p.set_defaults(func=bench_reuse)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Perceptual hashes and a Hamming-distance index for near-duplicate images.
+
+Reposted and re-encoded images differ byte-for-byte but hash to the same (or
+a nearby) 64-bit perceptual hash. `image_hash` decodes a small luma thumbnail
+(JPEG draft scaling, so the full image is never decoded) and returns a pHash
+(DCT of a 32x32 plane, low 8x8 band vs its median) or a dHash (horizontal
+gradient signs of a 9x8 plane). `BKTree` finds the closest indexed hash
+within a Hamming radius without comparing against every entry.
+"""
+
+import numpy as np
+from PIL import Image
+
+HASH_BITS = 64
+HASH_KINDS = {"phash", "dhash"}
+
+
+def _bits_to_int(bits):
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+def _dct_matrix(n):
+    """Orthonormal DCT-II basis, (n, n)."""
+    k = np.arange(n)[:, None]
+    m = np.cos(np.pi * (2 * np.arange(n)[None, :] + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    m[0] /= np.sqrt(2.0)
+    return m
+
+
+_DCT32 = _dct_matrix(32)
+
+
+def phash(gray):
+    """64-bit pHash of an L-mode image."""
+    plane = np.asarray(gray.resize((32, 32), Image.LANCZOS), dtype=np.float64)
+    low = (_DCT32 @ plane @ _DCT32.T)[:8, :8]
+    return _bits_to_int(low > np.median(low))
+
+
+def dhash(gray):
+    """64-bit dHash of an L-mode image."""
+    plane = np.asarray(gray.resize((9, 8), Image.LANCZOS), dtype=np.int16)
+    return _bits_to_int(plane[:, 1:] > plane[:, :-1])
+
+
+HASHES = {"phash": phash, "dhash": dhash}
+
+
+def image_hash(path, kind="phash"):
+    """Perceptual hash of one image file, or None if it cannot be decoded."""
+    try:
+        with Image.open(path) as src:
+            src.draft("L", (64, 64))
+            gray = src.convert("L") if src.mode in ("L", "RGB") else src.convert("RGB").convert("L")
+        return HASHES[kind](gray)
+    except Exception:
+        return None
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    """Burkhard-Keller tree over integer hashes under Hamming distance.
+
+    add() stores (hash, item); nearest() returns the closest stored
+    (distance, item) within max_dist, preferring the earliest-added item on
+    ties, or None."""
+
+    def __init__(self):
+        self._root = None  # [hash, item, order, {distance: child}]
+        self._n = 0
+
+    def __len__(self):
+        return self._n
+
+    def add(self, h, item):
+        node = [h, item, self._n, {}]
+        self._n += 1
+        if self._root is None:
+            self._root = node
+            return
+        cur = self._root
+        while True:
+            d = hamming(h, cur[0])
+            child = cur[3].get(d)
+            if child is None:
+                cur[3][d] = node
+                return
+            cur = child
+
+    def nearest(self, h, max_dist):
+        if self._root is None:
+            return None
+        best = None
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            d = hamming(h, node[0])
+            if d <= max_dist and (best is None or (d, node[2]) < best[:2]):
+                best = (d, node[2], node[1])
+            for dist, child in node[3].items():
+                if d - max_dist <= dist <= d + max_dist:
+                    stack.append(child)
+        return None if best is None else (best[0], best[2])
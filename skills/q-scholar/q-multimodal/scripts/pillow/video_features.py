@@ -1,10 +1,16 @@
 """
 Video visual feature extraction: frame extraction + Pillow analysis.
 
-Two frame-extraction strategies (selected via --extractor):
+Four frame-extraction strategies (selected via --extractor):
   - scenedetect (default): PySceneDetect detects scene boundaries; 1+ frames
-    are sampled per scene per --frame-mode (middle / boundaries / evenly-spaced)
-  - ffmpeg: fixed-interval sampling at --fps
+    are sampled per scene per --frame-mode (middle / boundaries / evenly-spaced).
+    --detect-scale / --detect-skip run detection on a reduced stream and
+    capture only the sampled frames at full resolution
+  - ffmpeg: fixed-interval sampling at --fps, frames written as JPEGs
+  - ffmpeg-pipe: fixed-interval sampling at --fps, raw RGB frames streamed
+    from ffmpeg's stdout and analyzed in memory (no temp files)
+  - keyframes: only the stream's keyframes (I-frames) are decoded, streamed
+    in memory like ffmpeg-pipe
 
 Pillow visual feature extraction runs on each extracted frame, producing:
   - Frame-level: one row per frame (temporal detail + scene metadata)
@@ -17,42 +23,71 @@ background/piped execution.
 """
 
 import argparse
+import io
 import os
 import shutil
 import subprocess
 import tempfile
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 from pathlib import Path
-from statistics import mode as stat_mode
 
 import numpy as np
 import pandas as pd
+from PIL import Image
 from tqdm import tqdm
 
 import sys
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
-from common import read_input, save_excel, derive_subject, merge_checkpoints, source_columns
+from common import (
+    read_input, derive_subject, merge_checkpoints, source_columns, run_work_queue,
+    add_checkpoint_args, checkpoint_path, checkpoint_done, CheckpointWriter, SubjectStream,
+    add_schedule_args, schedule_report,
+)
+from media_probe import (
+    COST_UNITS, add_probe_args, estimate_cost, open_probe_cache, probe_media, probe_subjects, probe_summary,
+)
 from visual_features import (
     CATEGORY_ORDER,
     FEATURE_CATEGORIES,
+    INT_FIELDS,
+    STRING_FIELDS,
+    analyze_image_array,
     analyze_image_from_path,
 )
 
 VIDEO_EXTENSIONS = {".mp4", ".mov", ".avi", ".mkv", ".webm"}
 FRAME_MODES = {"middle", "boundaries", "evenly-spaced"}
+EXTRACTORS = ["scenedetect", "ffmpeg", "ffmpeg-pipe", "keyframes"]
+PIPE_EXTRACTORS = {"ffmpeg-pipe", "keyframes"}  # raw frames over ffmpeg's stdout
+SEGMENT_EXTRACTORS = {"scenedetect", "ffmpeg", "ffmpeg-pipe"}  # can split long videos
+SCENE_BUFFER = 32  # candidate frames held per open scene (scenedetect)
+SCENE_BUFFER_MB = 128  # cap on decoded frames held per video in flight (scenedetect)
+DELTA_THUMB = 32  # side of the luma thumbnail compared by --reuse-delta
 
 
 # ---------------------------------------------------------------------------
 # FFmpeg frame extraction (fixed-interval)
 # ---------------------------------------------------------------------------
 
-def extract_frames_ffmpeg(video_path, output_dir, fps=1.0):
+def _window_args(window):
+    """ffmpeg (input, output) options limiting decoding to window=(start_s, end_s)."""
+    if window is None:
+        return [], []
+    start, end = window
+    return (["-ss", f"{start:.6f}"] if start else []), ([] if end is None else ["-t", f"{end - start:.6f}"])
+
+
+def extract_frames_ffmpeg(video_path, output_dir, fps=1.0, window=None):
     """Extract frames at constant FPS via FFmpeg.
-    Returns list of {path, scene_id, scene_start, scene_end, timestamp}."""
+    window: optional (start_s, end_s) time segment (accurate input seek).
+    Returns list of {image, scene_id, scene_start, scene_end, timestamp}."""
     os.makedirs(output_dir, exist_ok=True)
+    in_args, out_args = _window_args(window)
     cmd = [
-        "ffmpeg", "-i", video_path,
+        "ffmpeg", *in_args, "-i", video_path, *out_args,
         "-vf", f"fps={fps}",
         "-q:v", "2",
         os.path.join(output_dir, "%06d.jpg"),
@@ -65,18 +100,193 @@ def extract_frames_ffmpeg(video_path, output_dir, fps=1.0):
 
     frames = sorted(Path(output_dir).glob("*.jpg"))
     step = 1.0 / fps if fps > 0 else 1.0
+    offset = window[0] if window else 0.0
     return [
         {
-            "path": str(f),
+            "image": str(f),
             "scene_id": None,
             "scene_start": None,
             "scene_end": None,
-            "timestamp": i * step,
+            "timestamp": offset + i * step,
         }
         for i, f in enumerate(frames)
     ]
 
 
+# ---------------------------------------------------------------------------
+# FFmpeg rawvideo pipe (fixed-interval, in memory)
+# ---------------------------------------------------------------------------
+
+def video_stream_info(media):
+    """{size, fps, duration} of the first video stream from a
+    media_probe.probe_media result. size is the displayed (width, height) —
+    90/270-degree rotation metadata swaps the sides, as ffmpeg autorotates
+    decoded frames. fps is the average frame rate; duration (s) is the
+    stream's, else the container's, else None."""
+    v = media["video"]
+    if v is None:
+        raise RuntimeError("no video stream")
+    w, h = v["width"], v["height"]
+    if v["rotation"] % 180:
+        w, h = h, w
+    duration = v["duration"] if v["duration"] is not None else media["duration"]
+    return {"size": (w, h), "fps": v["fps"], "duration": duration}
+
+
+def probe_video(video_path):
+    """First video stream via ffprobe: {size, fps, duration} (see
+    video_stream_info)."""
+    return video_stream_info(probe_media(video_path))
+
+
+def probe_video_size(video_path):
+    """Displayed (width, height) of the first video stream (see probe_video)."""
+    return probe_video(video_path)["size"]
+
+
+def pipe_frame_size(size, max_side=None):
+    """Frame size ffmpeg scales to before piping: size, or fit within max_side."""
+    w, h = size
+    if max_side and max(w, h) > max_side:
+        r = max_side / max(w, h)
+        return max(1, round(w * r)), max(1, round(h * r))
+    return w, h
+
+
+def _read_frame(stream, view):
+    """Fill view from stream; returns bytes read (< len(view) only at EOF)."""
+    got = 0
+    while got < len(view):
+        n = stream.readinto(view[got:])
+        if not n:
+            break
+        got += n
+    return got
+
+
+def _pipe_frames(cmd, w, h):
+    """Run an ffmpeg command writing raw 3-channel frames of (w, h) to
+    stdout. Yields one (h, w, 3) uint8 buffer refilled in place per frame."""
+    frame = np.empty((h, w, 3), dtype=np.uint8)
+    view = memoryview(frame).cast("B")
+    with tempfile.TemporaryFile() as err:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=err, stdin=subprocess.DEVNULL)
+        try:
+            while True:
+                got = _read_frame(proc.stdout, view)
+                if got < len(view):
+                    break
+                yield frame
+            if proc.wait() != 0:
+                err.seek(0)
+                raise RuntimeError(f"ffmpeg failed: {err.read().decode(errors='replace').strip()}")
+            if got:
+                raise RuntimeError(f"ffmpeg pipe ended mid-frame ({got} of {len(view)} bytes)")
+        finally:
+            proc.stdout.close()
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+
+
+def iter_frames_pipe(video_path, size, fps=1.0, max_side=None, window=None):
+    """Stream frames sampled at fps as raw RGB from ffmpeg's stdout.
+
+    size: displayed (w, h) from probe_video_size; with max_side, ffmpeg
+    downscales (area filter) before piping. window: optional (start_s,
+    end_s) time segment. Yields (timestamp, frame), where frame is one
+    (h, w, 3) uint8 buffer refilled in place for every frame — analyze it
+    before advancing. Nothing is written to disk."""
+    w, h = pipe_frame_size(size, max_side)
+    vf = f"fps={fps}" + (f",scale={w}:{h}:flags=area" if (w, h) != tuple(size) else "")
+    in_args, out_args = _window_args(window)
+    cmd = [
+        "ffmpeg", "-loglevel", "error",
+        *in_args, "-i", video_path, *out_args,
+        "-an", "-sn",
+        "-vf", vf,
+        "-f", "rawvideo", "-pix_fmt", "rgb24",
+        "pipe:1",
+    ]
+    step = 1.0 / fps if fps > 0 else 1.0
+    offset = window[0] if window else 0.0
+    for i, frame in enumerate(_pipe_frames(cmd, w, h)):
+        yield offset + i * step, frame
+
+
+@lru_cache(maxsize=None)
+def passthrough_args():
+    """ffmpeg output options that hand every decoded frame through without
+    duplicating or dropping any: -fps_mode passthrough (ffmpeg 5.1+), or
+    the older -vsync passthrough where -fps_mode is not available."""
+    try:
+        opts = subprocess.run(["ffmpeg", "-hide_banner", "-h", "long"], capture_output=True, text=True).stdout
+    except OSError:
+        opts = ""
+    return ("-fps_mode", "passthrough") if "-fps_mode" in opts else ("-vsync", "passthrough")
+
+
+# ---------------------------------------------------------------------------
+# Keyframes (I-frames only, in memory)
+# ---------------------------------------------------------------------------
+
+def probe_keyframe_times(video_path):
+    """Presentation times (s) of the video stream's keyframes, read from
+    packet flags (no decoding), relative to the stream's first packet."""
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags",
+        "-of", "csv=p=0",
+        video_path,
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe failed: {result.stderr.strip()}")
+    first, keys = None, []
+    for line in result.stdout.splitlines():
+        pts, _, flags = line.partition(",")
+        try:
+            t = float(pts)
+        except ValueError:
+            continue
+        first = t if first is None else min(first, t)
+        if "K" in flags:
+            keys.append(t)
+    return sorted(t - first for t in keys)
+
+
+def iter_frames_keyframes(video_path, size, max_side=None):
+    """Decode only the keyframes (ffmpeg -skip_frame nokey) and stream them
+    as raw RGB, like iter_frames_pipe. Yields (timestamp, frame) with the
+    same in-place buffer caveat; timestamps come from probe_keyframe_times.
+    Raises RuntimeError if ffmpeg decodes a different number of keyframes
+    than ffprobe flagged, since the pairing would then be wrong."""
+    times = probe_keyframe_times(video_path)
+    w, h = pipe_frame_size(size, max_side)
+    cmd = [
+        "ffmpeg", "-loglevel", "error",
+        "-skip_frame", "nokey",
+        "-i", video_path,
+        "-an", "-sn",
+        *passthrough_args(),
+    ]
+    if (w, h) != tuple(size):
+        cmd += ["-vf", f"scale={w}:{h}:flags=area"]
+    cmd += ["-f", "rawvideo", "-pix_fmt", "rgb24", "pipe:1"]
+    n = 0
+    for frame in _pipe_frames(cmd, w, h):
+        # decoded keyframes pair with flagged packets in order
+        if n >= len(times):
+            raise RuntimeError(f"ffmpeg decoded more keyframes than ffprobe flagged ({len(times)}); "
+                               "keyframe timestamps would be wrong")
+        yield times[n], frame
+        n += 1
+    if n != len(times):
+        raise RuntimeError(f"ffmpeg decoded {n} keyframes but ffprobe flagged {len(times)}; "
+                           "keyframe timestamps would be wrong")
+
+
 # ---------------------------------------------------------------------------
 # PySceneDetect frame extraction (scene-based)
 # ---------------------------------------------------------------------------
@@ -99,13 +309,130 @@ def _target_frames_for_scene(start_frame, end_frame, frame_mode, frames_per_scen
     return [start_frame + int(round(k * span / (n - 1))) for k in range(n)]
 
 
-def extract_frames_scenedetect(video_path, output_dir, threshold=27.0,
-                               min_scene_len=15, frame_mode="middle",
-                               frames_per_scene=3):
-    """Detect scenes with PySceneDetect, sample frames per mode, write JPEGs.
-    Returns list of {path, scene_id, scene_start, scene_end, timestamp}."""
+class SceneFrameBuffer:
+    """Bounded candidate frames for the scene being decoded.
+
+    Frames from the scene's first frame on are kept at a stride that doubles
+    whenever more than `capacity` are held, so the kept frames always span
+    the whole scene; the last `tail` frames are also kept verbatim, covering
+    the detector's cut lag so the frames just before a cut are exact."""
+
+    def __init__(self, capacity, tail):
+        self.capacity = max(int(capacity), 1)
+        self.recent = deque(maxlen=max(int(tail), 1))
+        self.start = 0
+        self.stride = 1
+        self.kept = {}
+
+    def _keep(self, idx, frame):
+        if (idx - self.start) % self.stride:
+            return
+        self.kept[idx] = frame
+        while len(self.kept) > self.capacity:
+            self.stride *= 2
+            self.kept = {i: f for i, f in self.kept.items() if (i - self.start) % self.stride == 0}
+
+    def add(self, idx, frame):
+        self.recent.append((idx, frame))
+        self._keep(idx, frame)
+
+    def candidates(self, lo, hi):
+        """{frame index: frame} held for lo <= index < hi."""
+        out = {i: f for i, f in self.kept.items() if lo <= i < hi}
+        out.update((i, f) for i, f in self.recent if lo <= i < hi)
+        return out
+
+    def restart(self, start):
+        """Open the next scene at start; frames already read from start on carry over."""
+        carried = self.candidates(start, float("inf"))
+        self.start, self.stride, self.kept = start, 1, {}
+        for i in sorted(carried):
+            self._keep(i, carried[i])
+
+
+def _scene_buffer_shape(frame_mode, buffer_frames, lag, frame_bytes):
+    """(capacity, tail) of a SceneFrameBuffer within SCENE_BUFFER_MB of
+    frame_bytes-sized frames: the tail (lag + 2 frames) and the candidates
+    shrink to fit, so 4K video holds a few frames where 720p holds the full
+    buffer."""
+    budget = max(SCENE_BUFFER_MB * 2 ** 20 // max(frame_bytes, 1), 2)
+    tail = min(lag + 2, budget // 2)
+    # boundaries only ever needs a scene's first frame plus the recent tail
+    capacity = 1 if frame_mode == "boundaries" else min(buffer_frames, budget - tail)
+    return capacity, tail
+
+
+def _stand_in_frame(target, start, end, at, capacity, tail, lag):
+    """The frame nearest target that a SceneFrameBuffer of this shape is
+    sure to hold for the scene [start, end) when its cut is confirmed at
+    frame `at`: its stride grid from start (the stride doubled until the
+    frames up to `at` fit capacity, so the grid is at most one stride coarse
+    and the stand-in at most half a stride away) and its last `tail` frames.
+    Grid frames the previous cut's lag may have pushed out of a tail shorter
+    than the lag (high resolutions) are left out. Depends only on the scene,
+    so a whole-video pass and merge_segments pick the same frame; target
+    itself if nothing qualifies."""
+    stride = 1
+    while (at - start) // stride + 1 > capacity:
+        stride *= 2
+    first, last = start + max(lag + 1 - tail, 0), min(at, end - 1)
+    below = start + (target - start) // stride * stride
+    above_first = start + -(-(first - start) // stride) * stride
+    candidates = [g for g in (below, below + stride, above_first) if first <= g <= last]
+    lo = max(at - tail + 1, start)
+    if lo <= last:
+        candidates.append(min(max(target, lo), last))
+    if not candidates:
+        return target
+    return min(candidates, key=lambda i: (abs(i - target), i))
+
+
+def _nearest_held(held, target):
+    return min(held, key=lambda i: (abs(i - target), i))
+
+
+def _read_frame_at(cap, index):
+    """Frame `index` of an open cv2.VideoCapture by seeking (BGR array), or
+    None if it cannot be read."""
+    import cv2
+
+    cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+    ok, frame = cap.read()
+    return frame if ok and frame is not None else None
+
+
+def iter_frames_scenedetect(video_path, threshold=27.0, min_scene_len=15,
+                            frame_mode="middle", frames_per_scene=3,
+                            buffer_frames=SCENE_BUFFER, window=None, report=None, exact_frames=False):
+    """Detect scenes and capture their sample frames in one decode pass.
+
+    Runs PySceneDetect's ContentDetector frame by frame (same auto-downscale
+    as scenedetect.detect) while a SceneFrameBuffer holds candidates for the
+    open scene. When a cut closes a scene, each target frame per frame_mode
+    is taken from the buffer and JPEG-encoded in memory. A target the buffer
+    no longer holds (a long scene thinned to buffer_frames, or a buffer cut
+    down to SCENE_BUFFER_MB at high resolutions) is replaced by the nearest
+    frame the buffer is sure to hold (_stand_in_frame), at most half the
+    buffer's stride away (at most (scene length + min_scene_len) / capacity
+    frames); timestamp is that frame's and target_second the target's, so
+    the two differ only for a stand-in. exact_frames reads such targets
+    back by seeking instead, so every frame is the exact target.
+    Yields {image, scene_id, scene_start, scene_end, timestamp,
+    target_second, scene_frames} scene by scene; nothing is written to disk.
+
+    window: (start_s, end_s) — process one time segment of a long video
+    (end_s None = to the end). Decoding starts min_scene_len + 2 frames
+    early to warm the detector and runs that far past end_s to catch late
+    cuts; only cuts in [start, end) count, and only scenes that open and
+    close inside the window are emitted (the scenes crossing its edges are
+    rebuilt by merge_segments). report: optional dict that receives fps,
+    the frames in [start, end) scoring above the threshold, the scenes
+    emitted as (start, end, frame at which the closing cut was confirmed),
+    and the video's end frame if it was reached."""
     try:
-        from scenedetect import detect, ContentDetector
+        from scenedetect import open_video, ContentDetector
+        from scenedetect.detector import FlashFilter
+        from scenedetect.scene_manager import compute_downscale_factor
         import cv2
     except ImportError as e:
         raise RuntimeError(
@@ -116,72 +443,267 @@ def extract_frames_scenedetect(video_path, output_dir, threshold=27.0,
     if frame_mode not in FRAME_MODES:
         raise ValueError(f"invalid frame_mode={frame_mode}; expected one of {sorted(FRAME_MODES)}")
 
-    os.makedirs(output_dir, exist_ok=True)
-
-    scene_list = detect(
-        video_path,
-        ContentDetector(threshold=threshold, min_scene_len=min_scene_len),
-    )
-
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        raise RuntimeError(f"opencv failed to open video: {video_path}")
     try:
-        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
-        if fps <= 0:
-            raise RuntimeError(f"opencv reported non-positive fps ({fps}) for {video_path}")
-
-        if not scene_list:
-            if total_frames <= 0:
-                return []
-            scenes = [(0, total_frames)]
-        else:
-            scenes = [(s.get_frames(), e.get_frames()) for s, e in scene_list]
-
-        results = []
-        for scene_idx, (start_f, end_f) in enumerate(scenes, start=1):
-            scene_start_sec = start_f / fps
-            scene_end_sec = end_f / fps
-            targets = _target_frames_for_scene(start_f, end_f, frame_mode, frames_per_scene)
-
-            for img_idx, target in enumerate(targets, start=1):
-                cap.set(cv2.CAP_PROP_POS_FRAMES, target)
-                ret, frame = cap.read()
-                if not ret or frame is None:
+        video = open_video(video_path, backend="opencv")
+    except Exception as e:
+        raise RuntimeError(f"opencv failed to open video: {video_path} ({e})")
+    fps = float(video.frame_rate or 0.0)
+    if fps <= 0:
+        raise RuntimeError(f"opencv reported non-positive fps ({fps}) for {video_path}")
+
+    # ContentDetector(min_scene_len=0) only scores frames (a cut for every
+    # frame above the threshold); the min_scene_len merge it would apply
+    # runs separately, so segments can report the raw above-threshold flags.
+    detector = ContentDetector(threshold=threshold, min_scene_len=0)
+    flash = FlashFilter(FlashFilter.Mode.MERGE, min_scene_len)
+    lag = flash.max_behind
+    capacity, tail = _scene_buffer_shape(frame_mode, buffer_frames, lag,
+                                         video.frame_size[0] * video.frame_size[1] * 3)
+    buf = SceneFrameBuffer(capacity, tail)
+    factor = compute_downscale_factor(max(video.frame_size))
+    seeker = None  # cv2.VideoCapture for targets the buffer no longer holds (exact_frames)
+    start, stop = 0, None
+    if window is not None:
+        start = round(window[0] * fps)
+        stop = None if window[1] is None else round(window[1] * fps)
+        if start > 0:
+            video.seek(max(start - min_scene_len - 2, 0))
+    report = report if report is not None else {}
+    report.update(fps=fps, above=[], scenes=[], end=None)
+    scene_id, scene_start = 0, start
+    scene_open = start == 0  # False while inside a scene that began before the window
+
+    def close_scene(end, at):
+        nonlocal scene_id, seeker
+        scene_id += 1
+        report["scenes"].append((scene_start, end, at))
+        held = buf.candidates(scene_start, end)
+        for wanted in _target_frames_for_scene(scene_start, end, frame_mode, frames_per_scene):
+            target = wanted
+            if not exact_frames:
+                target = _stand_in_frame(target, scene_start, end, at, capacity, tail, lag)
+            frame = held.get(target)
+            if frame is None and exact_frames:
+                seeker = seeker or cv2.VideoCapture(video_path)
+                frame = _read_frame_at(seeker, target)
+            if frame is None:
+                if not held:
                     continue
-                out_name = f"scene_{scene_idx:04d}_img_{img_idx:02d}.jpg"
-                out_path = os.path.join(output_dir, out_name)
-                cv2.imwrite(out_path, frame, [cv2.IMWRITE_JPEG_QUALITY, 95])
-                results.append({
-                    "path": out_path,
-                    "scene_id": scene_idx,
-                    "scene_start": float(scene_start_sec),
-                    "scene_end": float(scene_end_sec),
-                    "timestamp": float(target / fps),
-                })
-        return results
+                target = _nearest_held(held, target)
+                frame = held[target]
+            ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 95])
+            if not ok:
+                continue
+            yield {
+                "image": io.BytesIO(jpeg.tobytes()),
+                "scene_id": scene_id,
+                "scene_start": float(scene_start / fps),
+                "scene_end": float(end / fps),
+                "timestamp": float(target / fps),
+                "target_second": float(wanted / fps),
+                "scene_frames": (scene_start, end),
+            }
+
+    def on_cut(cut, at):
+        nonlocal scene_start, scene_open
+        if cut < scene_start or (stop is not None and cut >= stop) or (cut == scene_start and scene_open):
+            return
+        if scene_open and cut > scene_start:
+            yield from close_scene(cut, at)
+        scene_start, scene_open = cut, True
+        buf.restart(cut)
+
+    try:
+        first_size, last = None, None
+        while True:
+            frame = video.read()
+            if frame is False:
+                break
+            # Like SceneManager: frames whose size differs from the first are skipped.
+            size = (frame.shape[1], frame.shape[0])
+            if first_size is None:
+                first_size = size
+            elif size != first_size:
+                continue
+            last = video.position.frame_num
+            if stop is not None and last > stop + lag:
+                return
+            small = frame
+            if factor > 1.0:
+                small = cv2.resize(frame, (max(1, round(size[0] / factor)), max(1, round(size[1] / factor))),
+                                   interpolation=cv2.INTER_LINEAR)
+            if last >= start:
+                buf.add(last, frame)
+            above = bool(detector.process_frame(video.position, small))
+            if above and last >= start and (stop is None or last < stop):
+                report["above"].append(last)
+            for cut in sorted(c.frame_num for c in flash.filter(video.position, above)):
+                yield from on_cut(cut, last)
+        if last is None:
+            return
+        report["end"] = last + 1
+        if scene_open and last >= scene_start:
+            yield from close_scene(last + 1, last)
     finally:
-        cap.release()
+        if seeker is not None:
+            seeker.release()
+
+
+def detect_scenes_scaled(video_path, info, threshold=27.0, min_scene_len=15, scale=1.0, skip=0):
+    """Scene boundaries from a reduced detection stream.
+
+    ffmpeg downscales by `scale` (area filter) and passes every (skip+1)-th
+    frame as raw BGR; ContentDetector (plus scenedetect's auto-downscale)
+    runs on those frames under their true frame numbers, so min_scene_len
+    keeps its meaning. info: probe_video() of the file. Returns
+    [(start_frame, end_frame)], the whole stream as one scene if there are
+    no cuts."""
+    from scenedetect import ContentDetector, FrameTimecode
+    from scenedetect.scene_manager import compute_downscale_factor
+    import cv2
+
+    (src_w, src_h), fps = info["size"], info["fps"]
+    w, h = max(1, round(src_w * scale)), max(1, round(src_h * scale))
+    step = max(int(skip), 0) + 1
+    filters = []
+    if step > 1:
+        filters.append(f"select=not(mod(n\\,{step}))")
+    if (w, h) != (src_w, src_h):
+        filters.append(f"scale={w}:{h}:flags=area")
+    cmd = ["ffmpeg", "-loglevel", "error", "-i", video_path, "-an", "-sn", *passthrough_args()]
+    if filters:
+        cmd += ["-vf", ",".join(filters)]
+    cmd += ["-f", "rawvideo", "-pix_fmt", "bgr24", "pipe:1"]
+
+    detector = ContentDetector(threshold=threshold, min_scene_len=min_scene_len)
+    factor = compute_downscale_factor(max(w, h))
+    small_size = (max(1, round(w / factor)), max(1, round(h / factor)))
+    cuts, last = set(), None
+    for i, frame in enumerate(_pipe_frames(cmd, w, h)):
+        last = i * step
+        small = cv2.resize(frame, small_size, interpolation=cv2.INTER_LINEAR) if factor > 1.0 else frame
+        cuts.update(c.frame_num for c in detector.process_frame(FrameTimecode(last, fps), small))
+    if last is None:
+        return []
+    cuts.update(c.frame_num for c in detector.post_process(FrameTimecode(last, fps)))
+    bounds = [0] + sorted(c for c in cuts if 0 < c <= last) + [last + 1]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def capture_frame(video_path, frame_index, fps, size):
+    """One full-resolution RGB frame by accurate input seek (ffmpeg -ss
+    decodes from the preceding keyframe only), or None past the end."""
+    w, h = size
+    cmd = [
+        "ffmpeg", "-loglevel", "error",
+        "-ss", f"{max(frame_index - 0.5, 0) / fps:.6f}",
+        "-i", video_path,
+        "-an", "-sn",
+        "-frames:v", "1",
+        "-f", "rawvideo", "-pix_fmt", "rgb24",
+        "pipe:1",
+    ]
+    result = subprocess.run(cmd, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.decode(errors='replace').strip()}")
+    if len(result.stdout) < w * h * 3:
+        return None
+    return np.frombuffer(result.stdout, dtype=np.uint8, count=w * h * 3).reshape(h, w, 3)
+
+
+def iter_frames_scenedetect_scaled(video_path, threshold=27.0, min_scene_len=15,
+                                   frame_mode="middle", frames_per_scene=3,
+                                   detect_scale=1.0, detect_skip=0, info=None):
+    """Scene detection on a downscaled, frame-skipped stream, then
+    full-resolution capture of only the target frames. For long videos,
+    where decoding and converting every frame at full size dominates.
+    Yields {image (RGB array), scene_id, scene_start, scene_end, timestamp,
+    target_second}. info: probe_video() of the file, if already known."""
+    if frame_mode not in FRAME_MODES:
+        raise ValueError(f"invalid frame_mode={frame_mode}; expected one of {sorted(FRAME_MODES)}")
+    if not 0 < detect_scale <= 1:
+        raise ValueError(f"detect_scale must be in (0, 1], got {detect_scale}")
+    info = info or probe_video(video_path)
+    fps = info["fps"]
+    if fps <= 0:
+        raise RuntimeError(f"ffprobe reported non-positive fps ({fps}) for {video_path}")
+    scenes = detect_scenes_scaled(video_path, info, threshold, min_scene_len, detect_scale, detect_skip)
+    for scene_id, (start, end) in enumerate(scenes, start=1):
+        for target in _target_frames_for_scene(start, end, frame_mode, frames_per_scene):
+            frame = capture_frame(video_path, target, fps, info["size"])
+            if frame is None:
+                continue
+            yield {
+                "image": frame,
+                "scene_id": scene_id,
+                "scene_start": float(start / fps),
+                "scene_end": float(end / fps),
+                "timestamp": float(target / fps),
+                "target_second": float(target / fps),
+            }
 
 
 # ---------------------------------------------------------------------------
 # Dispatcher
 # ---------------------------------------------------------------------------
 
+def _pipe_frame_dicts(frames, size):
+    for timestamp, frame in frames:
+        yield {"image": frame, "size": size, "scene_id": None, "scene_start": None,
+               "scene_end": None, "timestamp": timestamp}
+
+
 def extract_frames_dispatch(video_path, output_dir, extractor, fps=1.0,
                             scene_threshold=27.0, min_scene_len=15,
-                            frame_mode="middle", frames_per_scene=3):
+                            frame_mode="middle", frames_per_scene=3,
+                            scene_buffer=SCENE_BUFFER, frame_max_side=None,
+                            detect_scale=1.0, detect_skip=0, window=None, report=None, info=None,
+                            exact_scene_frames=False):
+    """Frames for any extractor as {image, scene_id, scene_start, scene_end,
+    timestamp}. image is a JPEG path (ffmpeg), an in-memory JPEG
+    (scenedetect) or an RGB array (ffmpeg-pipe, keyframes, scenedetect with
+    detect_scale < 1 or detect_skip > 0); arrays may carry the displayed
+    `size` when downscaled. Only ffmpeg uses output_dir; the others yield
+    lazily, and a piped array is only valid until the next frame.
+    window/report: one time segment of a long video (see plan_segments);
+    supported by SEGMENT_EXTRACTORS. info: probe_video() of the file (e.g.
+    from the probe cache); the extractors that need it probe otherwise."""
+    if window is not None and (extractor not in SEGMENT_EXTRACTORS or detect_scale < 1 or detect_skip > 0):
+        raise ValueError(f"time segments are not supported with extractor {extractor}"
+                         + (" and --detect-scale/--detect-skip" if extractor == "scenedetect" else ""))
     if extractor == "scenedetect":
-        return extract_frames_scenedetect(
-            video_path, output_dir,
+        if detect_scale < 1 or detect_skip > 0:
+            return iter_frames_scenedetect_scaled(
+                video_path,
+                threshold=scene_threshold,
+                min_scene_len=min_scene_len,
+                frame_mode=frame_mode,
+                frames_per_scene=frames_per_scene,
+                detect_scale=detect_scale,
+                detect_skip=detect_skip,
+                info=info,
+            )
+        return iter_frames_scenedetect(
+            video_path,
             threshold=scene_threshold,
             min_scene_len=min_scene_len,
             frame_mode=frame_mode,
             frames_per_scene=frames_per_scene,
+            buffer_frames=scene_buffer,
+            window=window,
+            report=report,
+            exact_frames=exact_scene_frames,
         )
     if extractor == "ffmpeg":
-        return extract_frames_ffmpeg(video_path, output_dir, fps=fps)
+        return extract_frames_ffmpeg(video_path, output_dir, fps=fps, window=window)
+    size = (info or {}).get("size")
+    if extractor == "ffmpeg-pipe":
+        size = size or probe_video_size(video_path)
+        return _pipe_frame_dicts(iter_frames_pipe(video_path, size, fps=fps, max_side=frame_max_side,
+                                                  window=window), size)
+    if extractor == "keyframes":
+        size = size or probe_video_size(video_path)
+        return _pipe_frame_dicts(iter_frames_keyframes(video_path, size, max_side=frame_max_side), size)
     raise ValueError(f"unknown extractor: {extractor}")
 
 
@@ -189,10 +711,63 @@ def extract_frames_dispatch(video_path, output_dir, extractor, fps=1.0,
 # Per-video processing
 # ---------------------------------------------------------------------------
 
+def _frame_result(result, number, fr):
+    result["frame_number"] = number
+    result["second"] = float(fr["timestamp"])
+    result["scene_id"] = fr["scene_id"]
+    result["scene_start"] = fr["scene_start"]
+    result["scene_end"] = fr["scene_end"]
+    result["target_second"] = fr.get("target_second")
+    return result
+
+
+def _analyze_frame(fr, active_categories):
+    """Pillow analysis of one extracted frame (path, file object or array).
+    Arrays keep the displayed video size for resolution/aspect_ratio."""
+    if isinstance(fr["image"], np.ndarray):
+        return analyze_image_array(fr["image"], active_categories, size=fr.get("size"))
+    return analyze_image_from_path(fr["image"], active_categories)
+
+
+def frame_thumb(image):
+    """DELTA_THUMB x DELTA_THUMB float32 luma thumbnail (box-averaged) of
+    one extracted frame, or None if it cannot be decoded. JPEGs are
+    draft-decoded at reduced scale; file objects are rewound for the full
+    analysis."""
+    try:
+        if isinstance(image, np.ndarray):
+            src = Image.fromarray(image)
+        else:
+            src = Image.open(image)
+            src.draft("L", (DELTA_THUMB * 2, DELTA_THUMB * 2))
+        with src:
+            thumb = src.convert("L").resize((DELTA_THUMB, DELTA_THUMB), Image.BOX)
+        return np.asarray(thumb, dtype=np.float32)
+    except Exception:
+        return None
+    finally:
+        if hasattr(image, "seek"):
+            image.seek(0)
+
+
+def frame_delta(a, b):
+    """Mean absolute luma difference (0-255) between two frame_thumb()s."""
+    return float(np.abs(a - b).mean())
+
+
 def analyze_video(idx, row, base_dir, file_col, active_categories,
                   extractor, fps, scene_threshold, min_scene_len,
-                  frame_mode, frames_per_scene):
-    """Extract frames from one video, analyze each. Returns {ok, frames, error}."""
+                  frame_mode, frames_per_scene, frame_max_side=None,
+                  scene_buffer=SCENE_BUFFER, detect_scale=1.0, detect_skip=0, window=None,
+                  info=None, reuse_delta=0.0, exact_scene_frames=False):
+    """Extract frames from one video, analyze each. Returns {ok, frames, error}.
+
+    window: analyze only this (start_s, end_s) segment; the result is a part
+    for merge_segments (ok even without frames, plus the scene `segment`
+    report for scenedetect). info: probe_video() of the file, if known.
+    reuse_delta > 0: a frame whose frame_delta() against the last analyzed
+    frame is below it reuses that frame's features instead of being
+    analyzed. Every frame carries `reused` (always False without it)."""
     rel_path = row.get(file_col, "")
     if not rel_path:
         return {"ok": False, "frames": [], "error": "empty path"}
@@ -205,7 +780,8 @@ def analyze_video(idx, row, base_dir, file_col, active_categories,
     if not os.path.isfile(abs_path):
         return {"ok": False, "frames": [], "error": f"file not found: {abs_path}"}
 
-    tmp_dir = tempfile.mkdtemp(prefix="vf_frames_")
+    tmp_dir = tempfile.mkdtemp(prefix="vf_frames_") if extractor == "ffmpeg" else None
+    report = {}
     try:
         frames = extract_frames_dispatch(
             abs_path, tmp_dir, extractor,
@@ -214,37 +790,181 @@ def analyze_video(idx, row, base_dir, file_col, active_categories,
             min_scene_len=min_scene_len,
             frame_mode=frame_mode,
             frames_per_scene=frames_per_scene,
+            scene_buffer=scene_buffer,
+            frame_max_side=frame_max_side,
+            detect_scale=detect_scale,
+            detect_skip=detect_skip,
+            window=window,
+            report=report,
+            info=info,
+            exact_scene_frames=exact_scene_frames,
         )
-        if not frames:
-            return {"ok": False, "frames": [], "error": "no frames extracted"}
-
         frame_results = []
+        last = None  # (thumb, result) of the last successfully analyzed frame
         for i, fr in enumerate(frames):
-            result = analyze_image_from_path(fr["path"], active_categories)
-            result["frame_number"] = i + 1
-            result["second"] = float(fr["timestamp"])
-            result["scene_id"] = fr["scene_id"]
-            result["scene_start"] = fr["scene_start"]
-            result["scene_end"] = fr["scene_end"]
+            thumb = frame_thumb(fr["image"]) if reuse_delta > 0 else None
+            if thumb is not None and last is not None and frame_delta(thumb, last[0]) < reuse_delta:
+                result = _frame_result(dict(last[1], reused=True), i + 1, fr)
+            else:
+                result = _frame_result(_analyze_frame(fr, active_categories), i + 1, fr)
+                result["reused"] = False
+                if reuse_delta > 0:
+                    last = (thumb, result) if thumb is not None and result["ok"] else None
+            if window is not None and "scene_frames" in fr:
+                result["scene_frames"] = fr["scene_frames"]
             frame_results.append(result)
+        if window is not None:
+            return {"ok": True, "frames": frame_results, "error": "", "segment": report}
+        if not frame_results:
+            return {"ok": False, "frames": [], "error": "no frames extracted"}
 
         return {"ok": True, "frames": frame_results, "error": ""}
     except Exception as e:
         return {"ok": False, "frames": [], "error": str(e)}
     finally:
-        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+# ---------------------------------------------------------------------------
+# Long videos: time segments
+# ---------------------------------------------------------------------------
+
+def plan_segments(duration, segment_seconds, step=None):
+    """[(start_s, end_s), ...] covering a video of `duration` seconds; the
+    last segment runs to the end (end_s None). With step (fixed-interval
+    sampling period), segment length is rounded to a multiple of it, so
+    each segment samples the instants a whole-video run would."""
+    length = float(segment_seconds)
+    if step:
+        length = max(round(length / step), 1) * step
+    n = max(int(np.ceil(duration / length)), 1)
+    return [(k * length, (k + 1) * length if k < n - 1 else None) for k in range(n)]
+
+
+def _capture_scene(abs_path, scene, active_categories, fps, frame_mode, frames_per_scene,
+                   scene_buffer=SCENE_BUFFER, min_scene_len=15, exact_frames=False):
+    """Sample frames of a scene (start, end, confirmed at) that crosses
+    segment edges by seeking. Each target is the frame a whole-video pass
+    takes from its buffer (_stand_in_frame), or the exact target with
+    exact_frames, so the frames match a whole-video run."""
+    import cv2
+
+    start, end, at = scene
+    cap = cv2.VideoCapture(abs_path)
+    frame_bytes = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) * int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) * 3
+    capacity, tail = _scene_buffer_shape(frame_mode, scene_buffer, min_scene_len, frame_bytes)
+    results = []
+    try:
+        for wanted in _target_frames_for_scene(start, end, frame_mode, frames_per_scene):
+            target = wanted
+            if not exact_frames:
+                target = _stand_in_frame(target, start, end, at, capacity, tail, min_scene_len)
+            frame = _read_frame_at(cap, target)
+            if frame is None:
+                continue
+            ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 95])
+            if not ok:
+                continue
+            results.append(_frame_result(
+                analyze_image_from_path(io.BytesIO(jpeg.tobytes()), active_categories), 0,
+                {"timestamp": target / fps, "target_second": float(wanted / fps), "scene_id": None,
+                 "scene_start": float(start / fps), "scene_end": float(end / fps)}))
+    finally:
+        cap.release()
+    return results
+
+
+def _replay_cuts(above, end, fps, min_scene_len):
+    """Whole-video scenes [(start, end, confirmed at)] from the frames scoring
+    above the threshold: the min_scene_len merge filter replayed serially,
+    exactly as iter_frames_scenedetect applies it."""
+    from scenedetect import FrameTimecode
+    from scenedetect.detector import FlashFilter
+
+    flash = FlashFilter(FlashFilter.Mode.MERGE, min_scene_len)
+    scenes, scene_start = [], 0
+    for i in range(end):
+        for cut in sorted(c.frame_num for c in flash.filter(FrameTimecode(i, fps), i in above)):
+            if cut > scene_start:
+                scenes.append((scene_start, cut, i))
+                scene_start = cut
+    scenes.append((scene_start, end, end - 1))
+    return scenes
+
+
+def merge_segments(abs_path, parts, active_categories, extractor, min_scene_len=15,
+                   frame_mode="middle", frames_per_scene=3, scene_buffer=SCENE_BUFFER, exact_scene_frames=False):
+    """One video result from its segment results (in segment order).
+
+    Fixed-interval frames are concatenated. For scenedetect, the segments'
+    above-threshold frames are replayed through the merge filter to get the
+    whole-video scene list. A scene a segment emitted whole is kept when the
+    segment closed it exactly as the whole-video pass would (same bounds,
+    confirmed at the same frame); the rest — scenes crossing a segment edge,
+    or cut differently by a segment's cold filter state — are sampled by
+    _capture_scene. scene_id and frame_number are renumbered over the
+    video, and resampled frames get `reused` False.
+    Returns {ok, frames, error} as analyze_video does."""
+    failed = next((p for p in parts if not p["ok"]), None)
+    if failed is not None:
+        return {"ok": False, "frames": [], "error": failed["error"]}
+    if extractor == "scenedetect":
+        reports = [p["segment"] for p in parts]
+        fps = reports[0]["fps"]
+        ends = [r["end"] for r in reports if r["end"] is not None]
+        if not ends:
+            return {"ok": False, "frames": [], "error": "segments never reached the end of the video"}
+        above = {i for r in reports for i in r["above"]}
+        emitted = {}
+        for part, report in zip(parts, reports):
+            closed = {scene[:2]: scene for scene in report["scenes"]}
+            for fr in part["frames"]:
+                bounds = fr.pop("scene_frames")
+                emitted.setdefault(closed[bounds], []).append(fr)
+        frames = []
+        for scene_id, scene in enumerate(_replay_cuts(above, min(ends), fps, min_scene_len), start=1):
+            kept = emitted.get(scene)
+            if kept is None:
+                kept = _capture_scene(abs_path, scene, active_categories, fps, frame_mode, frames_per_scene,
+                                      scene_buffer, min_scene_len, exact_scene_frames)
+            for fr in kept:
+                fr["scene_id"] = scene_id
+            frames.extend(kept)
+    else:
+        frames = [fr for part in parts for fr in part["frames"]]
+    if not frames:
+        return {"ok": False, "frames": [], "error": "no frames extracted"}
+    for i, fr in enumerate(frames, start=1):
+        fr["frame_number"] = i
+        fr.setdefault("reused", False)
+    return {"ok": True, "frames": frames, "error": ""}
 
 
 # ---------------------------------------------------------------------------
 # Aggregation
 # ---------------------------------------------------------------------------
 
-def aggregate_video_features(frame_df, active_fields):
-    """Aggregate frame-level features to video-level summary."""
-    agg = {}
-    numeric_cols = []
-    categorical_cols = []
+def _group_modes(values, keys):
+    """Most frequent non-missing value per key (ties: the value seen first,
+    as statistics.mode), as a Series indexed by key."""
+    present = values.notna().to_numpy()
+    counts = (
+        pd.DataFrame({"key": keys[present], "value": values.to_numpy()[present],
+                      "order": np.flatnonzero(present)})
+        .groupby(["key", "value"], sort=False)["order"].agg(["size", "min"])
+        .reset_index()
+        .sort_values(["key", "size", "min"], ascending=[True, False, True])
+    )
+    return counts.drop_duplicates("key").set_index("key")["value"]
+
 
+def aggregate_video_features(frame_df, keys, active_fields):
+    """Video-level summary of a frame table in one groupby over all videos:
+    one row per distinct key (keys[i] = the video of frame row i), with
+    mean/std/min/max of numeric fields, the mode of categorical ones, and
+    frame_count / ok_ratio / ok."""
+    numeric_cols, categorical_cols = [], []
     for f in active_fields:
         if f in frame_df.columns:
             if pd.api.types.is_numeric_dtype(frame_df[f]):
@@ -252,128 +972,130 @@ def aggregate_video_features(frame_df, active_fields):
             else:
                 categorical_cols.append(f)
 
-    for col in numeric_cols:
-        vals = pd.to_numeric(frame_df[col], errors="coerce").dropna()
-        if len(vals) > 0:
-            agg[f"{col}_mean"] = float(vals.mean())
-            agg[f"{col}_std"] = float(vals.std())
-            agg[f"{col}_min"] = float(vals.min())
-            agg[f"{col}_max"] = float(vals.max())
-        else:
-            agg[f"{col}_mean"] = np.nan
-            agg[f"{col}_std"] = np.nan
-            agg[f"{col}_min"] = np.nan
-            agg[f"{col}_max"] = np.nan
-
+    grouped = frame_df[numeric_cols].apply(pd.to_numeric, errors="coerce").groupby(keys)
+    stats = {stat: getattr(grouped, stat)() for stat in ("mean", "std", "min", "max")}
+    agg = {f"{col}_{stat}": stats[stat][col] for col in numeric_cols for stat in stats}
     for col in categorical_cols:
-        vals = frame_df[col].dropna()
-        if len(vals) > 0:
-            try:
-                agg[f"{col}_mode"] = stat_mode(vals.tolist())
-            except Exception:
-                agg[f"{col}_mode"] = vals.iloc[0]
-        else:
-            agg[f"{col}_mode"] = np.nan
+        agg[f"{col}_mode"] = _group_modes(frame_df[col], keys)
 
-    agg["frame_count"] = len(frame_df)
-    agg["ok_ratio"] = float(frame_df["ok"].sum() / max(len(frame_df), 1))
-
-    return agg
+    ok = frame_df["ok"].astype(bool).groupby(keys)
+    agg["frame_count"] = ok.size()
+    agg["ok_ratio"] = ok.mean()
+    agg["ok"] = ok.any()
+    return pd.DataFrame(agg, index=np.unique(keys))
 
 
 # ---------------------------------------------------------------------------
 # Subject processing
 # ---------------------------------------------------------------------------
 
-def process_subject(name, subject_df, base_dir, file_col, max_workers,
-                    output_dir, active_categories, active_fields,
-                    extractor, fps, scene_threshold, min_scene_len,
-                    frame_mode, frames_per_scene, id_cols=None):
-    """Process all videos for one subject, save frame-level and video-level checkpoints."""
-    rows = subject_df.to_dict("records")
-    results = [None] * len(rows)
-
-    with ThreadPoolExecutor(max_workers=max_workers) as pool:
-        futures = {
-            pool.submit(
-                analyze_video, i, row, base_dir, file_col, active_categories,
-                extractor, fps, scene_threshold, min_scene_len,
-                frame_mode, frames_per_scene,
-            ): i
-            for i, row in enumerate(rows)
-        }
-        with tqdm(total=len(rows), desc=f"  {name}", position=1, leave=False) as vid_bar:
-            for future in as_completed(futures):
-                idx = futures[future]
-                try:
-                    results[idx] = future.result()
-                except Exception as e:
-                    results[idx] = {"ok": False, "frames": [], "error": str(e)}
-                vid_bar.update(1)
-
-    # Build frame-level DataFrame
-    frame_rows = []
-    video_rows = []
-
-    for row, result in zip(rows, results):
-        # file_col is always retained so frame/video rows stay asset-specific.
-        source_data = {c: row.get(c, "") for c in source_columns(id_cols, file_col)}
-
-        if result["ok"] and result["frames"]:
-            any_frame_ok = any(fr["ok"] for fr in result["frames"])
-
-            for fr in result["frames"]:
-                fr_row = dict(source_data)
-                fr_row["frame_number"] = fr["frame_number"]
-                fr_row["second"] = fr["second"]
-                fr_row["scene_id"] = fr.get("scene_id")
-                fr_row["scene_start"] = fr.get("scene_start")
-                fr_row["scene_end"] = fr.get("scene_end")
-                for f in active_fields:
-                    fr_row[f] = fr["data"].get(f, np.nan)
-                fr_row["ok"] = fr["ok"]
-                frame_rows.append(fr_row)
-
-            vid_frame_df = pd.DataFrame([
-                {f: fr["data"].get(f, np.nan) for f in active_fields} | {"ok": fr["ok"]}
-                for fr in result["frames"]
-            ])
-            agg = aggregate_video_features(vid_frame_df, active_fields)
-            vid_row = dict(source_data)
-            vid_row.update(agg)
-            vid_row["ok"] = any_frame_ok
-            video_rows.append(vid_row)
-        else:
-            vid_row = dict(source_data)
-            vid_row["frame_count"] = 0
-            vid_row["ok_ratio"] = 0.0
-            vid_row["ok"] = False
-            video_rows.append(vid_row)
-
-    frame_df = pd.DataFrame(frame_rows) if frame_rows else pd.DataFrame()
-    video_df = pd.DataFrame(video_rows) if video_rows else pd.DataFrame()
-
-    # Save checkpoints
-    frames_dir = os.path.join(output_dir, "frames", "checkpoints")
-    videos_dir = os.path.join(output_dir, "videos", "checkpoints")
-    os.makedirs(frames_dir, exist_ok=True)
-    os.makedirs(videos_dir, exist_ok=True)
-
-    frames_path = os.path.join(frames_dir, f"{name}.xlsx")
-    videos_path = os.path.join(videos_dir, f"{name}.xlsx")
-
-    if not frame_df.empty:
-        save_excel(frame_df, frames_path)
-    if not video_df.empty:
-        save_excel(video_df, videos_path)
-
-    ok_count = sum(1 for r in results if r["ok"])
-    fail_count = len(results) - ok_count
-    total_frames = sum(len(r["frames"]) for r in results if r["ok"])
-    return {
-        "name": name, "total": len(rows), "ok": ok_count, "fail": fail_count,
-        "frames": total_frames, "frames_path": frames_path, "videos_path": videos_path,
-    }
+def _analyze_video_task(task, base_dir, file_col, active_categories, extractor, fps,
+                        scene_threshold, min_scene_len, frame_mode, frames_per_scene,
+                        frame_max_side=None, scene_buffer=SCENE_BUFFER,
+                        detect_scale=1.0, detect_skip=0, reuse_delta=0.0, exact_scene_frames=False):
+    """Work-queue task: analyze each (row, window, info) item of a task
+    list (window None = the whole video; info = probe_video() of the file or
+    None). Bind the config with functools.partial."""
+    return [
+        analyze_video(None, row, base_dir, file_col, active_categories,
+                      extractor, fps, scene_threshold, min_scene_len,
+                      frame_mode, frames_per_scene, frame_max_side, scene_buffer,
+                      detect_scale, detect_skip, window=window, info=info,
+                      reuse_delta=reuse_delta, exact_scene_frames=exact_scene_frames)
+        for row, window, info in task
+    ]
+
+
+def segment_windows(duration, segment_over, segment_seconds, step=None):
+    """Windows to analyze one video in: [None] (whole video) unless its
+    duration (s, None if unknown) exceeds segment_over seconds, then its
+    plan_segments windows, so a long video is spread over the pool instead
+    of holding one worker. segment_over 0 disables splitting."""
+    if segment_over <= 0 or not duration or duration <= segment_over:
+        return [None]
+    return plan_segments(duration, segment_seconds, step)
+
+
+def _task_failed(exc):
+    return {"ok": False, "frames": [], "error": str(exc)}
+
+
+def build_frame_df(rows, results, active_fields, id_cols=None, file_col="file_path"):
+    """Columnar table of the frames of each successful video, and the
+    position in rows of the video each frame row belongs to."""
+    done = [(k, result["frames"]) for k, result in enumerate(results) if result["ok"] and result["frames"]]
+    frames = [fr for _, video_frames in done for fr in video_frames]
+    if not frames:
+        return pd.DataFrame(), np.empty(0, dtype=np.int64)
+    counts = [len(video_frames) for _, video_frames in done]
+    keys = np.repeat([k for k, _ in done], counts)
+    # file_col is always retained so frame/video rows stay asset-specific.
+    cols = {c: np.array([rows[k].get(c, "") for k, _ in done], dtype=object).repeat(counts)
+            for c in source_columns(id_cols, file_col)}
+    for c in ("frame_number", "second", "target_second", "scene_id", "scene_start", "scene_end"):
+        cols[c] = [fr.get(c) for fr in frames]
+    for f in active_fields:
+        cols[f] = [fr["data"].get(f, np.nan) for fr in frames]
+    cols["ok"] = [fr["ok"] for fr in frames]
+    # Written on every run (False without --reuse-delta) so checkpoints
+    # from runs with and without it share one schema.
+    cols["reused"] = [fr["reused"] for fr in frames]
+    return pd.DataFrame(cols), keys
+
+
+VIDEO_TAIL = ["frame_count", "ok_ratio", "ok"]
+
+
+def build_video_df(rows, frame_df, keys, active_fields, id_cols=None, file_col="file_path"):
+    """Video-level rows for every row, in order: source columns plus the
+    aggregated frame features (aggregate_video_features); videos without
+    frames get frame_count 0, ok_ratio 0.0, ok False."""
+    source = source_columns(id_cols, file_col)
+    video_df = pd.DataFrame({c: [row.get(c, "") for row in rows] for c in source})
+    if frame_df.empty:
+        video_df["frame_count"], video_df["ok_ratio"], video_df["ok"] = 0, 0.0, False
+        return video_df
+    agg = aggregate_video_features(frame_df, keys, active_fields).reindex(range(len(rows)))
+    agg["frame_count"] = agg["frame_count"].fillna(0).astype(int)
+    agg["ok_ratio"] = agg["ok_ratio"].fillna(0.0)
+    agg["ok"] = agg["ok"].fillna(False).astype(bool)
+    return pd.concat([video_df, agg], axis=1)
+
+
+def concat_video_dfs(batches, id_cols=None, file_col="file_path"):
+    """One subject's video-level batches as one table: source columns,
+    aggregates in order of first appearance, then VIDEO_TAIL."""
+    video_df = pd.concat(batches, ignore_index=True)
+    lead = source_columns(id_cols, file_col)
+    return video_df[lead + [c for c in video_df.columns if c not in lead and c not in VIDEO_TAIL] + VIDEO_TAIL]
+
+
+def open_subject_writers(name, rows, output_dir, active_fields, id_cols=None,
+                         file_col="file_path", fmt="xlsx"):
+    """(frame stream, video-level writer, video-level batches) for one
+    subject. Finished videos go to the frame stream in video order; each
+    batch becomes one columnar frame table, written to the frame checkpoint
+    and aggregated to video-level rows with one groupby. Video-level rows
+    are small: they collect in the batches list, to be written in one go
+    (concat_video_dfs) when the subject completes."""
+    source = source_columns(id_cols, file_col)
+    frames_path = checkpoint_path(os.path.join(output_dir, "frames", "checkpoints"), name, fmt)
+    videos_path = checkpoint_path(os.path.join(output_dir, "videos", "checkpoints"), name, fmt)
+    batches = []
+
+    def to_frame(positions, results):
+        batch = [rows[i] for i in positions]
+        frame_df, keys = build_frame_df(batch, results, active_fields, id_cols, file_col=file_col)
+        batches.append(build_video_df(batch, frame_df, keys, active_fields, id_cols, file_col=file_col))
+        return frame_df
+
+    frames = SubjectStream(
+        CheckpointWriter(frames_path, fmt, str_cols=source + STRING_FIELDS,
+                         int_cols=INT_FIELDS + ["frame_number", "scene_id"]),
+        len(rows), to_frame)
+    videos = CheckpointWriter(videos_path, fmt, str_cols=source + [f"{f}_mode" for f in STRING_FIELDS],
+                              int_cols=["frame_count"])
+    return frames, videos, batches
 
 
 # ---------------------------------------------------------------------------
@@ -383,15 +1105,18 @@ def process_subject(name, subject_df, base_dir, file_col, max_workers,
 def _run_merge(args):
     # Merge keys: id columns + file column (+frame_number for frames) —
     # never an id alone, so multi-asset posts keep one row per file.
-    for kind, subdir, name, dedup in [
+    # Frame checkpoints from before --reuse-delta lack the reused column,
+    # and those from before stand-in scene frames lack target_second.
+    for kind, subdir, name, dedup, optional in [
         ("Frames", "frames", "_frame_features.xlsx",
-         source_columns(args.id_cols, args.file_col, extra=["frame_number"])),
+         source_columns(args.id_cols, args.file_col, extra=["frame_number"]), {"reused": False, "target_second": np.nan}),
         ("Videos", "videos", "_video_features.xlsx",
-         source_columns(args.id_cols, args.file_col)),
+         source_columns(args.id_cols, args.file_col), None),
     ]:
         ckpt_dir = os.path.join(args.output_dir, subdir, "checkpoints")
         out_path = os.path.join(args.output_dir, subdir, name)
-        _, stats = merge_checkpoints(ckpt_dir, out_path, file_col=args.file_col, dedup_cols=dedup)
+        _, stats = merge_checkpoints(ckpt_dir, out_path, file_col=args.file_col, dedup_cols=dedup,
+                                     optional_cols=optional)
         if stats["files"]:
             print(f"{kind}: merged {stats['files']} checkpoints -> {out_path} ({stats['rows']} rows)", flush=True)
 
@@ -407,8 +1132,10 @@ def main():
     parser.add_argument("--id-cols", nargs="*", default=None, help="Source columns to keep in output (default: file column only)")
     parser.add_argument("--features", default="rgb,hsv,texture,shape,spatial,quality",
                         help="Comma-separated feature categories. Available: rgb,hsv,texture,shape,spatial,quality")
-    parser.add_argument("--extractor", choices=["scenedetect", "ffmpeg"], default="scenedetect",
-                        help="Frame extraction strategy (default: scenedetect)")
+    parser.add_argument("--extractor", choices=EXTRACTORS, default="scenedetect",
+                        help="Frame extraction strategy: scenedetect, ffmpeg (JPEG frames in a temp dir), "
+                             "ffmpeg-pipe (raw frames analyzed in memory), or keyframes (I-frames only, "
+                             "in memory) (default: scenedetect)")
     parser.add_argument("--frame-mode", choices=sorted(FRAME_MODES), default="middle",
                         help="scenedetect only: frames sampled per detected scene (default: middle)")
     parser.add_argument("--frames-per-scene", type=int, default=3,
@@ -417,10 +1144,39 @@ def main():
                         help="scenedetect only: ContentDetector HSV threshold; lower = more scenes (default: 27.0)")
     parser.add_argument("--min-scene-len", type=int, default=15,
                         help="scenedetect only: minimum scene length in frames (default: 15)")
+    parser.add_argument("--scene-buffer", type=int, default=SCENE_BUFFER,
+                        help="scenedetect only: candidate frames held per open scene (at most "
+                             f"{SCENE_BUFFER_MB} MB of frames); targets not held take the nearest held frame "
+                             f"(default: {SCENE_BUFFER})")
+    parser.add_argument("--exact-scene-frames", action="store_true",
+                        help="scenedetect only: read targets the scene buffer does not hold by seeking, so "
+                             "every sampled frame is the exact target (one extra seek per long scene)")
+    parser.add_argument("--detect-scale", type=float, default=1.0,
+                        help="scenedetect only: run detection on an ffmpeg stream downscaled by this "
+                             "factor (0-1], then capture sampled frames at full resolution (default: 1.0)")
+    parser.add_argument("--detect-skip", type=int, default=0,
+                        help="scenedetect only: detect on every (N+1)-th frame; cuts land on the "
+                             "sampled frames. Implies the reduced-stream path (default: 0)")
     parser.add_argument("--fps", type=float, default=1.0,
-                        help="ffmpeg only: frames per second to extract (default: 1.0)")
+                        help="ffmpeg/ffmpeg-pipe only: frames per second to extract (default: 1.0)")
+    parser.add_argument("--frame-max-side", type=int, default=0,
+                        help="ffmpeg-pipe/keyframes only: ffmpeg downscales frames to at most N px on "
+                             "the long side before piping. 0 = native size (default)")
+    parser.add_argument("--segment-over", type=float, default=0,
+                        help="Split videos longer than N seconds (ffprobe) into time segments analyzed "
+                             "in parallel, merged back to the whole-video result. 0 = off (default)")
+    parser.add_argument("--segment-seconds", type=float, default=600,
+                        help="Segment length for --segment-over in seconds (default: 600)")
+    parser.add_argument("--reuse-delta", type=float, default=0,
+                        help="Reuse the last analyzed frame's features for frames whose mean absolute "
+                             f"luma difference from it ({DELTA_THUMB}x{DELTA_THUMB} thumbnail, 0-255) is "
+                             "below N; marked in the frame table's `reused` column. 0 = off (default)")
     parser.add_argument("--subjects", nargs="*", default=None, help="Process only these subjects")
     parser.add_argument("--max-workers", type=int, default=10, help="Number of concurrent workers")
+    add_checkpoint_args(parser)
+    add_schedule_args(parser)
+    add_probe_args(parser)
+    parser.add_argument("--no-cache", action="store_true", help="Disable the persistent ffprobe metadata cache")
     parser.add_argument("--preview", action="store_true", help="Dry run: show pending subjects and exit")
     args = parser.parse_args()
 
@@ -448,19 +1204,29 @@ def main():
         if cat in active_categories:
             active_fields.extend(FEATURE_CATEGORIES[cat])
     print(f"Feature categories: {sorted(active_categories)} ({len(active_fields)} columns)", flush=True)
+    reduced = args.detect_scale < 1 or args.detect_skip > 0
     if args.extractor == "scenedetect":
+        if not 0 < args.detect_scale <= 1:
+            parser.error("--detect-scale must be in (0, 1]")
         mode_desc = args.frame_mode
         if args.frame_mode == "evenly-spaced":
             mode_desc += f", n={args.frames_per_scene}"
+        detect_desc = (f"detect at {args.detect_scale:g}x, every {args.detect_skip + 1} frame(s)" if reduced
+                       else f"buffer={args.scene_buffer} frames" + (", exact" if args.exact_scene_frames else ""))
         print(
             f"Extractor: scenedetect (mode={mode_desc}, "
-            f"threshold={args.scene_threshold}, min_scene_len={args.min_scene_len})",
+            f"threshold={args.scene_threshold}, min_scene_len={args.min_scene_len}, {detect_desc})",
             flush=True,
         )
         if args.fps != 1.0:
             print("  (note: --fps is ignored with --extractor scenedetect)", flush=True)
+        if reduced and (args.scene_buffer != SCENE_BUFFER or args.exact_scene_frames):
+            print("  (note: --scene-buffer and --exact-scene-frames are ignored with --detect-scale/--detect-skip, "
+                  "which always seek exact targets)", flush=True)
     else:
-        print(f"Extractor: ffmpeg (fps={args.fps})", flush=True)
+        size_desc = f", frames <= {args.frame_max_side}px" if args.extractor in PIPE_EXTRACTORS and args.frame_max_side else ""
+        rate_desc = "keyframes only" if args.extractor == "keyframes" else f"fps={args.fps}"
+        print(f"Extractor: {args.extractor} ({rate_desc}{size_desc})", flush=True)
         ignored = [
             f"--{name}={getattr(args, attr)}"
             for name, attr, default in [
@@ -468,11 +1234,47 @@ def main():
                 ("frames-per-scene", "frames_per_scene", 3),
                 ("scene-threshold", "scene_threshold", 27.0),
                 ("min-scene-len", "min_scene_len", 15),
-            ]
+                ("scene-buffer", "scene_buffer", SCENE_BUFFER),
+                ("exact-scene-frames", "exact_scene_frames", False),
+                ("detect-scale", "detect_scale", 1.0),
+                ("detect-skip", "detect_skip", 0),
+            ] + ([("fps", "fps", 1.0)] if args.extractor == "keyframes" else [])
             if getattr(args, attr) != default
         ]
         if ignored:
-            print(f"  (note: ignored with --extractor ffmpeg: {', '.join(ignored)})", flush=True)
+            print(f"  (note: ignored with --extractor {args.extractor}: {', '.join(ignored)})", flush=True)
+    if args.frame_max_side and args.extractor not in PIPE_EXTRACTORS:
+        print(f"  (note: --frame-max-side is ignored with --extractor {args.extractor})", flush=True)
+    if args.segment_over > 0:
+        if args.extractor not in SEGMENT_EXTRACTORS or reduced:
+            print(f"  (note: --segment-over is ignored with --extractor {args.extractor}"
+                  f"{' with --detect-scale/--detect-skip' if reduced else ''})", flush=True)
+            args.segment_over = 0
+        elif args.segment_seconds <= 0:
+            parser.error("--segment-seconds must be positive")
+        elif args.reuse_delta > 0:
+            # Each segment starts its own reuse chain, so reused flags and
+            # values would differ from a whole-video run
+            parser.error("--segment-over and --reuse-delta cannot be combined")
+        else:
+            print(f"Segments: videos over {args.segment_over:g}s split into "
+                  f"{args.segment_seconds:g}s segments", flush=True)
+    if args.reuse_delta > 0:
+        print(f"Frame reuse: frames within {args.reuse_delta:g} mean luma levels of the last analyzed "
+              "frame reuse its features", flush=True)
+    tools = (["ffmpeg", "ffprobe"] if args.extractor in PIPE_EXTRACTORS or (args.extractor == "scenedetect" and reduced)
+             else ["ffmpeg"] if args.extractor == "ffmpeg" else [])
+    probing = [flag for flag, on in [("--segment-over", args.segment_over > 0),
+                                     ("--schedule lpt", args.schedule == "lpt")] if on]
+    if probing and "ffprobe" not in tools:
+        tools.append("ffprobe")
+    missing = [t for t in tools if shutil.which(t) is None]
+    if missing:
+        needed_by = (" / ".join(probing) if missing == ["ffprobe"] and probing
+                     else f"--extractor {args.extractor}"
+                          f"{' with --detect-scale/--detect-skip' if args.extractor == 'scenedetect' and reduced else ''}")
+        print(f"Not found on PATH: {', '.join(missing)} (needed by {needed_by})", flush=True)
+        return
 
     # id/file columns as strings from the read point (never through float)
     df = read_input(args.input, str_cols=source_columns(args.id_cols, args.file_col))
@@ -500,8 +1302,7 @@ def main():
     os.makedirs(videos_ckpt_dir, exist_ok=True)
     pending = {}
     for name, group_df in sorted(groups.items()):
-        checkpoint = os.path.join(videos_ckpt_dir, f"{name}.xlsx")
-        if os.path.isfile(checkpoint):
+        if checkpoint_done(videos_ckpt_dir, name):
             continue
         pending[name] = group_df
 
@@ -513,25 +1314,151 @@ def main():
             print(f"  {name}: {len(group_df)} videos", flush=True)
         return
 
-    # Process
-    summaries = []
-    for name in tqdm(sorted(pending.keys()), desc="Subjects", position=0):
-        group_df = pending[name].drop(columns=["_subject"])
-        summary = process_subject(
-            name, group_df, args.base_dir, args.file_col, args.max_workers,
-            args.output_dir, active_categories, active_fields,
-            args.extractor, args.fps, args.scene_threshold, args.min_scene_len,
-            args.frame_mode, args.frames_per_scene, args.id_cols,
-        )
-        summaries.append(summary)
+    # Process: one pool and one work queue across all subjects. Frame rows
+    # stream into each subject's frame checkpoint as videos finish, and only
+    # the small video-level row is kept per video; both checkpoints are
+    # published as soon as the subject's last video finishes. Long videos
+    # (--segment-over) are queued as one task per segment and merged when
+    # their last segment finishes.
+    rows_by_subject = {name: pending[name].drop(columns=["_subject"]).to_dict("records")
+                       for name in sorted(pending)}
+    # One ffprobe pre-pass through the shared probe cache feeds segmenting,
+    # the LPT cost model, and the extractors that need the frame size or
+    # rate, so workers never probe a file again.
+    infos = {name: [None] * len(rows) for name, rows in rows_by_subject.items()}
+    probe_cache = None
+    if probing or args.extractor in PIPE_EXTRACTORS or (args.extractor == "scenedetect" and reduced):
+        probe_cache = open_probe_cache(args)
+        infos = probe_subjects({name: [os.path.join(args.base_dir, str(row.get(args.file_col, "")))
+                                       for row in rows]
+                                for name, rows in rows_by_subject.items()}, probe_cache)
+        print(probe_summary(probe_cache, sum(len(rows) for rows in rows_by_subject.values())), flush=True)
+    stream_infos = {name: [video_stream_info(info) if info and info["video"] else None for info in infos[name]]
+                    for name in infos}
+    step = 1.0 / args.fps if args.extractor != "scenedetect" else None
+    work, item_rows, costs, labels = {}, {}, {}, {}
+    for name, rows in rows_by_subject.items():
+        windows = [segment_windows(info and info["duration"], args.segment_over, args.segment_seconds, step)
+                   for info in infos[name]]
+        work[name] = [[(row, w, si)] for row, si, ws in zip(rows, stream_infos[name], windows) for w in ws]
+        item_rows[name] = [i for i, ws in enumerate(windows) for _ in ws]
+        costs[name], labels[name] = [], []
+        for row, info, ws in zip(rows, infos[name], windows):
+            cost, file = estimate_cost(info, "video"), str(row.get(args.file_col, ""))
+            for w in ws:
+                if w is None:
+                    costs[name].append(cost)
+                    labels[name].append(file)
+                else:
+                    end = w[1] if w[1] is not None else info["duration"]
+                    costs[name].append(cost * (end - w[0]) / info["duration"])
+                    labels[name].append(f"{file} [{w[0]:g}-{end:g}s]")
+    timings = None
+    if args.schedule == "lpt":
+        timings = []
+        print(f"Schedule: lpt over {sum(len(c) for c in costs.values())} tasks "
+              f"({sum(sum(c) for c in costs.values()):.0f} {COST_UNITS['video']})", flush=True)
+    n_segments = {name: Counter(items) for name, items in item_rows.items()}
+    open_parts = {name: {} for name in work}
+    segmented = sum(1 for counts in n_segments.values() for n in counts.values() if n > 1)
+    if segmented:
+        print(f"  {segmented} videos split into segments "
+              f"({sum(len(tasks) for tasks in work.values())} tasks)", flush=True)
+    writers = {name: open_subject_writers(name, rows, args.output_dir, active_fields, args.id_cols,
+                                          file_col=args.file_col, fmt=args.checkpoint_format)
+               for name, rows in rows_by_subject.items()}
+    task_fn = partial(
+        _analyze_video_task, base_dir=args.base_dir, file_col=args.file_col,
+        active_categories=active_categories, extractor=args.extractor, fps=args.fps,
+        scene_threshold=args.scene_threshold, min_scene_len=args.min_scene_len,
+        frame_mode=args.frame_mode, frames_per_scene=args.frames_per_scene,
+        frame_max_side=args.frame_max_side or None, scene_buffer=args.scene_buffer,
+        detect_scale=args.detect_scale, detect_skip=args.detect_skip, reuse_delta=args.reuse_delta,
+        exact_scene_frames=args.exact_scene_frames,
+    )
+
+    subj_bar = tqdm(total=len(work), desc="Subjects", position=0)
+    vid_bar = tqdm(total=sum(len(r) for r in rows_by_subject.values()),
+                   desc="Videos", position=1, leave=False)
+
+    def put_video(name, i, result):
+        writers[name][0].put(i, result)
+        vid_bar.update(1)
+        frames_ok = result["frames"] if result["ok"] else []
+        return len(frames_ok), sum(1 for fr in frames_ok if fr.get("reused"))
+
+    def on_task_done(name, start, results):
+        rows = rows_by_subject[name]
+        slim = []
+        for item, result in enumerate(results, start):
+            i = item_rows[name][item]
+            if n_segments[name][i] == 1:
+                slim.append(put_video(name, i, result))
+                continue
+            # a segment: hold it until the video's last segment is in
+            parts = open_parts[name].setdefault(i, {})
+            parts[item] = result
+            if len(parts) < n_segments[name][i]:
+                slim.append(None)
+                continue
+            del open_parts[name][i]
+            # Merging may seek and analyze recaptured scenes: run it on the
+            # pool, not on this dispatching thread (see on_deferred_done)
+            slim.append(pool.submit(
+                merge_segments, os.path.join(args.base_dir, str(rows[i].get(args.file_col, ""))),
+                [parts[k] for k in sorted(parts)], active_categories, args.extractor,
+                min_scene_len=args.min_scene_len, frame_mode=args.frame_mode,
+                frames_per_scene=args.frames_per_scene, scene_buffer=args.scene_buffer,
+                exact_scene_frames=args.exact_scene_frames))
+        return slim
+
+    def on_deferred_done(name, item, result):
+        return put_video(name, item_rows[name][item], result)
+
+    def on_subject_done(name, slim):
+        rows_by_subject.pop(name)
+        item_rows.pop(name), n_segments.pop(name), open_parts.pop(name)
+        frames, videos, batches = writers.pop(name)
+        slim = [s for s in slim if s is not None]
+        # frames first: the video checkpoint is the resume marker
+        counts = frames.close()
+        videos.write(concat_video_dfs(batches, args.id_cols, file_col=args.file_col))
+        videos.close()
+        summary = {
+            "name": name, "total": counts["total"], "ok": counts["ok"], "fail": counts["fail"],
+            "frames": sum(n for n, _ in slim), "reused": sum(n for _, n in slim),
+            "frames_path": frames.writer.path,
+            "videos_path": videos.path,
+        }
+        subj_bar.update(1)
         tqdm.write(f"  {summary['name']}: {summary['ok']}/{summary['total']} ok, "
-                    f"{summary['frames']} frames")
+                   f"{summary['frames']} frames" + (f" ({summary['reused']} reused)" if args.reuse_delta > 0 else ""))
+        return summary
+
+    with ThreadPoolExecutor(max_workers=args.max_workers) as pool:
+        summaries = run_work_queue(pool, work, task_fn, on_subject_done, _task_failed,
+                                   max_in_flight=args.max_workers * 2,
+                                   on_task_done=on_task_done, on_deferred_done=on_deferred_done,
+                                   costs=costs if timings is not None else None, timings=timings)
+    vid_bar.close()
+    subj_bar.close()
 
     print(f"\nDone: {len(summaries)} subjects processed", flush=True)
     total_ok = sum(s["ok"] for s in summaries)
     total_fail = sum(s["fail"] for s in summaries)
     total_frames = sum(s["frames"] for s in summaries)
     print(f"  Total: {total_ok} ok, {total_fail} failed, {total_frames} frames extracted", flush=True)
+    if args.reuse_delta > 0:
+        total_reused = sum(s["reused"] for s in summaries)
+        print(f"  Reused: {total_reused} frames ({total_reused / max(total_frames, 1):.0%}) "
+              f"within --reuse-delta {args.reuse_delta:g}", flush=True)
+    if timings is not None:
+        entries = [(name, labels[name][start], costs[name][start], seconds) for name, start, seconds in timings]
+        print(schedule_report(entries, COST_UNITS["video"], os.path.join(args.output_dir, "_schedule.xlsx")),
+              flush=True)
+
+    if probe_cache is not None:
+        probe_cache.close()
 
     if args.merge:
         _run_merge(args)
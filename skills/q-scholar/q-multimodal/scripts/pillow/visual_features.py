@@ -14,7 +14,10 @@ background/piped execution.
 import argparse
 import math
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import cached_property, lru_cache, partial
 from pathlib import Path
 
 import sys
@@ -22,7 +25,12 @@ sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
 import numpy as np
 import pandas as pd
-from common import read_input, save_excel, derive_subject, merge_checkpoints, source_columns
+from common import (
+    read_input, save_excel, derive_subject, merge_checkpoints, source_columns, run_work_queue,
+    add_checkpoint_args, checkpoint_path, checkpoint_done, CheckpointWriter, SubjectStream,
+)
+from feature_cache import add_cache_args, namespace, open_cache
+from near_dupes import HASH_KINDS, BKTree, image_hash
 from PIL import Image, ImageFilter, ExifTags
 from tqdm import tqdm
 
@@ -73,47 +81,331 @@ FEATURE_CATEGORIES = {
 
 CATEGORY_ORDER = ["rgb", "hsv", "texture", "shape", "spatial", "quality", "exif"]
 
+# Categories that need the full RGB decode; quality needs only a luma plane
+# (for dynamic_range), exif and resolution only the header.
+FULL_DECODE_CATEGORIES = {"rgb", "hsv", "texture", "shape", "spatial"}
+DECODE_LEVELS = ["header", "luma", "grid", "full"]
+
 VISUAL_FIELDS = RGB_FIELDS + HSV_FIELDS + TEXTURE_FIELDS + SHAPE_FIELDS + SPATIAL_FIELDS + QUALITY_FIELDS
 
+# Typed checkpoint columns (parquet): non-numeric and integer-valued fields.
+# Everything else is float64.
+STRING_FIELDS = [
+    "dominant_color_1", "dominant_color_2", "dominant_color_3",
+    "exif_camera_make", "exif_camera_model", "exif_datetime",
+    "exif_exposure_time", "exif_iso", "exif_software",
+]
+INT_FIELDS = ["contour_count", "exif_orientation", "exif_image_width", "exif_image_height"]
+
 IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".tiff", ".tif", ".webp"}
 
 
 # ---------------------------------------------------------------------------
-# K-means (numpy only, no scikit-learn)
+# Palette engine: batched k-means (numpy only, no scikit-learn)
 # ---------------------------------------------------------------------------
 
-def kmeans_numpy(pixels, k=5, max_iter=20):
-    """Pure-numpy k-means. Returns cluster centers sorted by count desc."""
-    rng = np.random.default_rng(42)
-    n = len(pixels)
+PALETTE_K = 5
+PALETTE_SAMPLE = 1000
+PALETTE_THUMB = (200, 200)
+
+
+def _seed_indices(n, k, seed=42):
+    """Initial center rows for an n-pixel sample: a fresh seeded draw of k
+    distinct rows, the same for every image of that sample size."""
+    return np.random.default_rng(seed).choice(n, size=k, replace=False)
+
+
+def kmeans_batch(samples, k=PALETTE_K, max_iter=20, lengths=None):
+    """Batched k-means over a stacked (B, n, 3) array of pixel samples.
+
+    Per image this is the same Lloyd iteration as the original single-image
+    engine (seeded random init, float64 distances, empty clusters keep
+    their center), so the centers match it; the batch runs as one squared-
+    distance matmul with bincount center updates, and an image stops
+    once its assignment no longer changes (a fixed point). lengths gives
+    each image's real sample count; rows past it are padding and ignored.
+    Returns (B, k, 3) centers sorted by cluster count desc."""
+    X = np.asarray(samples, dtype=np.float64)
+    if X.ndim == 2:
+        X = X[None]
+    B, n, _ = X.shape
+    lengths = np.full(B, n) if lengths is None else np.asarray(lengths)
     if n < k:
-        pad = np.zeros((k - n, 3), dtype=pixels.dtype)
-        pixels = np.vstack([pixels, pad])
-        n = len(pixels)
-    indices = rng.choice(n, size=k, replace=False)
-    centers = pixels[indices].astype(np.float64)
+        X = np.concatenate([X, np.zeros((B, k - n, 3))], axis=1)
+        n = k
+    # Samples shorter than k are zero-padded up to k, as the original did
+    for b in np.flatnonzero(lengths < k):
+        X[b, lengths[b]:k] = 0.0
+    lengths = np.maximum(lengths, k)
+    valid = np.arange(n)[None, :] < lengths[:, None]
+
+    centers = np.empty((B, k, 3))
+    for length in np.unique(lengths):
+        rows = np.flatnonzero(lengths == length)
+        centers[rows] = X[rows][:, _seed_indices(length, k)]
+
+    # Squared distances |x|^2 - 2 x.c + |c|^2: one (B, n, k) matmul per
+    # iteration, no (B, n, k, 3) difference tensor and no sqrt
+    x2 = (X ** 2).sum(-1)[..., None]
+    labels = np.full((B, n), -1)
+    active = np.ones(B, dtype=bool)
     for _ in range(max_iter):
-        dists = np.linalg.norm(pixels[:, None].astype(np.float64) - centers[None, :], axis=2)
-        labels = np.argmin(dists, axis=1)
-        for j in range(k):
-            mask = labels == j
-            if mask.any():
-                centers[j] = pixels[mask].astype(np.float64).mean(axis=0)
-    counts = np.bincount(labels, minlength=k)
-    order = np.argsort(-counts)
-    return centers[order]
+        idx = np.flatnonzero(active)
+        if idx.size == 0:
+            break
+        Xa, ca = X[idx], centers[idx]
+        d2 = x2[idx] - 2.0 * (Xa @ ca.transpose(0, 2, 1)) + (ca ** 2).sum(-1)[:, None]
+        la = np.argmin(d2, axis=2)
+        va = valid[idx]
+        # An unchanged assignment reproduces the current centers: converged
+        active[idx] = np.any((la != labels[idx]) & va, axis=1)
+        labels[idx] = la
+        flat = (la + (np.arange(idx.size) * k)[:, None])[va]
+        m = idx.size * k
+        counts = np.bincount(flat, minlength=m)
+        flat_x = Xa[va]
+        sums = np.stack([np.bincount(flat, weights=flat_x[:, ch], minlength=m)
+                         for ch in range(3)], axis=1)
+        # Empty clusters keep their previous center
+        centers[idx] = np.where(counts[:, None] > 0, sums / np.maximum(counts, 1)[:, None],
+                                ca.reshape(-1, 3)).reshape(-1, k, 3)
+
+    # Ties in count are ordered by the same default (unstable) sort as before
+    order = np.stack([np.argsort(-np.bincount(labels[b][valid[b]], minlength=k)) for b in range(B)])
+    return np.take_along_axis(centers, order[:, :, None], axis=1)
+
+
+def kmeans_numpy(pixels, k=PALETTE_K, max_iter=20):
+    """Single-image k-means. Returns (k, 3) cluster centers sorted by count desc."""
+    return kmeans_batch(np.asarray(pixels)[None], k=k, max_iter=max_iter)[0]
+
+
+def palette_sample(thumb, n=PALETTE_SAMPLE, seed=42):
+    """Seeded pixel sample from an RGB thumbnail (the dominant-color input)."""
+    px = np.asarray(thumb).reshape(-1, 3)
+    rng = np.random.default_rng(seed)
+    return px[rng.choice(len(px), size=min(n, len(px)), replace=False)]
+
+
+def dominant_colors_batch(samples, k=PALETTE_K):
+    """Top-3 hex colors for each of several images' pixel samples, clustered
+    in one stacked batch. Short samples are zero-padded and masked, so each
+    image gets the colors a single-image call would."""
+    if not samples:
+        return []
+    n = max(len(s) for s in samples)
+    stacked = np.zeros((len(samples), n, 3))
+    for b, s in enumerate(samples):
+        stacked[b, :len(s)] = s
+    centers = kmeans_batch(stacked, k=k, lengths=[len(s) for s in samples])
+    return [[_rgb_to_hex(*c) for c in cs[:3]] for cs in centers]
 
 
 def _rgb_to_hex(r, g, b):
     return f"#{int(r):02X}{int(g):02X}{int(b):02X}"
 
 
+# ---------------------------------------------------------------------------
+# Convolution engine (Laplacian + Sobel)
+# ---------------------------------------------------------------------------
+
+def filter_bank(gray):
+    """Laplacian, Sobel x/y and gradient magnitude of a gray plane in one
+    float32 pass. Returns (lap, sx, sy, grad_mag), each shaped like gray.
+
+    The plane is edge-padded once; every 3x3 tap is a shifted view of the
+    padded array, and the Sobel kernels run as separable row/column passes
+    ([1, 2, 1] smoothing x [-1, 0, 1] difference). Values are unclipped —
+    unlike 8-bit ImageFilter.Kernel, which saturates at +/-127. A stacked
+    (N, H, W) array filters every plane independently."""
+    g = np.asarray(gray, dtype=np.float32)
+    p = np.pad(g, [(0, 0)] * (g.ndim - 2) + [(1, 1), (1, 1)], mode="edge")
+    c = p[..., 1:-1, 1:-1]
+
+    # Row pass over all padded rows, then the column pass combines them
+    diff = p[..., :, 2:] - p[..., :, :-2]            # [-1, 0, 1]
+    smooth = p[..., :, :-2] + p[..., :, 2:]
+    smooth += p[..., :, 1:-1]
+    smooth += p[..., :, 1:-1]                        # [1, 2, 1]
+
+    sx = diff[..., :-2, :] + diff[..., 2:, :]
+    sx += diff[..., 1:-1, :]
+    sx += diff[..., 1:-1, :]
+    sy = smooth[..., :-2, :] - smooth[..., 2:, :]    # top minus bottom, as Pillow's flipped rows
+
+    lap = p[..., :-2, 1:-1] + p[..., 2:, 1:-1]
+    lap += p[..., 1:-1, :-2]
+    lap += p[..., 1:-1, 2:]
+    lap -= 4.0 * c
+
+    grad_mag = np.hypot(sx, sy)
+    return lap, sx, sy, grad_mag
+
+
+# ---------------------------------------------------------------------------
+# Per-image decode context
+# ---------------------------------------------------------------------------
+
+def decode_level(categories, luma_quality=False, grid=False):
+    """Cheapest decode that serves categories: "header" (size + EXIF only),
+    "luma" (gray plane only, for dynamic_range), "grid" (RGB at the fixed
+    grid) or "full" (RGB)."""
+    if grid and set(categories) & GRID_CATEGORIES:
+        return "grid"
+    if set(categories) & FULL_DECODE_CATEGORIES:
+        return "full"
+    if "quality" in categories:
+        return "luma" if luma_quality else "full"
+    return "header"
+
+
+class ImageContext:
+    """Lazy, decode-once view of one image file.
+
+    Construction reads only the header (size, EXIF). The file is decoded to
+    RGB on first access to `image`; the gray plane, HSV planes, gradients and
+    thumbnails are derived on first access and memoized, so only the active
+    categories pay for them. With max_side, JPEGs decode through draft (DCT)
+    scaling and the result is downscaled to fit; `size` keeps the original
+    dimensions for resolution and aspect ratio. `decode_s` accumulates the
+    time spent decoding pixels."""
+
+    def __init__(self, path, max_side=None):
+        self.path = path
+        self.max_side = max_side
+        with Image.open(path) as src:
+            self.size = src.size
+            self.exif = src.getexif()
+        self.decode_s = 0.0
+        self._thumbs = {}
+        self._gray_resized = {}
+
+    @classmethod
+    def from_array(cls, arr, size=None):
+        """Context over an in-memory (H, W, 3) uint8 RGB array (e.g. a video
+        frame): no file, no EXIF. size: original (w, h) to report, default
+        the array's own."""
+        ctx = cls.__new__(cls)
+        ctx.path, ctx.max_side = None, None
+        ctx.image = Image.fromarray(arr, "RGB")
+        ctx.size = tuple(size) if size else ctx.image.size
+        ctx.exif = None
+        ctx.decode_s = 0.0
+        ctx._thumbs = {}
+        ctx._gray_resized = {}
+        return ctx
+
+    def _draft_size(self):
+        """Target size for draft (DCT) scaling, or None when no reduction applies."""
+        w, h = self.size
+        if self.max_side and max(w, h) > self.max_side:
+            r = self.max_side / max(w, h)
+            return math.ceil(w * r), math.ceil(h * r)
+        return None
+
+    @cached_property
+    def image(self):
+        """RGB decode, bounded by max_side."""
+        t0 = time.perf_counter()
+        with Image.open(self.path) as src:
+            target = self._draft_size()
+            if target:
+                src.draft("RGB", target)
+            img = src.convert("RGB")
+        if self.max_side and max(img.size) > self.max_side:
+            img.thumbnail((self.max_side, self.max_side))
+        self.decode_s += time.perf_counter() - t0
+        return img
+
+    @cached_property
+    def luma(self):
+        """(H, W) uint8 luminance from a reduced decode: JPEGs decode the Y
+        component only (no chroma upsampling or color conversion), other
+        formats decode as usual. Bounded by max_side like `image`, so both
+        give the same geometry; reuses the RGB decode if it already exists."""
+        if "image" in self.__dict__:
+            return np.array(self.gray_image)
+        t0 = time.perf_counter()
+        with Image.open(self.path) as src:
+            src.draft("L", self._draft_size() or src.size)
+            img = src.convert("L") if src.mode in ("L", "RGB") else src.convert("RGB").convert("L")
+        if self.max_side and max(img.size) > self.max_side:
+            img.thumbnail((self.max_side, self.max_side))
+        self.decode_s += time.perf_counter() - t0
+        return np.array(img)
+
+    @cached_property
+    def rgb(self):
+        """(H, W, 3) uint8 RGB array."""
+        return np.array(self.image)
+
+    @cached_property
+    def gray_image(self):
+        return self.image.convert("L")
+
+    @cached_property
+    def gray(self):
+        """(H, W) float64 luminance plane."""
+        return np.array(self.gray_image, dtype=np.float64)
+
+    @cached_property
+    def hsv(self):
+        """(H, W, 3) uint8 HSV planes (Pillow scales hue to 0-255)."""
+        return np.array(self.image.convert("HSV"))
+
+    @cached_property
+    def filters(self):
+        """(lap, sx, sy, grad_mag) float32 planes from one filter_bank pass."""
+        return filter_bank(self.gray_image)
+
+    @property
+    def laplacian(self):
+        return self.filters[0]
+
+    @property
+    def gradients(self):
+        """Sobel (sx, sy, grad_mag) over the gray plane; shared by texture,
+        shape and spatial."""
+        return self.filters[1:]
+
+    def grid_rgb(self, size):
+        """(h, w, 3) uint8 RGB resized to exactly size=(w, h), ignoring aspect
+        ratio (the grid kernel's common grid). JPEGs decode through draft
+        scaling; the full-size decode is reused if it already exists."""
+        if "image" in self.__dict__:
+            img = self.image
+        else:
+            t0 = time.perf_counter()
+            with Image.open(self.path) as src:
+                src.draft("RGB", size)
+                img = src.convert("RGB")
+            self.decode_s += time.perf_counter() - t0
+        if img.size != tuple(size):
+            img = img.resize(size, Image.BILINEAR)
+        return np.asarray(img)
+
+    def thumbnail(self, size):
+        """Aspect-preserving RGB thumbnail fitting within size (memoized)."""
+        if size not in self._thumbs:
+            small = self.image.copy()
+            small.thumbnail(size)
+            self._thumbs[size] = small
+        return self._thumbs[size]
+
+    def gray_resized(self, size):
+        """Gray plane resized to exactly size=(w, h), as float64 (memoized)."""
+        if size not in self._gray_resized:
+            self._gray_resized[size] = np.array(self.gray_image.resize(size), dtype=np.float64)
+        return self._gray_resized[size]
+
+
 # ---------------------------------------------------------------------------
 # Feature extractors
 # ---------------------------------------------------------------------------
 
-def extract_rgb_features(img, arr):
+def extract_rgb_features(ctx):
     """RGB channel statistics and dominant colors."""
+    arr = ctx.rgb
     r, g, b = arr[:, :, 0], arr[:, :, 1], arr[:, :, 2]
     rf, gf, bf = r.astype(np.float64), g.astype(np.float64), b.astype(np.float64)
 
@@ -125,13 +417,7 @@ def extract_rgb_features(img, arr):
     mu = math.sqrt(np.mean(rg) ** 2 + np.mean(yb) ** 2)
     colorfulness = sigma + 0.3 * mu
 
-    small = img.copy()
-    small.thumbnail((200, 200))
-    px = np.array(small).reshape(-1, 3)
-    sample_size = min(1000, len(px))
-    rng = np.random.default_rng(42)
-    sample = px[rng.choice(len(px), size=sample_size, replace=False)]
-    centers = kmeans_numpy(sample, k=5)
+    centers = kmeans_numpy(palette_sample(ctx.thumbnail(PALETTE_THUMB)))
     hex_colors = [_rgb_to_hex(*c) for c in centers[:3]]
 
     return {
@@ -147,16 +433,14 @@ def extract_rgb_features(img, arr):
     }
 
 
-def extract_hsv_features(img):
+def extract_hsv_features(ctx):
     """HSV statistics with circular mean/std for hue."""
-    hsv_img = img.convert("HSV")
-    hsv_arr = np.array(hsv_img, dtype=np.float64)
-
-    h_raw = hsv_arr[:, :, 0] * (360.0 / 255.0)
-    s_raw = hsv_arr[:, :, 1] / 255.0
-    v_raw = hsv_arr[:, :, 2] / 255.0
+    hsv = ctx.hsv
+    h_raw = hsv[:, :, 0] * (360.0 / 255.0)
+    # S and V stay uint8; only hue needs a float plane
+    s_u8, v_u8 = hsv[:, :, 1], hsv[:, :, 2]
 
-    mask = s_raw > 0.1
+    mask = s_u8 > 0.1 * 255.0
     if np.sum(mask) < 10:
         h_mean, h_std = 0.0, 0.0
     else:
@@ -174,46 +458,40 @@ def extract_hsv_features(img):
 
     return {
         "hsv_h_mean": h_mean, "hsv_h_std": h_std,
-        "hsv_s_mean": float(np.mean(s_raw)), "hsv_s_std": float(np.std(s_raw)),
-        "hsv_v_mean": float(np.mean(v_raw)), "hsv_v_std": float(np.std(v_raw)),
+        "hsv_s_mean": float(np.mean(s_u8)) / 255.0, "hsv_s_std": float(np.std(s_u8)) / 255.0,
+        "hsv_v_mean": float(np.mean(v_u8)) / 255.0, "hsv_v_std": float(np.std(v_u8)) / 255.0,
         "color_temp": color_temp,
     }
 
 
-def extract_texture_features(gray, gray_arr):
-    """Entropy, sharpness, edge density, noise. Returns intermediates for reuse."""
+def extract_texture_features(ctx):
+    """Entropy, sharpness, edge density, noise."""
+    gray = ctx.gray_image
     entropy = float(gray.entropy())
 
-    lap_kernel = ImageFilter.Kernel((3, 3), [0, 1, 0, 1, -4, 1, 0, 1, 0], scale=1, offset=128)
-    lap = np.array(gray.filter(lap_kernel), dtype=np.float64) - 128.0
-    sharpness = float(np.var(lap))
-
-    sobel_x_kernel = ImageFilter.Kernel((3, 3), [-1, 0, 1, -2, 0, 2, -1, 0, 1], scale=1, offset=128)
-    sobel_y_kernel = ImageFilter.Kernel((3, 3), [-1, -2, -1, 0, 0, 0, 1, 2, 1], scale=1, offset=128)
-    sx = np.array(gray.filter(sobel_x_kernel), dtype=np.float64) - 128.0
-    sy = np.array(gray.filter(sobel_y_kernel), dtype=np.float64) - 128.0
-    grad_mag = np.sqrt(sx ** 2 + sy ** 2)
+    sharpness = float(np.var(ctx.laplacian, dtype=np.float64))
 
+    _, _, grad_mag = ctx.gradients
     threshold = np.mean(grad_mag) + np.std(grad_mag)
     edge_mask = grad_mag > threshold
     edge_density = float(np.mean(edge_mask))
 
     med = gray.filter(ImageFilter.MedianFilter(3))
-    diff = gray_arr.astype(np.float64) - np.array(med, dtype=np.float64)
+    diff = ctx.gray - np.array(med, dtype=np.float64)
     noise_estimate = float(np.std(diff))
 
-    features = {
+    return {
         "entropy": entropy,
         "sharpness": sharpness,
         "edge_density": edge_density,
         "noise_estimate": noise_estimate,
     }
-    return features, sx, sy, grad_mag
 
 
-def extract_shape_features(img, gray_arr, sx, sy, grad_mag):
+def extract_shape_features(ctx):
     """Contour count, line orientation, aspect ratio."""
-    w, h = img.size
+    w, h = ctx.size
+    sx, sy, grad_mag = ctx.gradients
 
     threshold = np.mean(grad_mag) + np.std(grad_mag)
     edge_binary = (grad_mag > threshold).astype(np.uint8)
@@ -236,9 +514,10 @@ def extract_shape_features(img, gray_arr, sx, sy, grad_mag):
     }
 
 
-def extract_spatial_features(gray_arr, grad_mag, rgb_arr):
+def extract_spatial_features(ctx):
     """Rule of thirds, symmetry, whitespace, visual center."""
-    h, w = gray_arr.shape
+    h, w = ctx.gray.shape
+    _, _, grad_mag = ctx.gradients
 
     energy = grad_mag ** 2
     total_energy = np.sum(energy)
@@ -256,7 +535,7 @@ def extract_spatial_features(gray_arr, grad_mag, rgb_arr):
         rule_of_thirds = 0.0
 
     small_h, small_w = min(h, 200), min(w, 200)
-    small = np.array(Image.fromarray(gray_arr.astype(np.uint8)).resize((small_w, small_h)), dtype=np.float64)
+    small = ctx.gray_resized((small_w, small_h))
     mid_w = small_w // 2
     if mid_w > 0:
         left = small[:, :mid_w]
@@ -272,7 +551,7 @@ def extract_spatial_features(gray_arr, grad_mag, rgb_arr):
     else:
         symmetry_v = 1.0
 
-    white_mask = np.all(rgb_arr > 240, axis=2)
+    white_mask = np.all(ctx.rgb > 240, axis=2)
     whitespace_ratio = float(np.mean(white_mask))
 
     total = np.sum(grad_mag)
@@ -292,20 +571,24 @@ def extract_spatial_features(gray_arr, grad_mag, rgb_arr):
     }
 
 
-def extract_quality_features(gray_arr, img):
-    """Dynamic range and resolution."""
-    w, h = img.size
+def extract_quality_features(ctx, luma=False):
+    """Dynamic range and resolution (original, pre-downscale dimensions).
+
+    luma=True measures dynamic range on the reduced luma decode (see
+    ImageContext.luma) instead of the RGB-derived gray plane."""
+    w, h = ctx.size
+    gray = ctx.luma if luma else ctx.gray
     return {
-        "dynamic_range": float(np.max(gray_arr) - np.min(gray_arr)),
+        "dynamic_range": float(np.max(gray) - np.min(gray)),
         "resolution": float(w * h / 1_000_000),
     }
 
 
-def extract_exif(img):
+def extract_exif(ctx):
     """Extract EXIF metadata. Returns empty strings/NaN for missing tags."""
     result = {f: "" for f in EXIF_FIELDS}
     try:
-        exif_data = img.getexif()
+        exif_data = ctx.exif
         if not exif_data:
             return result
     except Exception:
@@ -365,60 +648,407 @@ def extract_exif(img):
     return result
 
 
+# ---------------------------------------------------------------------------
+# Fixed-grid kernel
+# ---------------------------------------------------------------------------
+
+# Categories the grid kernel computes; exif always comes from the header
+GRID_CATEGORIES = {"rgb", "hsv", "texture", "shape", "spatial", "quality"}
+
+_LUMA_WEIGHTS = (0.299, 0.587, 0.114)
+_HUE_DEG = np.arange(256) * (360.0 / 255.0)
+_HUE_SIN, _HUE_COS = np.sin(np.deg2rad(_HUE_DEG)), np.cos(np.deg2rad(_HUE_DEG))
+_HUE_WARM = (_HUE_DEG < 60) | (_HUE_DEG > 300)
+_HUE_COOL = (_HUE_DEG > 120) & (_HUE_DEG < 240)
+
+
+def parse_grid(text):
+    """'WxH' (or a single side 'N') -> (w, h)."""
+    w, _, h = text.lower().partition("x")
+    return int(w), int(h or w)
+
+
+@lru_cache(maxsize=None)
+def _hsv_luts():
+    """Pillow's own RGB->HSV hue and saturation as lookup tables.
+
+    Pillow's hue depends only on which channel is the max and on the other
+    two channels' distance below it; saturation only on (max, max - min).
+    Converting one pixel per key through Pillow makes the tables exact by
+    construction: hue is indexed by case << 16 | a << 8 | b (case 0: r is
+    the max, (a, b) = (max-g, max-b); case 1: g, (max-r, max-b); case 2: b,
+    (max-r, max-g)) and saturation by max << 8 | (max - min)."""
+    d = np.arange(256, dtype=np.uint8)
+    a, b = np.meshgrid(d, d, indexing="ij")
+    top = np.full_like(a, 255)
+    keys = np.concatenate([np.stack(c, axis=-1) for c in
+                           ((top, 255 - a, 255 - b), (255 - a, top, 255 - b), (255 - a, 255 - b, top))])
+    hue = np.asarray(Image.fromarray(keys).convert("HSV"))[..., 0].ravel()
+    low = a - np.minimum(b, a)
+    sat = np.asarray(Image.fromarray(np.stack([a, low, low], axis=-1)).convert("HSV"))[..., 1].ravel()
+    return hue, sat
+
+
+def hsv_planes(rgb):
+    """(..., 3) uint8 RGB -> (hue, sat, val) uint8 planes, bit-identical
+    to Image.convert("HSV") (checked over all 2^24 colors) but built from
+    uint8 min/max and two table lookups instead of per-pixel float math."""
+    hue_lut, sat_lut = _hsv_luts()
+    r, g, b = (np.ascontiguousarray(rgb[..., c]) for c in range(3))
+    val = np.maximum(np.maximum(r, g), b)
+    dr, dg, db = val - r, val - g, val - b
+    # Case flags as 0/1 bytes: r is the max, or neither r nor g is (b is)
+    r_max = (dr == 0).view(np.uint8)
+    b_max = ((dr != 0) & (dg != 0)).view(np.uint8)
+    # Little-endian uint32 keys assembled byte by byte: [b, a, case, 0];
+    # a zero channel distance stands in for the where() between cases
+    key = np.zeros(val.shape + (4,), dtype=np.uint8)
+    np.multiply(dg, b_max, out=key[..., 0])
+    key[..., 0] += db
+    np.multiply(dg, r_max, out=key[..., 1])
+    key[..., 1] += dr
+    np.subtract(1, r_max, out=key[..., 2])
+    key[..., 2] += b_max
+    hue = hue_lut.take(key.view("<u4")[..., 0])
+    key = np.empty(val.shape + (2,), dtype=np.uint8)
+    key[..., 0] = val - np.minimum(np.minimum(r, g), b)
+    key[..., 1] = val
+    sat = sat_lut.take(key.view("<u2")[..., 0])
+    return hue, sat, val
+
+
+def median3(gray):
+    """3x3 median of an (H, W) uint8 plane with edge padding, as
+    ImageFilter.MedianFilter(3). Each vertical triple is sorted once and
+    shared by the three windows that contain it; the median is then
+    med3(max of lows, med3 of mids, min of highs) -- all uint8 min/max."""
+    h, w = gray.shape
+    p = np.pad(gray, 1, mode="edge")
+    a, b, c = p[:h], p[1:h + 1], p[2:h + 2]
+    lo, hi = np.minimum(a, b), np.maximum(a, b)
+    mid, hi = np.minimum(hi, c), np.maximum(hi, c)
+    lo, mid = np.minimum(lo, mid), np.maximum(lo, mid)
+
+    def med3(x, y, z):
+        return np.maximum(np.minimum(x, y), np.minimum(np.maximum(x, y), z))
+
+    cols = [slice(j, j + w) for j in range(3)]
+    lows = np.maximum(np.maximum(lo[:, cols[0]], lo[:, cols[1]]), lo[:, cols[2]])
+    highs = np.minimum(np.minimum(hi[:, cols[0]], hi[:, cols[1]]), hi[:, cols[2]])
+    return med3(lows, med3(*(mid[:, c] for c in cols)), highs)
+
+
+def _hist_moments(hist):
+    """(mean, std) of the values 0..n_bins-1 weighted by hist."""
+    levels = np.arange(len(hist), dtype=np.float64)
+    count = max(int(hist.sum()), 1)
+    mean = float(hist @ levels / count)
+    return mean, math.sqrt(max(float(hist @ levels ** 2 / count) - mean ** 2, 0.0))
+
+
+def grid_features(arr, size, categories, costs=None):
+    """Features for one (H, W, 3) uint8 image already resized to the grid.
+
+    size: original (w, h), used for resolution and aspect_ratio. Statistics
+    come from histograms, channel moments and uint8 min/max networks instead
+    of the per-image extractors' float planes, and follow those extractors
+    run on the same grid pixels. costs: optional Counter of seconds per
+    category (shared planes are charged to the first category that needs
+    them). Returns {field: value}."""
+    clock = time.perf_counter
+    h, w, _ = arr.shape
+    out = {}
+    planes = {}
+
+    def plane(name):
+        if name not in planes:
+            if name == "gray":
+                planes[name] = np.asarray(Image.fromarray(arr).convert("L"))
+            elif name == "filters":
+                planes[name] = filter_bank(plane("gray"))
+            elif name == "threshold":
+                grad_mag = plane("filters")[3]
+                planes[name] = float(np.mean(grad_mag) + np.std(grad_mag))
+        return planes[name]
+
+    def timed(cat):
+        if costs is not None:
+            costs[cat] += clock() - t0
+
+    if "rgb" in categories:
+        t0 = clock()
+        # Every rgb statistic is a linear combination of channels, so the
+        # channel means and 3x3 covariance give them all (raw moments of
+        # 8-bit values are exact integers in float64)
+        x = arr.reshape(-1, 3).astype(np.float64)
+        mean = np.ones(len(x)) @ x / len(x)
+        cov = x.T @ x / len(x) - np.outer(mean, mean)
+        del x
+
+        def combo(weights):
+            wv = np.asarray(weights)
+            return float(wv @ mean), math.sqrt(max(float(wv @ cov @ wv), 0.0))
+
+        for c, name in enumerate("rgb"):
+            out[f"rgb_{name}_mean"] = float(mean[c])
+            out[f"rgb_{name}_std"] = math.sqrt(max(float(cov[c, c]), 0.0))
+        out["brightness"], out["contrast"] = combo(_LUMA_WEIGHTS)
+        (rg_mean, rg_std), (yb_mean, yb_std) = combo((1.0, -1.0, 0.0)), combo((0.5, 0.5, -1.0))
+        out["colorfulness"] = math.sqrt(rg_std ** 2 + yb_std ** 2) + 0.3 * math.sqrt(rg_mean ** 2 + yb_mean ** 2)
+        thumb = Image.fromarray(arr)
+        thumb.thumbnail(PALETTE_THUMB)
+        centers = kmeans_numpy(palette_sample(thumb))
+        for j, c in enumerate(centers[:3]):
+            out[f"dominant_color_{j + 1}"] = _rgb_to_hex(*c)
+        timed("rgb")
+
+    if "hsv" in categories:
+        t0 = clock()
+        hue, sat, val = hsv_planes(arr)
+        # Hue statistics from the hue histogram (hue has 256 levels); one
+        # 512-bin count, offset by 256 where saturated
+        joint = np.bincount((hue + (sat > 0.1 * 255.0).astype(np.uint16) * 256).ravel(), minlength=512)
+        hist_sat = joint[256:]
+        hist_all = joint[:256] + hist_sat
+        n_sat = int(hist_sat.sum())
+        if n_sat < 10:
+            h_mean, h_std = 0.0, 0.0
+        else:
+            sin_m, cos_m = hist_sat @ _HUE_SIN / n_sat, hist_sat @ _HUE_COS / n_sat
+            h_mean = float(np.rad2deg(np.arctan2(sin_m, cos_m)) % 360)
+            r_bar = math.sqrt(sin_m ** 2 + cos_m ** 2)
+            h_std = float(np.rad2deg(math.sqrt(-2 * math.log(max(r_bar, 1e-10))))) if r_bar < 1 else 0.0
+        out["hsv_h_mean"], out["hsv_h_std"] = h_mean, h_std
+        for channel, values in (("s", sat), ("v", val)):
+            mean, std = _hist_moments(np.bincount(values.ravel(), minlength=256))
+            out[f"hsv_{channel}_mean"] = mean / 255.0
+            out[f"hsv_{channel}_std"] = std / 255.0
+        out["color_temp"] = float(hist_all @ _HUE_WARM / max(int(hist_all @ _HUE_COOL), 1))
+        timed("hsv")
+
+    if "texture" in categories:
+        t0 = clock()
+        gray = plane("gray")
+        hist = np.bincount(gray.ravel(), minlength=256) / float(h * w)
+        logp = np.log2(np.where(hist > 0, hist, 1.0))
+        out["entropy"] = float(-(hist * logp).sum())
+        lap, _, _, grad_mag = plane("filters")
+        out["sharpness"] = float(np.var(lap, dtype=np.float64))
+        out["edge_density"] = float(np.mean(grad_mag > plane("threshold")))
+        out["noise_estimate"] = float(np.std(gray.astype(np.int16) - median3(gray)))
+        timed("texture")
+
+    if "shape" in categories:
+        t0 = clock()
+        _, sx, sy, grad_mag = plane("filters")
+        strong = grad_mag > plane("threshold")
+        out["contour_count"] = int(np.sum(np.diff(strong.astype(np.uint8), axis=1) == 1))
+        angles = np.rad2deg(np.arctan2(sy[strong], sx[strong])) % 180
+        bins = np.minimum((angles.astype(np.float64) / 10.0).astype(np.int64), 17)
+        hist = np.bincount(bins, minlength=18)
+        out["line_orientation"] = float(np.argmax(hist) * 10.0 + 5.0) if hist.sum() > 0 else 0.0
+        sw, sh = size
+        out["aspect_ratio"] = float(sw / max(sh, 1))
+        timed("shape")
+
+    if "spatial" in categories:
+        t0 = clock()
+        grad_mag = plane("filters")[3]
+        energy = grad_mag ** 2
+        total_energy = float(np.sum(energy))
+        band_w, band_h = max(int(0.05 * w), 1), max(int(0.05 * h), 1)
+        thirds = 0.0
+        for frac in (1 / 3, 2 / 3):
+            cx, cy = int(frac * w), int(frac * h)
+            thirds += float(np.sum(energy[:, max(0, cx - band_w):cx + band_w]))
+            thirds += float(np.sum(energy[max(0, cy - band_h):cy + band_h, :]))
+        out["rule_of_thirds"] = min(thirds / total_energy, 1.0) if total_energy > 0 else 0.0
+
+        gray = plane("gray")
+        small_h, small_w = min(h, 200), min(w, 200)
+        if (small_h, small_w) == (h, w):
+            small = gray.astype(np.float64)
+        else:
+            small = np.asarray(Image.fromarray(gray).resize((small_w, small_h)), dtype=np.float64)
+        mid_w, mid_h = small_w // 2, small_h // 2
+        out["symmetry_h"] = (float(1.0 - np.mean(np.abs(small[:, :mid_w] - small[:, -mid_w:][:, ::-1])) / 255.0)
+                             if mid_w else 1.0)
+        out["symmetry_v"] = (float(1.0 - np.mean(np.abs(small[:mid_h, :] - small[-mid_h:, :][::-1, :])) / 255.0)
+                             if mid_h else 1.0)
+        white = np.minimum(np.minimum(arr[..., 0], arr[..., 1]), arr[..., 2]) > 240
+        out["whitespace_ratio"] = np.count_nonzero(white) / float(h * w)
+
+        total = float(np.sum(grad_mag))
+        if total > 0:
+            out["visual_center_x"] = float(grad_mag.sum(axis=0) @ np.arange(w) / total / max(w - 1, 1))
+            out["visual_center_y"] = float(grad_mag.sum(axis=1) @ np.arange(h) / total / max(h - 1, 1))
+        else:
+            out["visual_center_x"], out["visual_center_y"] = 0.5, 0.5
+        timed("spatial")
+
+    if "quality" in categories:
+        t0 = clock()
+        gray = plane("gray")
+        out["dynamic_range"] = float(int(gray.max()) - int(gray.min()))
+        sw, sh = size
+        out["resolution"] = float(sw * sh / 1_000_000)
+        timed("quality")
+    return out
+
+
 # ---------------------------------------------------------------------------
 # Per-image orchestrator
 # ---------------------------------------------------------------------------
 
-def analyze_image_from_path(abs_path, active_categories):
-    """Analyze a single image file by absolute path. Returns {ok, data, error}."""
+EXTRACTORS = {
+    "texture": extract_texture_features,
+    "rgb": extract_rgb_features,
+    "hsv": extract_hsv_features,
+    "shape": extract_shape_features,
+    "spatial": extract_spatial_features,
+    "quality": extract_quality_features,
+    "exif": extract_exif,
+}
+
+
+def extract_features(ctx, active_categories, luma_quality=False, costs=None):
+    """Run the active extractors on one ImageContext, in EXTRACTORS order.
+
+    luma_quality: measure dynamic_range on the reduced luma decode.
+    costs: optional Counter; adds seconds spent decoding pixels ("decode")
+    and in each category's own work. Derived planes are charged to the first
+    category that needs them."""
+    clock = time.perf_counter
+    features = {}
+    for cat, extract in EXTRACTORS.items():
+        if cat not in active_categories:
+            continue
+        t0, d0 = clock(), ctx.decode_s
+        if cat == "quality":
+            features.update(extract(ctx, luma=luma_quality))
+        else:
+            features.update(extract(ctx))
+        if costs is not None:
+            decode = ctx.decode_s - d0
+            costs["decode"] += decode
+            costs[cat] += clock() - t0 - decode
+    return features
+
+
+def analyze_image_from_path(abs_path, active_categories, max_side=None,
+                            luma_quality=False, costs=None):
+    """Analyze a single image file by absolute path (or an open binary file
+    object, e.g. an in-memory JPEG). Returns {ok, data, error}.
+
+    max_side: decode/analyze at most this many pixels on the long side
+    (see ImageContext); None analyzes at full resolution.
+    luma_quality, costs: see extract_features; costs also gets the seconds
+    spent opening the header ("open")."""
     try:
-        img = Image.open(abs_path).convert("RGB")
-        arr = np.array(img)
-        gray = img.convert("L")
-        gray_arr = np.array(gray, dtype=np.float64)
-
-        features = {}
-
-        # Texture intermediates are reused by shape and spatial
-        tex_data, sx, sy, grad_mag = None, None, None, None
-        if any(c in active_categories for c in ("texture", "shape", "spatial")):
-            tex_data, sx, sy, grad_mag = extract_texture_features(gray, gray_arr)
-            if "texture" in active_categories:
-                features.update(tex_data)
-
-        if "rgb" in active_categories:
-            features.update(extract_rgb_features(img, arr))
-        if "hsv" in active_categories:
-            features.update(extract_hsv_features(img))
-        if "shape" in active_categories:
-            features.update(extract_shape_features(img, gray_arr, sx, sy, grad_mag))
-        if "spatial" in active_categories:
-            features.update(extract_spatial_features(gray_arr, grad_mag, arr))
-        if "quality" in active_categories:
-            features.update(extract_quality_features(gray_arr, img))
-        if "exif" in active_categories:
-            features.update(extract_exif(img))
-
-        return {"ok": True, "data": features, "error": ""}
+        t0 = time.perf_counter()
+        ctx = ImageContext(abs_path, max_side=max_side)
+        if costs is not None:
+            costs["open"] += time.perf_counter() - t0
+        return {"ok": True, "data": extract_features(ctx, active_categories, luma_quality, costs),
+                "error": ""}
     except Exception as e:
         return {"ok": False, "data": {}, "error": str(e)}
 
 
-def analyze_image(idx, row, base_dir, file_col, active_categories):
-    """Open one image from a row, extract selected features. Returns {ok, data, error}."""
-    rel_path = row.get(file_col, "")
-    if not rel_path:
-        return {"ok": False, "data": {}, "error": "empty path"}
+def analyze_image_array(arr, active_categories, size=None):
+    """Analyze an in-memory (H, W, 3) uint8 RGB array (e.g. a video frame
+    read from a pipe). Returns {ok, data, error}; the array can be reused
+    once this returns."""
+    try:
+        ctx = ImageContext.from_array(arr, size=size)
+        return {"ok": True, "data": extract_features(ctx, active_categories), "error": ""}
+    except Exception as e:
+        return {"ok": False, "data": {}, "error": str(e)}
+
 
+def header_features(ctx, active_categories):
+    """Fields of the active categories that come from the header alone:
+    resolution, aspect_ratio and EXIF. Everything else is pixel-derived."""
+    w, h = ctx.size
+    features = {}
+    if "quality" in active_categories:
+        features["resolution"] = float(w * h / 1_000_000)
+    if "shape" in active_categories:
+        features["aspect_ratio"] = float(w / max(h, 1))
+    if "exif" in active_categories:
+        features.update(extract_exif(ctx))
+    return features
+
+
+def reuse_duplicate(result, rel_path, base_dir, active_categories):
+    """A near-duplicate's result from its canonical image's: the
+    pixel-derived fields are reused, the header fields (header_features)
+    are read from the duplicate's own file."""
+    if not result["ok"]:
+        return dict(result, data={})
+    abs_path, error = resolve_image_path(rel_path, base_dir)
+    if error:
+        return {"ok": False, "data": {}, "error": error}
+    try:
+        ctx = ImageContext(abs_path)
+    except Exception as e:
+        return {"ok": False, "data": {}, "error": str(e)}
+    return {"ok": True, "data": {**result["data"], **header_features(ctx, active_categories)},
+            "error": ""}
+
+
+def resolve_image_path(rel_path, base_dir):
+    """(absolute path, "") for an existing image file, else (None, error)."""
+    if not rel_path:
+        return None, "empty path"
     ext = Path(str(rel_path)).suffix.lower()
     if ext not in IMAGE_EXTENSIONS:
-        return {"ok": False, "data": {}, "error": f"skipped non-image: {ext}"}
-
+        return None, f"skipped non-image: {ext}"
     abs_path = os.path.join(base_dir, rel_path)
     if not os.path.isfile(abs_path):
-        return {"ok": False, "data": {}, "error": f"file not found: {abs_path}"}
+        return None, f"file not found: {abs_path}"
+    return abs_path, ""
+
+
+def analyze_grid(abs_path, categories, grid, costs=None):
+    """Analyze one image file on a fixed grid with grid_features.
+
+    The image is decoded straight to grid=(w, h) (aspect ratio is not kept;
+    resolution and aspect_ratio use the original size); EXIF comes from the
+    header. costs: see analyze_image_from_path. Returns {ok, data, error}."""
+    clock = time.perf_counter
+    try:
+        t0 = clock()
+        ctx = ImageContext(abs_path)
+        if costs is not None:
+            costs["open"] += clock() - t0
+        data = {}
+        if categories & GRID_CATEGORIES:
+            arr = ctx.grid_rgb(grid)
+            if costs is not None:
+                costs["decode"] += ctx.decode_s
+            data = grid_features(arr, ctx.size, categories, costs=costs)
+        if "exif" in categories:
+            t0 = clock()
+            data.update(extract_exif(ctx))
+            if costs is not None:
+                costs["exif"] += clock() - t0
+        return {"ok": True, "data": data, "error": ""}
+    except Exception as e:
+        return {"ok": False, "data": {}, "error": str(e)}
 
-    return analyze_image_from_path(abs_path, active_categories)
+
+def analyze_image(idx, row, base_dir, file_col, active_categories, max_side=None,
+                  luma_quality=False, costs=None, grid=None):
+    """Open one image from a row, extract selected features; with a grid,
+    through analyze_grid. Returns {ok, data, error}."""
+    abs_path, error = resolve_image_path(row.get(file_col, ""), base_dir)
+    if error:
+        return {"ok": False, "data": {}, "error": error}
+    if grid:
+        return analyze_grid(abs_path, set(active_categories), grid, costs=costs)
+    return analyze_image_from_path(abs_path, active_categories, max_side=max_side,
+                                   luma_quality=luma_quality, costs=costs)
 
 
 # ---------------------------------------------------------------------------
@@ -446,35 +1076,219 @@ def build_output_df(rows, results, active_fields, id_cols=None, file_col="file_p
     return out
 
 
-def process_subject(name, subject_df, base_dir, file_col, max_workers,
-                    output_dir, active_categories, active_fields, id_cols=None):
-    """Process all images for one subject, save checkpoint."""
-    rows = subject_df.to_dict("records")
-    results = [None] * len(rows)
-
-    with ThreadPoolExecutor(max_workers=max_workers) as pool:
-        futures = {
-            pool.submit(analyze_image, i, row, base_dir, file_col, active_categories): i
-            for i, row in enumerate(rows)
-        }
-        with tqdm(total=len(rows), desc=f"  {name}", position=1, leave=False) as img_bar:
-            for future in as_completed(futures):
-                idx = futures[future]
-                try:
-                    results[idx] = future.result()
-                except Exception as e:
-                    results[idx] = {"ok": False, "data": {}, "error": str(e)}
-                img_bar.update(1)
-
-    out_df = build_output_df(rows, results, active_fields, id_cols, file_col=file_col)
-    ckpt_dir = os.path.join(output_dir, "checkpoints")
-    os.makedirs(ckpt_dir, exist_ok=True)
-    out_path = os.path.join(ckpt_dir, f"{name}.xlsx")
-    save_excel(out_df, out_path)
+# ---------------------------------------------------------------------------
+# Executor backends
+# ---------------------------------------------------------------------------
+
+EXECUTORS = {"thread", "process"}
+
+# Per-run config pinned once per worker by _init_worker
+_WORKER = {}
+
+
+def _init_worker(base_dir, file_col, active_categories, active_fields, max_side,
+                 luma_quality=False, grid=None):
+    """Pool initializer: set the per-run config once per worker, so tasks
+    carry only (rel_path, categories) pairs."""
+    _WORKER.update(base_dir=base_dir, file_col=file_col,
+                   active_categories=active_categories,
+                   active_fields=active_fields, max_side=max_side,
+                   luma_quality=luma_quality, grid=grid)
+
+
+def _analyze_chunk(chunk):
+    """Analyze a chunk of (rel_path, categories) pairs in one worker; None
+    categories means all active ones. Returns one compact (ok, error, values,
+    costs) tuple per path; values follow active_fields order (NaN where
+    skipped), costs is the per-category seconds dict."""
+    cfg = _WORKER
+    out = []
+    for rel_path, cats in chunk:
+        costs = Counter()
+        r = analyze_image(None, {cfg["file_col"]: rel_path}, cfg["base_dir"], cfg["file_col"],
+                          cfg["active_categories"] if cats is None else cats, cfg["max_side"],
+                          luma_quality=cfg.get("luma_quality", False), costs=costs,
+                          grid=cfg.get("grid"))
+        values = tuple(r["data"].get(f, np.nan) for f in cfg["active_fields"]) if r["ok"] else None
+        out.append((r["ok"], r["error"], values, dict(costs)))
+    return out
+
+
+def _chunk_failed(exc):
+    return (False, str(exc), None, {})
+
+
+def _expand(compact, active_fields):
+    """Compact (ok, error, values, costs) tuple -> {ok, data, error} result dict."""
+    ok, error, values = compact[:3]
+    return {"ok": ok, "data": dict(zip(active_fields, values)) if ok else {}, "error": error}
+
+
+def make_executor(kind, max_workers, base_dir, file_col, active_categories,
+                  active_fields, max_side=None, luma_quality=False, grid=None):
+    """Long-lived pool for the whole run. "process" sidesteps the GIL for the
+    NumPy/PIL-heavy per-image work; "thread" keeps everything in-process."""
+    if kind not in EXECUTORS:
+        raise ValueError(f"unknown executor: {kind}; expected one of {sorted(EXECUTORS)}")
+    cls = ProcessPoolExecutor if kind == "process" else ThreadPoolExecutor
+    return cls(max_workers=max_workers, initializer=_init_worker,
+               initargs=(base_dir, file_col, active_categories, active_fields, max_side,
+                         luma_quality, grid))
+
+
+def auto_chunk_size(n_tasks, max_workers):
+    """~4 chunks per worker, capped at 32 images per chunk."""
+    return max(1, min(32, n_tasks // max(max_workers * 4, 1)))
+
+
+def chunk_items(items, chunk_size):
+    """Split (rel_path, categories) items into task chunks."""
+    return [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+
+def chunk_rows(rows, file_col, chunk_size):
+    """Split one subject's rows into task chunks covering all active categories."""
+    return chunk_items([(row.get(file_col, ""), None) for row in rows], chunk_size)
+
 
-    ok_count = sum(1 for r in results if r["ok"])
-    fail_count = len(results) - ok_count
-    return {"name": name, "total": len(rows), "ok": ok_count, "fail": fail_count, "path": out_path}
+def format_costs(costs, levels):
+    """Per-category cost report: seconds, share of worker time, and ms per
+    computed image. levels counts successfully computed images per decode
+    level (missing and failed files are not counted)."""
+    n = sum(levels.values())
+    total = sum(costs.values())
+    if not n:
+        return "Cost per category: no images computed"
+    plan = ", ".join(f"{levels[lv]} {lv}" for lv in DECODE_LEVELS if levels[lv])
+    lines = [f"Cost per category ({n} images computed: {plan}; {total:.2f}s worker time):"]
+    for key in ["open", "decode"] + [c for c in EXTRACTORS if c in costs]:
+        sec = costs.get(key, 0.0)
+        share = 100 * sec / total if total else 0.0
+        lines.append(f"  {key:<8} {sec:9.2f}s  {share:5.1f}%  {1000 * sec / n:8.2f} ms/image")
+    return "\n".join(lines)
+
+
+def analyze_rows(pool, rows, file_col, active_fields, chunk_size, progress=None):
+    """Analyze one list of rows on a make_executor pool. Returns one
+    {ok, data, error} per row, in row order."""
+    chunks = chunk_rows(rows, file_col, chunk_size)
+    out = run_work_queue(pool, {"_": chunks}, _analyze_chunk, lambda _, results: results,
+                         _chunk_failed, max_in_flight=max(len(chunks), 1), progress=progress)
+    return [_expand(c, active_fields) for c in out[0]]
+
+
+# ---------------------------------------------------------------------------
+# Persistent feature cache (one entry per file x category)
+# ---------------------------------------------------------------------------
+
+# Bump a category's version whenever its computation changes, so cached
+# values from older code miss instead of being reused.
+CATEGORY_VERSIONS = {"rgb": 2, "hsv": 1, "texture": 2, "shape": 2, "spatial": 2, "quality": 2, "exif": 1}
+
+
+def _cache_ns(cat, max_side, luma_quality=False, grid=None):
+    params = {"max_side": max_side}
+    if cat == "quality" and luma_quality:
+        params["decode"] = "luma"
+    if grid and cat in GRID_CATEGORIES:
+        params["grid"] = "x".join(map(str, grid))
+    return namespace("visual", cat, CATEGORY_VERSIONS[cat], **params)
+
+
+def cache_lookup(cache, abs_path, active_categories, max_side=None, luma_quality=False, grid=None):
+    """Returns (file_key, cached field values, categories still to compute)."""
+    key = cache.file_key(abs_path)
+    if key is None:
+        return None, {}, set(active_categories)
+    cached, missing = {}, set()
+    for cat in active_categories:
+        values = cache.get(key, _cache_ns(cat, max_side, luma_quality, grid), label=cat)
+        if values is None:
+            missing.add(cat)
+        else:
+            cached.update(values)
+    return key, cached, missing
+
+
+def cache_store(cache, file_key, data, categories, max_side=None, luma_quality=False, grid=None):
+    """Store each computed category's fields of one successful result."""
+    for cat in categories:
+        cache.put(file_key, _cache_ns(cat, max_side, luma_quality, grid),
+                  {f: data.get(f, np.nan) for f in FEATURE_CATEGORIES[cat]})
+
+
+# ---------------------------------------------------------------------------
+# Near-duplicate index (perceptual hash + BK-tree, across subjects)
+# ---------------------------------------------------------------------------
+
+HASH_VERSION = 1
+
+
+def _hash_ns(kind):
+    return namespace("visual", kind, HASH_VERSION)
+
+
+def _hash_chunk(kind, chunk):
+    """Perceptual hashes (or None) for a chunk of relative paths, in one worker."""
+    return [image_hash(os.path.join(_WORKER["base_dir"], str(p)), kind) for p in chunk]
+
+
+def find_near_duplicates(pool, cache, entries, kind="phash", max_dist=4,
+                         max_in_flight=8, chunk_size=32):
+    """Map each near-duplicate to the first earlier image within max_dist bits.
+
+    entries: (key, rel_path, file_key, done) in run order. done entries
+    already have their results (fully cached): they can be canonical images
+    but are never marked duplicates. Hashes are computed on the pool (a small
+    draft decode per image) and cached per file.
+    Returns {key: (canonical key, distance)}."""
+    hashes, todo = {}, []
+    for key, rel_path, file_key, done in entries:
+        h = None
+        if cache is not None and file_key is not None:
+            h = cache.get(file_key, _hash_ns(kind), label=kind)
+        if h is not None:
+            hashes[key] = h
+        else:
+            todo.append((key, rel_path, file_key))
+    if todo:
+        chunks = chunk_items([rel_path for _, rel_path, _ in todo], chunk_size)
+        out = run_work_queue(pool, {"_": chunks}, partial(_hash_chunk, kind),
+                             lambda _, results: results, lambda exc: None,
+                             max_in_flight=max_in_flight)
+        for (key, _, file_key), h in zip(todo, out[0]):
+            if h is None:
+                continue
+            hashes[key] = h
+            if cache is not None and file_key is not None:
+                cache.put(file_key, _hash_ns(kind), h)
+
+    tree, dups = BKTree(), {}
+    for key, _, _, done in entries:
+        h = hashes.get(key)
+        if h is None:
+            continue
+        match = None if done else tree.nearest(h, max_dist)
+        if match is None:
+            tree.add(h, key)
+        else:
+            dups[key] = (match[1], match[0])
+    return dups
+
+
+def near_duplicate_columns(file_col):
+    return ["subject", file_col, "canonical_subject", f"canonical_{file_col}", "distance"]
+
+
+def open_subject_stream(name, rows, output_dir, active_fields, id_cols=None,
+                        file_col="file_path", fmt="xlsx"):
+    """SubjectStream that writes one subject's checkpoint from {ok, data, error}
+    results, in row order, as they arrive."""
+    path = checkpoint_path(os.path.join(output_dir, "checkpoints"), name, fmt)
+    writer = CheckpointWriter(path, fmt, str_cols=source_columns(id_cols, file_col) + STRING_FIELDS,
+                              int_cols=INT_FIELDS)
+    return SubjectStream(writer, len(rows), lambda positions, results: build_output_df(
+        [rows[i] for i in positions], results, active_fields, id_cols, file_col=file_col))
 
 
 # ---------------------------------------------------------------------------
@@ -507,8 +1321,28 @@ def main():
                         help="Comma-separated feature categories to extract. "
                              "Available: rgb, hsv, texture, shape, spatial, quality, exif. "
                              "Default: rgb,hsv,texture,shape,spatial,quality")
+    parser.add_argument("--analysis-max-side", type=int, default=0,
+                        help="Analyze images downscaled to at most this many pixels on the long side; "
+                             "JPEGs use DCT draft scaling on decode. 0 = full resolution (default)")
+    parser.add_argument("--grid", type=parse_grid, default=None, metavar="WxH",
+                        help="Grid mode: resize every image to this common grid (e.g. 256x256) and compute "
+                             "features with the histogram-based grid kernel; off by default")
+    parser.add_argument("--luma-decode", action="store_true",
+                        help="When quality is the only pixel category, measure dynamic_range on a JPEG "
+                             "luma-only decode (~2x faster; values differ slightly from the RGB decode)")
     parser.add_argument("--subjects", nargs="*", default=None, help="Process only these subjects")
     parser.add_argument("--max-workers", type=int, default=10, help="Number of concurrent workers")
+    parser.add_argument("--executor", choices=sorted(EXECUTORS), default="thread",
+                        help="Worker backend: thread (default) or process (one core per worker, no GIL contention)")
+    parser.add_argument("--chunk-size", type=int, default=0,
+                        help="Images per submitted task (default: auto, ~4 chunks per worker, max 32)")
+    parser.add_argument("--dedupe", choices=sorted(HASH_KINDS), default=None,
+                        help="Reuse features for near-duplicate images (perceptual hash: phash or dhash); "
+                             "off by default")
+    parser.add_argument("--dedupe-distance", type=int, default=4,
+                        help="Max Hamming distance (of 64 bits) for --dedupe matches (default: 4)")
+    add_checkpoint_args(parser)
+    add_cache_args(parser)
     parser.add_argument("--preview", action="store_true", help="Dry run: show pending subjects and exit")
     args = parser.parse_args()
 
@@ -516,6 +1350,8 @@ def main():
         parser.error("--input is required unless using --merge standalone")
     if args.input and not args.base_dir:
         parser.error("--base-dir is required when --input is specified")
+    if args.grid and args.analysis_max_side:
+        parser.error("--grid and --analysis-max-side are mutually exclusive")
 
     if args.merge and not args.input:
         _run_merge(args)
@@ -536,6 +1372,16 @@ def main():
         if cat in active_categories:
             active_fields.extend(FEATURE_CATEGORIES[cat])
     print(f"Feature categories: {sorted(active_categories)} ({len(active_fields)} columns)", flush=True)
+    max_side = args.analysis_max_side or None
+    if max_side:
+        print(f"Analysis max side: {max_side}px (resolution/aspect_ratio use original size)", flush=True)
+    grid = args.grid
+    if grid:
+        print(f"Grid: {grid[0]}x{grid[1]} (resolution/aspect_ratio use original size)", flush=True)
+    # Metadata-only runs never decode pixels; with --luma-decode, quality
+    # alone decodes only luma
+    luma_quality = args.luma_decode and not grid and not (active_categories & FULL_DECODE_CATEGORIES)
+    print(f"Decode: {decode_level(active_categories, luma_quality, grid)}", flush=True)
 
     # id/file columns as strings from the read point (never through float)
     df = read_input(args.input, str_cols=source_columns(args.id_cols, args.file_col))
@@ -564,8 +1410,7 @@ def main():
     os.makedirs(ckpt_dir, exist_ok=True)
     pending = {}
     for name, group_df in sorted(groups.items()):
-        checkpoint = os.path.join(ckpt_dir, f"{name}.xlsx")
-        if os.path.isfile(checkpoint):
+        if checkpoint_done(ckpt_dir, name):
             continue
         pending[name] = group_df
 
@@ -577,22 +1422,138 @@ def main():
             print(f"  {name}: {len(group_df)} images", flush=True)
         return
 
-    # Process
-    summaries = []
-    for name in tqdm(sorted(pending.keys()), desc="Subjects", position=0):
-        group_df = pending[name].drop(columns=["_subject"])
-        summary = process_subject(
-            name, group_df, args.base_dir, args.file_col, args.max_workers,
-            args.output_dir, active_categories, active_fields, args.id_cols,
-        )
-        summaries.append(summary)
+    # Cache lookups run in this process only: fully cached images never reach
+    # the pool, partially cached ones compute just their missing categories.
+    cache = open_cache(args)
+    rows_by_subject = {name: pending[name].drop(columns=["_subject"]).to_dict("records")
+                       for name in sorted(pending)}
+    plans, items_by_subject, streams = {}, {}, {}
+    for name, rows in rows_by_subject.items():
+        stream = open_subject_stream(name, rows, args.output_dir, active_fields, args.id_cols,
+                                     file_col=args.file_col, fmt=args.checkpoint_format)
+        plan, items = [], []
+        for i, row in enumerate(rows):
+            rel_path = row.get(args.file_col, "")
+            if cache is None:
+                plan.append((None, {}, active_categories))
+                items.append((i, (rel_path, None)))
+                continue
+            key, cached, missing = cache_lookup(cache, os.path.join(args.base_dir, str(rel_path)),
+                                                active_categories, max_side, luma_quality, grid)
+            plan.append((key, cached, missing))
+            if missing:
+                items.append((i, (rel_path, tuple(sorted(missing)))))
+            else:
+                stream.put(i, {"ok": True, "data": dict(cached), "error": ""})
+        plans[name], items_by_subject[name], streams[name] = plan, items, stream
+
+    costs, levels = Counter(), Counter()
+    summaries, queue_done = [], set()
+    waiting, dup_rows = {}, []
+
+    def finish(name):
+        # A subject is published once its own tasks are done and every
+        # near-duplicate waiting on another subject's image has arrived
+        if name not in queue_done or not streams[name].complete:
+            return
+        queue_done.discard(name)
+        for d in (rows_by_subject, plans, items_by_subject):
+            d.pop(name)
+        summary = {"name": name, **streams.pop(name).close()}
+        if cache is not None:
+            cache.flush()
+        subj_bar.update(1)
         tqdm.write(f"  {summary['name']}: {summary['ok']}/{summary['total']} ok -> {summary['path']}")
+        summaries.append(summary)
+
+    def on_task_done(name, start, compact):
+        plan, stream = plans[name], streams[name]
+        for (i, (_, cats)), c in zip(items_by_subject[name][start:start + len(compact)], compact):
+            key, cached, missing = plan[i]
+            r = _expand(c, active_fields)
+            costs.update(c[3])
+            if r["ok"]:
+                levels[decode_level(active_categories if cats is None else cats, luma_quality, grid)] += 1
+                if cache is not None and key is not None:
+                    cache_store(cache, key, r["data"], missing, max_side, luma_quality, grid)
+                r["data"].update(cached)
+            stream.put(i, r)
+            for dup_name, dup_i in waiting.pop((name, i), ()):
+                dup_path = rows_by_subject[dup_name][dup_i].get(args.file_col, "")
+                streams[dup_name].put(dup_i, reuse_duplicate(r, dup_path, args.base_dir,
+                                                             active_categories))
+                finish(dup_name)
+        return [None] * len(compact)
+
+    def on_subject_done(name, _):
+        queue_done.add(name)
+        finish(name)
+
+    with make_executor(args.executor, args.max_workers, args.base_dir, args.file_col,
+                       active_categories, active_fields, max_side, luma_quality, grid) as pool:
+        if args.dedupe:
+            # Near-duplicates of an earlier image in this run (or of a fully
+            # cached one) reuse its features and never enter the work queue
+            entries = [((name, i), rows_by_subject[name][i].get(args.file_col, ""), plan[i][0],
+                        cache is not None and not plan[i][2])
+                       for name, plan in plans.items() for i in range(len(plan))]
+            dups = find_near_duplicates(pool, cache, entries, args.dedupe, args.dedupe_distance,
+                                        max_in_flight=args.max_workers * 2)
+            for (name, i), ((canon_name, canon_i), dist) in dups.items():
+                canon_key, canon_cached, canon_missing = plans[canon_name][canon_i]
+                if canon_missing:
+                    waiting.setdefault((canon_name, canon_i), []).append((name, i))
+                else:
+                    streams[name].put(i, reuse_duplicate(
+                        {"ok": True, "data": canon_cached, "error": ""},
+                        rows_by_subject[name][i].get(args.file_col, ""), args.base_dir,
+                        active_categories))
+                dup_rows.append({
+                    "subject": name, args.file_col: rows_by_subject[name][i].get(args.file_col, ""),
+                    "canonical_subject": canon_name,
+                    f"canonical_{args.file_col}": rows_by_subject[canon_name][canon_i].get(args.file_col, ""),
+                    "distance": dist,
+                })
+            for name in items_by_subject:
+                items_by_subject[name] = [(i, item) for i, item in items_by_subject[name]
+                                          if (name, i) not in dups]
+            print(f"Near-duplicates: {len(dups)} images reuse the features of "
+                  f"{len({c for c, _ in dups.values()})} canonical images "
+                  f"({args.dedupe}, distance <= {args.dedupe_distance})", flush=True)
+
+        # Process: one pool and one work queue across all subjects. Rows
+        # stream into each subject's checkpoint as chunks finish; the
+        # checkpoint is published as soon as the subject's last image finishes.
+        total_items = sum(len(v) for v in items_by_subject.values())
+        chunk_size = args.chunk_size or auto_chunk_size(total_items, args.max_workers)
+        work = {name: chunk_items([item for _, item in items], chunk_size)
+                for name, items in items_by_subject.items()}
+        print(f"Executor: {args.executor} ({args.max_workers} workers, chunk={chunk_size})", flush=True)
+
+        subj_bar = tqdm(total=len(work), desc="Subjects", position=0)
+        file_bar = tqdm(total=total_items, desc="Images", position=1, leave=False)
+        run_work_queue(pool, work, _analyze_chunk, on_subject_done, _chunk_failed,
+                       max_in_flight=args.max_workers * 2, progress=file_bar,
+                       on_task_done=on_task_done)
+    file_bar.close()
+    subj_bar.close()
 
     # Summary
     print(f"\nDone: {len(summaries)} subjects processed", flush=True)
     total_ok = sum(s["ok"] for s in summaries)
     total_fail = sum(s["fail"] for s in summaries)
     print(f"  Total: {total_ok} ok, {total_fail} failed", flush=True)
+    print(format_costs(costs, levels), flush=True)
+    if args.dedupe:
+        report_path = os.path.join(args.output_dir, "_near_duplicates.xlsx")
+        save_excel(pd.DataFrame(dup_rows, columns=near_duplicate_columns(args.file_col)), Path(report_path))
+        n_computed = sum(levels.values())
+        saved = sum(costs.values()) / n_computed * len(dup_rows) if n_computed else 0.0
+        print(f"Near-duplicates: {len(dup_rows)} images not recomputed "
+              f"(~{saved:.1f}s worker time saved) -> {report_path}", flush=True)
+    if cache is not None:
+        print(cache.summary(), flush=True)
+        cache.close()
 
     if args.merge:
         _run_merge(args)